@@ -0,0 +1,141 @@
+"""
+Compares how many slow connections the WSGI and ASGI deployments can hold
+before ordinary requests start queueing.
+
+Run one container per serving mode against the same database, e.g.
+
+    docker run -e SERVER_MODE=wsgi -p 8000:8000 hiber
+    docker run -e SERVER_MODE=asgi -p 8001:8000 hiber
+
+then
+
+    python -m benchmarks.concurrency --username surveyor --password secret \\
+        --target wsgi=http://localhost:8000 --target asgi=http://localhost:8001
+
+For each level, that many clients hold open long-polls on
+`/api/v1/sync/changes` while a prober times `/api/v1/bats`. With 3 sync
+workers the WSGI probe stalls as soon as three long-polls are open; the ASGI
+probe should stay flat.
+"""
+import argparse
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
+from .loadtest import Client, Scenarios, percentile
+
+DEFAULT_LEVELS = (1, 2, 3, 6, 12, 25, 50, 100)
+
+
+def hold_long_poll(base_url, token, wait, results):
+    client = Client(base_url, timeout=wait + 30)
+    client.token = token
+    since = quote(datetime.now(timezone.utc).isoformat())
+    started = time.monotonic()
+    try:
+        status = client.request(
+            'GET', f"/api/v1/sync/changes?since={since}&timeout={wait}")[0]
+    except OSError:
+        status = None
+    results.append((status, time.monotonic() - started))
+
+
+def probe(base_url, token, count, interval, timeout):
+    client = Client(base_url, timeout=timeout)
+    client.token = token
+    latencies = []
+    errors = 0
+    for _ in range(count):
+        started = time.monotonic()
+        try:
+            ok = client.request('GET', '/api/v1/bats')[0] < 400
+        except OSError:
+            ok = False
+        latencies.append(time.monotonic() - started)
+        errors += not ok
+        time.sleep(interval)
+    latencies.sort()
+    return latencies, errors
+
+
+def run_level(base_url, token, level, args):
+    results = []
+    holders = [
+        threading.Thread(target=hold_long_poll,
+                         args=(base_url, token, args.wait, results),
+                         daemon=True) for _ in range(level)
+    ]
+    for thread in holders:
+        thread.start()
+    # Give the long-polls a moment to occupy whatever serves them.
+    time.sleep(1)
+    latencies, errors = probe(base_url, token, args.probes, args.interval,
+                              args.wait + 30)
+    for thread in holders:
+        thread.join()
+    return {
+        'level': level,
+        'probe_p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'probe_p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'probe_errors': errors,
+        'long_poll_errors': sum(1 for status, _ in results if status != 200),
+    }
+
+
+def login(base_url, username, password):
+    client = Client(base_url)
+    scenarios = Scenarios(client, username, password, None)
+    if scenarios.login() != 200:
+        raise SystemExit(f"Could not log in to {base_url}")
+    return client.token
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--target',
+                        action='append',
+                        required=True,
+                        help="name=base_url, may be given more than once")
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--levels',
+                        type=lambda v: [int(n) for n in v.split(',')],
+                        default=DEFAULT_LEVELS)
+    parser.add_argument('--wait',
+                        type=int,
+                        default=10,
+                        help="Seconds each long-poll is held open")
+    parser.add_argument('--probes', type=int, default=10)
+    parser.add_argument('--interval', type=float, default=0.5)
+    parser.add_argument('--slo-ms',
+                        type=float,
+                        default=500,
+                        help="Probe p95 above this counts as saturated")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print('{:<8}{:>8}{:>14}{:>14}{:>14}{:>12}'.format('target', 'level',
+                                                      'probe p50 ms',
+                                                      'probe p95 ms',
+                                                      'probe errors',
+                                                      'lp errors'))
+    for target in args.target:
+        name, _, base_url = target.partition('=')
+        token = login(base_url, args.username, args.password)
+        sustained = 0
+        for level in args.levels:
+            row = run_level(base_url, token, level, args)
+            print('{:<8}{:>8}{:>14}{:>14}{:>14}{:>12}'.format(
+                name, row['level'], row['probe_p50_ms'], row['probe_p95_ms'],
+                row['probe_errors'], row['long_poll_errors']))
+            if (row['probe_p95_ms'] <= args.slo_ms
+                    and not row['probe_errors']):
+                sustained = level
+        print(f"{name}: sustained {sustained} concurrent long-polls within "
+              f"{args.slo_ms:.0f} ms probe p95")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Measures the per-request cost of opening a PostgreSQL connection, compared
+with reusing a persistent one (CONN_MAX_AGE) or borrowing from the pool
+(DATABASE_POOL_MAX_SIZE).
+
+    python -m benchmarks.connections --dsn "host=localhost dbname=hiber_test"
+
+Every simulated request runs one `SELECT 1`, the cheapest query the API could
+make, so the difference between the rows is the connection overhead alone.
+Point --dsn at the same host the application uses: the saving grows with
+network latency and TLS.
+"""
+import argparse
+import time
+import psycopg2
+from psycopg2 import pool
+from .loadtest import percentile
+
+
+def timed(requests, func):
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return samples
+
+
+def query(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def connect_per_request(dsn):
+    def request():
+        connection = psycopg2.connect(dsn)
+        try:
+            query(connection)
+        finally:
+            connection.close()
+
+    return request
+
+
+def persistent(connection):
+    return lambda: query(connection)
+
+
+def pooled(connection_pool):
+    def request():
+        connection = connection_pool.getconn()
+        try:
+            query(connection)
+        finally:
+            connection_pool.putconn(connection)
+
+    return request
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--dsn', required=True)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    connection = psycopg2.connect(args.dsn)
+    connection_pool = pool.ThreadedConnectionPool(1, 4, args.dsn)
+    modes = (
+        ('new connection', connect_per_request(args.dsn)),
+        ('persistent', persistent(connection)),
+        ('pooled', pooled(connection_pool)),
+    )
+    results = {name: timed(args.requests, func) for name, func in modes}
+    connection.close()
+    connection_pool.closeall()
+
+    print('{:<16}{:>10}{:>10}{:>10}'.format('mode', 'mean ms', 'p50 ms',
+                                            'p99 ms'))
+    for name, samples in results.items():
+        print('{:<16}{:>10.2f}{:>10.2f}{:>10.2f}'.format(
+            name,
+            sum(samples) / len(samples) * 1000,
+            percentile(samples, 50) * 1000,
+            percentile(samples, 99) * 1000))
+
+    baseline = sum(results['new connection']) / args.requests
+    for name in ('persistent', 'pooled'):
+        saved = baseline - sum(results[name]) / args.requests
+        print(f"{name}: saves {saved * 1000:.2f} ms per request")
+
+
+if __name__ == '__main__':
+    main()
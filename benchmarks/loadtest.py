@@ -0,0 +1,303 @@
+"""
+HTTP load-test scenarios for a locally running hiber stack.
+
+Start PostGIS and the application the same way the Dockerfile does, e.g.
+
+    DJANGO_SETTINGS_MODULE=hiber.settings.test \\
+        gunicorn hiber.wsgi:application --bind 0.0.0.0:8000 --workers 3
+
+then drive it with
+
+    python -m benchmarks.loadtest --base-url http://localhost:8000 \\
+        --username surveyor --password secret --concurrency 20 --duration 60
+
+Each virtual user logs in once, then picks scenarios by weight until the
+duration elapses. Throughput, p50/p95/p99 latency and error rate are reported
+per scenario and for the whole run. Only the standard library is used so the
+script can run from any machine that can reach the stack.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# Roughly the extent of the houses surveyed so far; bbox queries pick a
+# random window inside it.
+DEFAULT_EXTENT = (-73.7, 41.0, -71.8, 42.1)
+
+
+class Client:
+    """
+    Minimal JSON client that keeps the auth token for one virtual user.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.token = None
+
+    def request(self, method, path, payload=None):
+        data = None
+        headers = {'Accept': 'application/json'}
+        if payload is not None:
+            data = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['Authorization'] = f"Token {self.token}"
+        req = urllib.request.Request(self.base_url + path,
+                                     data=data,
+                                     headers=headers,
+                                     method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def json(self, method, path, payload=None):
+        status, body = self.request(method, path, payload)
+        return status, json.loads(body) if body else None
+
+
+class Scenarios:
+    """
+    Scenarios exercised by each virtual user. Every scenario returns the
+    HTTP status so the runner can count errors.
+    """
+
+    def __init__(self, client, username, password, extent):
+        self.client = client
+        self.username = username
+        self.password = password
+        self.extent = extent
+        self.house_id = None
+
+    def setup(self):
+        status = self.login()
+        if status != 200:
+            raise RuntimeError(f"Login failed with HTTP {status}")
+        status, house = self.client.json(
+            'POST', '/api/v1/houses', {
+                'location': self.random_point(),
+                'town_name': 'Load test',
+                'property_type': 'PR',
+            })
+        if status != 201:
+            raise RuntimeError(f"Creating a house failed with HTTP {status}")
+        self.house_id = house['id']
+
+    def random_point(self):
+        min_lon, min_lat, max_lon, max_lat = self.extent
+        return {
+            'longitude': random.uniform(min_lon, max_lon),
+            'latitude': random.uniform(min_lat, max_lat),
+        }
+
+    def login(self):
+        status, body = self.client.json('POST', '/auth/token/login', {
+            'username': self.username,
+            'password': self.password,
+        })
+        if status == 200:
+            self.client.token = body['auth_token']
+        return status
+
+    def list_houses(self):
+        return self.client.request('GET', '/api/v1/houses')[0]
+
+    def post_observation(self):
+        path = f"/api/v1/houses/{self.house_id}/observations"
+        return self.client.request(
+            'POST', path, {
+                'checked': datetime.now(timezone.utc).isoformat(),
+                'present': random.random() < 0.5,
+                'occupants': random.randint(0, 200),
+                'acoustic_monitor': 'N',
+                'notes': '',
+            })[0]
+
+    def bbox_query(self):
+        min_lon, min_lat, max_lon, max_lat = self.extent
+        lon = random.uniform(min_lon, max_lon)
+        lat = random.uniform(min_lat, max_lat)
+        size = random.uniform(0.05, 0.5)
+        bbox = ','.join(
+            str(round(c, 5)) for c in (lon, lat, min(lon + size, max_lon),
+                                       min(lat + size, max_lat)))
+        return self.client.request('GET', f"/api/v1/houses?in_bbox={bbox}")[0]
+
+    def bat_catalog(self):
+        return self.client.request('GET', '/api/v1/bats')[0]
+
+
+# Weighted mixes of scenarios. "mobile-sync" is what the field app does,
+# "map" is the public map, "mixed" is both at once.
+MIXES = {
+    'mobile-sync': {
+        'login': 1,
+        'list_houses': 4,
+        'post_observation': 4,
+        'bat_catalog': 1,
+    },
+    'map': {
+        'bbox_query': 8,
+        'bat_catalog': 2,
+    },
+    'mixed': {
+        'login': 1,
+        'list_houses': 3,
+        'post_observation': 3,
+        'bbox_query': 4,
+        'bat_catalog': 1,
+    },
+}
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not values:
+        return 0.0
+    rank = max(0,
+               min(len(values) - 1,
+                   int(round(pct / 100 * len(values))) - 1))
+    return values[rank]
+
+
+class Recorder:
+    """
+    Thread-safe collector of (scenario, latency, ok) samples.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, name, elapsed, ok):
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+
+    def summary(self, wall_time):
+        rows = {}
+        every = []
+        total_errors = 0
+        for name, samples in sorted(self.latencies.items()):
+            samples.sort()
+            every.extend(samples)
+            total_errors += self.errors[name]
+            rows[name] = summarize(samples, self.errors[name], wall_time)
+        every.sort()
+        rows['total'] = summarize(every, total_errors, wall_time)
+        return rows
+
+
+def summarize(samples, errors, wall_time):
+    count = len(samples)
+    return {
+        'requests': count,
+        'throughput_rps': round(count / wall_time, 2) if wall_time else 0,
+        'p50_ms': round(percentile(samples, 50) * 1000, 1),
+        'p95_ms': round(percentile(samples, 95) * 1000, 1),
+        'p99_ms': round(percentile(samples, 99) * 1000, 1),
+        'error_rate': round(errors / count, 4) if count else 0,
+    }
+
+
+def virtual_user(args, mix, recorder, deadline):
+    scenarios = Scenarios(Client(args.base_url, args.timeout), args.username,
+                          args.password, args.extent)
+    try:
+        scenarios.setup()
+    except (OSError, RuntimeError, KeyError, ValueError) as e:
+        recorder.add('setup', 0.0, False)
+        print(f"Virtual user could not start: {e}")
+        return
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    while time.monotonic() < deadline:
+        name = random.choices(names, weights)[0]
+        started = time.monotonic()
+        try:
+            ok = getattr(scenarios, name)() < 400
+        except OSError:
+            ok = False
+        recorder.add(name, time.monotonic() - started, ok)
+
+
+def run(args):
+    mix = MIXES[args.mix]
+    recorder = Recorder()
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(target=virtual_user,
+                         args=(args, mix, recorder, deadline),
+                         daemon=True) for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(time.monotonic() - started)
+
+
+def print_table(rows):
+    header = ('scenario', 'requests', 'rps', 'p50 ms', 'p95 ms', 'p99 ms',
+              'errors')
+    print('{:<18}{:>10}{:>10}{:>10}{:>10}{:>10}{:>9}'.format(*header))
+    for name, row in rows.items():
+        print('{:<18}{:>10}{:>10}{:>10}{:>10}{:>10}{:>8.2%}'.format(
+            name, row['requests'], row['throughput_rps'], row['p50_ms'],
+            row['p95_ms'], row['p99_ms'], row['error_rate']))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--mix', choices=sorted(MIXES), default='mixed')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration',
+                        type=float,
+                        default=30,
+                        help="Seconds to run for")
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--extent',
+                        type=lambda v: tuple(float(c) for c in v.split(',')),
+                        default=DEFAULT_EXTENT,
+                        help="min_lon,min_lat,max_lon,max_lat for bbox and "
+                        "house locations")
+    parser.add_argument('--json',
+                        dest='json_path',
+                        help="Also write the summary to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows = run(args)
+    print_table(rows)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(
+                {
+                    'mix': args.mix,
+                    'concurrency': args.concurrency,
+                    'results': rows
+                },
+                f,
+                indent=2)
+
+
+if __name__ == '__main__':
+    main()
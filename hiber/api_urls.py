@@ -0,0 +1,9 @@
+"""
+URLs for the API-only settings profile (hiber.settings.api).
+"""
+from django.conf.urls import include, url
+
+urlpatterns = [
+    url(r'', include('hiber.apps.api.urls')),
+    url(r'^auth/', include('hiber.apps.api.auth'), name='auth'),
+]
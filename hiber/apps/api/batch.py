@@ -0,0 +1,131 @@
+"""
+Several API calls in one round trip.
+
+POST /api/v1/batch takes `{"requests": [{"method", "path", "body"}, ...]}`
+and answers `{"responses": [{"status", "body"}, ...]}` in the same order.
+Sub-requests run one after the other, in-process: they are resolved and
+dispatched straight to the API views, with the batch's user already
+authenticated and on the same database connection. Each succeeds or fails
+on its own, with its own status; there is no transaction across them. A
+sub-request that raises is logged and answered with a 500 of its own, so
+the calls before it, which may have written, are still reported.
+"""
+import io
+import json
+import logging
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from rest_framework import serializers
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+PREFIX = '/api/v1/'
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+SAFE_METHODS = ('GET', )
+# Copied from the batch request, so sub-requests build the same URLs.
+INHERITED_META = ('SERVER_NAME', 'SERVER_PORT', 'REMOTE_ADDR', 'HTTP_HOST',
+                  'HTTP_X_FORWARDED_PROTO', 'HTTP_X_FORWARDED_FOR',
+                  'wsgi.url_scheme')
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=METHODS, default='GET')
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        parts = urlsplit(value)
+        if not parts.path.startswith(PREFIX):
+            raise serializers.ValidationError(f"Expected a {PREFIX} path.")
+        if parts.path.rstrip('/') == PREFIX + 'batch':
+            raise serializers.ValidationError("Batches can't be nested.")
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        limit = settings.API_BATCH_MAX_REQUESTS
+        if len(value) > limit:
+            raise serializers.ValidationError(
+                f"At most {limit} requests per batch.")
+        return value
+
+
+def writes(items):
+    return any(item['method'] not in SAFE_METHODS for item in items)
+
+
+def sub_request(request, item):
+    """
+    A request for one item of the batch, authenticated as the batch was.
+    """
+    parts = urlsplit(item['path'])
+    payload = b''
+    if 'body' in item:
+        payload = json.dumps(item['body']).encode('utf-8')
+    environ = {
+        key: value
+        for key, value in request.META.items() if key in INHERITED_META
+    }
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'HTTP_ACCEPT': 'application/json',
+        'wsgi.input': io.BytesIO(payload),
+    })
+    environ.setdefault('wsgi.url_scheme', request.scheme)
+    sub = WSGIRequest(environ)
+    sub.user = request.user
+    # Picked up by rest_framework.request.Request instead of authenticating
+    # again: one token lookup for the whole batch.
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def outcome(response):
+    """
+    The status and body of a sub-request's response.
+    """
+    if response.streaming:
+        response.close()
+        return 400, {
+            'detail': "Streamed responses aren't available in a batch."
+        }
+    if isinstance(response, Response):
+        return response.status_code, response.data
+    if response.get('Content-Type', '').startswith('application/json'):
+        return response.status_code, json.loads(
+            response.content.decode(response.charset))
+    return response.status_code, None
+
+
+def run(request, items):
+    """
+    Dispatches the items of a validated batch. Returns one
+    {"status", "body"} per item.
+    """
+    responses = []
+    for item in items:
+        sub = sub_request(request, item)
+        try:
+            match = resolve(sub.path_info)
+            status, body = outcome(match.func(sub, *match.args,
+                                              **match.kwargs))
+        except (Resolver404, Http404):
+            status, body = 404, {'detail': "Not found."}
+        except Exception:
+            logger.exception("Batch request %s %s failed", item['method'],
+                             item['path'])
+            status, body = 500, {'detail': "Server error."}
+        responses.append({'status': status, 'body': body})
+    return responses
@@ -0,0 +1,393 @@
+"""
+ASGI consumers for the I/O-heavy endpoints.
+
+Under `hiber.asgi` these answer the same URLs as ChangesView,
+ChangeFeedView, BulkObservationView, ObservationExportView and
+ObservationPhotoView, but a waiting or slow connection only costs a
+coroutine instead of a whole worker. Database work still runs
+synchronously, in channels' thread pool, one short query at a time.
+
+hiber.routing sends these URLs straight to the consumers, around Django's
+middleware, and that is deliberate. Their clients are the field apps,
+authenticating with tokens rather than cookies from a browser page, so no
+CORS headers are sent. Nothing is compressed either: event streams must
+reach the client event by event, and photos and bulk bodies gain little.
+Read-your-writes stickiness is kept by hand, with stick_to_primary().
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from urllib.parse import parse_qs
+import psycopg2
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.exceptions import StopConsumer
+from channels.generic.http import AsyncHttpConsumer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from rest_framework import exceptions
+from hiber.db.middleware import PrimaryStickinessMiddleware
+from ..bathouse import changefeed
+from . import photos, sync, throttling
+from .serializers import ObservationPhotoSerializer, ObservationSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class TokenAuthHttpConsumer(AsyncHttpConsumer):
+    """
+    Authenticates requests with the same `Authorization: Token <key>` header
+    as the REST API, and throttles them like it if `throttle_scope` is set.
+    """
+    throttle_scope = None
+
+    async def handle(self, body):
+        if not await self.admit():
+            return
+        try:
+            await self.handle_authenticated(body)
+        except exceptions.APIException as error:
+            await self.send_error(error)
+
+    async def admit(self):
+        """
+        Authenticates and throttles the request. Answers it and returns
+        False if it may not go on.
+        """
+        self.user = await self.authenticate()
+        if self.user is None:
+            await self.send_json(
+                401,
+                {'detail': "Authentication credentials were not provided."})
+            return False
+        if self.throttle_scope is not None:
+            take = sync_to_async(throttling.take)
+            bucket = await take(self.throttle_scope, f'user-{self.user.pk}')
+            if not bucket.allowed:
+                await self.send_json(429, {'detail': "Request was throttled."},
+                                     headers={'Retry-After': str(bucket.wait)})
+                return False
+        return True
+
+    async def handle_authenticated(self, body):
+        # Subclasses answer the methods they support.
+        await self.send_json(405, {'detail': "Method not allowed."})
+
+    async def authenticate(self):
+        headers = dict(self.scope['headers'])
+        keyword, _, key = headers.get(b'authorization',
+                                      b'').decode('latin1').partition(' ')
+        if keyword != 'Token' or not key:
+            return None
+        return await database_sync_to_async(sync.user_for_token)(key.strip())
+
+    def stick_to_primary(self):
+        """
+        Like PrimaryStickinessMiddleware after a write, so the client's next
+        requests read what it just wrote.
+        """
+        headers = dict(self.scope['headers'])
+        PrimaryStickinessMiddleware.stick(
+            PrimaryStickinessMiddleware.credentials_key(
+                headers.get(b'authorization', b'').decode('latin1')))
+
+    @property
+    def query_params(self):
+        query = parse_qs(self.scope['query_string'].decode('latin1'))
+        return {k: v[0] for k, v in query.items()}
+
+    async def send_error(self, error):
+        # As the REST API words them.
+        if isinstance(error, exceptions.ValidationError):
+            await self.send_json(error.status_code, error.detail)
+        else:
+            await self.send_json(error.status_code, {'detail': error.detail})
+
+    async def send_json(self, status, data, headers=None):
+        headers = [(name.encode('latin1'), value.encode('latin1'))
+                   for name, value in (headers or {}).items()]
+        await self.send_response(
+            status,
+            json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8'),
+            headers=[(b'Content-Type', b'application/json')] + headers)
+
+
+class ChangesConsumer(TokenAuthHttpConsumer):
+    async def handle_authenticated(self, body):
+        since, timeout = sync.parse_changes_params(self.query_params)
+        deadline = time.monotonic() + timeout
+        changed_houses = database_sync_to_async(sync.changed_houses)
+        while True:
+            now = timezone.now()
+            houses = await changed_houses(self.user, since)
+            if houses or time.monotonic() >= deadline:
+                await self.send_json(200, sync.changes_response(houses, now))
+                return
+            await asyncio.sleep(sync.CHANGES_POLL_INTERVAL)
+
+
+class ChangeListener:
+    """
+    One LISTEN connection per process, shared by every change feed: the
+    event loop reads notifications as they arrive and copies them to each
+    feed's queue. The connection is opened for the first feed and closed
+    after the last one.
+    """
+    QUEUE_SIZE = 1000
+
+    def __init__(self):
+        self.connection = None
+        self.queues = set()
+        self.lock = None
+
+    async def subscribe(self):
+        if self.lock is None:
+            # Created here, so it belongs to the loop the server runs.
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            if self.connection is None:
+                self.connection = await sync_to_async(changefeed.listen)()
+                asyncio.get_event_loop().add_reader(self.connection.fileno(),
+                                                    self.dispatch)
+            queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+            self.queues.add(queue)
+            return queue
+
+    def unsubscribe(self, queue):
+        self.queues.discard(queue)
+        if not self.queues and self.connection is not None:
+            self.close()
+
+    def close(self):
+        asyncio.get_event_loop().remove_reader(self.connection.fileno())
+        self.connection.close()
+        self.connection = None
+
+    def dispatch(self):
+        try:
+            changes = changefeed.received(self.connection)
+        except psycopg2.Error:
+            # Lost the connection: end every feed, clients reconnect.
+            changes = None
+            self.close()
+        for queue in list(self.queues):
+            try:
+                for change in changes or ():
+                    queue.put_nowait(change)
+                if changes is None:
+                    queue.put_nowait(None)
+            except asyncio.QueueFull:
+                # Too slow to keep up: end its feed, with room to say so.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+
+listener = ChangeListener()
+
+
+class ChangeFeedConsumer(TokenAuthHttpConsumer):
+    """
+    Streams the user's changes while the connection lasts. The stream runs
+    in a task of its own so the consumer still hears the client leave.
+    """
+    streaming = None
+
+    async def http_request(self, message):
+        # AsyncHttpConsumer's stops the consumer as soon as handle() returns,
+        # which would leave the stream running after the client has gone.
+        # This one stays alive until http_disconnect.
+        if 'body' in message:
+            self.body.append(message['body'])
+        if message.get('more_body'):
+            return
+        try:
+            await self.handle(b''.join(self.body))
+        except BaseException:
+            await self.disconnect()
+            raise
+        if self.streaming is None:
+            # Refused or answered with an error: nothing to stream.
+            await self.disconnect()
+            raise StopConsumer()
+
+    async def handle_authenticated(self, body):
+        now = timezone.now()
+        watched_house_ids = database_sync_to_async(sync.watched_house_ids)
+        self.queue = await listener.subscribe()
+        try:
+            house_ids = await watched_house_ids(self.user)
+            await self.send_headers(headers=sync.FEED_HEADERS)
+            await self.send_body(sync.feed_ready(now), more_body=True)
+        except BaseException:
+            listener.unsubscribe(self.queue)
+            raise
+        self.streaming = asyncio.ensure_future(self.stream(house_ids))
+
+    async def stream(self, house_ids):
+        try:
+            deadline = time.monotonic() + sync.FEED_MAX_SECONDS
+            event_id = 0
+            while time.monotonic() < deadline:
+                try:
+                    change = await asyncio.wait_for(self.queue.get(),
+                                                    sync.FEED_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    await self.send_body(sync.FEED_KEEPALIVE_COMMENT,
+                                         more_body=True)
+                    continue
+                if change is None:
+                    break
+                if sync.follows(change, self.user, house_ids):
+                    event_id += 1
+                    await self.send_body(sync.feed_change(change, event_id),
+                                         more_body=True)
+            await self.send_body(b'')
+        finally:
+            listener.unsubscribe(self.queue)
+
+    async def http_disconnect(self, message):
+        if self.streaming is not None:
+            self.streaming.cancel()
+        await super().http_disconnect(message)
+
+
+class BulkObservationConsumer(TokenAuthHttpConsumer):
+    throttle_scope = 'bulk'
+
+    async def handle_authenticated(self, body):
+        if self.scope['method'] != 'POST':
+            await self.send_json(405, {'detail': "Method not allowed."})
+            return
+        try:
+            records = json.loads(body.decode('utf-8'))
+        except ValueError:
+            await self.send_json(400, {'detail': "Malformed JSON."})
+            return
+        data = await database_sync_to_async(self.create)(records)
+        await self.send_json(201, data)
+
+    def create(self, records):
+        created = sync.bulk_create_observations(self.user, records)
+        self.stick_to_primary()
+        return ObservationSerializer(created, many=True).data
+
+
+class ObservationExportConsumer(TokenAuthHttpConsumer):
+    throttle_scope = 'bulk'
+
+    async def handle_authenticated(self, body):
+        await self.send_headers(headers=[
+            (b'Content-Type', b'text/csv'),
+            (b'Content-Disposition',
+             b'attachment; filename="observations.csv"'),
+        ])
+        await self.send_body(sync.export_header(), more_body=True)
+        export_batch = database_sync_to_async(sync.export_batch)
+        chunk, after = await export_batch(self.user)
+        while after is not None:
+            await self.send_body(chunk, more_body=True)
+            chunk, after = await export_batch(self.user, after)
+        await self.send_body(b'')
+
+
+class ObservationPhotoConsumer(TokenAuthHttpConsumer):
+    """
+    Writes an uploaded photo to a temporary file as each chunk of the body
+    arrives, rather than collecting the body in memory, so a slow upload
+    from the field only holds a coroutine and a file.
+    """
+    upload = None
+
+    @property
+    def throttle_scope(self):
+        return 'write' if self.scope['method'] == 'POST' else 'read'
+
+    async def http_request(self, message):
+        if self.scope['method'] != 'POST':
+            await super().http_request(message)
+            return
+        more = False
+        try:
+            more = await self.receive_upload(message)
+        except exceptions.APIException as error:
+            await self.send_error(error)
+        except Exception:
+            logger.exception("Storing an uploaded photo failed.")
+            await self.send_json(500, {'detail': "Server error."})
+        finally:
+            if not more:
+                self.discard_upload()
+        if not more:
+            await self.finish()
+
+    async def receive_upload(self, message):
+        """
+        Writes a chunk of the upload, and stores the photo after the last.
+        Returns whether more chunks are to come.
+        """
+        if self.upload is None:
+            if not await self.admit():
+                return False
+            headers = dict(self.scope['headers'])
+            self.upload = photos.temporary_upload(
+                *(headers.get(name, b'').decode('latin1')
+                  for name in (b'content-disposition', b'content-type',
+                               b'content-length')))
+        # Local disk, a chunk at a time: short enough for the loop.
+        photos.write_chunk(self.upload, message.get('body', b''))
+        if message.get('more_body'):
+            return True
+        await self.handle_authenticated(b'')
+        return False
+
+    async def handle_authenticated(self, body):
+        if self.scope['method'] == 'POST':
+            data = await database_sync_to_async(self.create)()
+            await self.send_json(201, data)
+        elif self.scope['method'] == 'GET':
+            data = await database_sync_to_async(self.list)()
+            await self.send_json(200, data)
+        else:
+            await self.send_json(405, {'detail': "Method not allowed."})
+
+    def create(self):
+        photo = photos.create_photo(self.user, self.observation_id,
+                                    self.upload,
+                                    self.query_params.get('caption', ''))
+        self.stick_to_primary()
+        return ObservationPhotoSerializer(photo).data
+
+    def list(self):
+        observation = photos.owned_observation(self.user, self.observation_id)
+        queryset = observation.photos.select_related('image').order_by('id')
+        return ObservationPhotoSerializer(queryset, many=True).data
+
+    @property
+    def observation_id(self):
+        return self.scope['url_route']['kwargs']['pk']
+
+    async def finish(self):
+        await self.disconnect()
+        raise StopConsumer()
+
+    async def disconnect(self):
+        # Answered, or the client went away halfway through the upload.
+        self.discard_upload()
+
+    def discard_upload(self):
+        if self.upload is None:
+            return
+        path = self.upload.temporary_file_path()
+        upload, self.upload = self.upload, None
+        try:
+            upload.close()
+        finally:
+            # Closing removes the file unless closing fails; a stored photo
+            # was moved away already.
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,419 @@
+"""
+Loading of historical survey files (CSV or XLSX) into the database.
+
+A file holds one kind of record (see KINDS), one per row, under a header of
+API field names. Choice fields take the code or the label ("FE" or "Forest
+Edge"), several choices being separated by semicolons. Rows are validated
+by the API serializers, ConditionalRequiredMixin rules included, and
+created with bulk_create() a batch at a time. Rows that fail go to a reject
+file with the reason.
+
+House files also carry `ref`, the house's reference in the surveys,
+`watcher` (a username), `latitude` and `longitude`. Houses within
+DUPLICATE_HOUSE_METERS of one in the database, or of one earlier in the
+file, are rejected unless duplicates are allowed. Other files link rows
+to their house with `house_ref`, or with `house_id` for houses that were
+already in the database. Observation species are written as `bat id:count`
+pairs, as in "3:12;5:1".
+"""
+import csv
+import json
+import os
+from collections import namedtuple
+from datetime import date, datetime, time
+from itertools import islice
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from hiber.db.routers import use_primary
+from ..bathouse import duplicates
+from ..bathouse.models import (House, HouseEnvironmentFeatures,
+                               HousePhysicalFeatures, Observation,
+                               SurveyImport)
+from .serializers import (ChoiceField, HouseEnvironmentFeaturesSerializer,
+                          HousePhysicalFeaturesSerializer, HouseSerializer,
+                          ObservationSerializer, SpeciesCountsField)
+
+try:
+    import openpyxl
+except ImportError:  # only needed for .xlsx files
+    openpyxl = None
+
+LIST_SEPARATOR = ';'
+
+Kind = namedtuple('Kind', ('model', 'serializer_class'))
+
+KINDS = {
+    'houses':
+    Kind(House, HouseSerializer),
+    'environment':
+    Kind(HouseEnvironmentFeatures, HouseEnvironmentFeaturesSerializer),
+    'physical':
+    Kind(HousePhysicalFeatures, HousePhysicalFeaturesSerializer),
+    'observations':
+    Kind(Observation, ObservationSerializer),
+}
+
+
+class SurveyImportError(Exception):
+    pass
+
+
+def cell_text(value):
+    """
+    Spreadsheet cells come typed; the serializers expect text.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        if value.time() == time():
+            return value.date().isoformat()
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as survey:
+        reader = csv.DictReader(survey)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def read_xlsx(path):
+    if openpyxl is None:
+        raise SurveyImportError("Reading .xlsx files needs openpyxl.")
+    # Read-only mode streams the sheet instead of loading it whole.
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [cell_text(name).strip() for name in next(rows, ())]
+        for line, values in enumerate(rows, 2):
+            yield line, {
+                name: cell_text(value)
+                for name, value in zip(header, values) if name
+            }
+    finally:
+        workbook.close()
+
+
+def read_rows(path):
+    """
+    Yields (line number, {column: text}) for every row of a survey file.
+    """
+    if path.lower().endswith('.xlsx'):
+        return read_xlsx(path)
+    return read_csv(path)
+
+
+def species_cell(value):
+    pairs = [
+        item.partition(':') for item in value.split(LIST_SEPARATOR)
+        if item.strip()
+    ]
+    return [{
+        'bat': bat.strip(),
+        'count': count.strip()
+    } for bat, _, count in pairs]
+
+
+def choice_lookup(choices):
+    lookup = {}
+    for code, label in choices.items():
+        lookup[str(label).casefold()] = code
+        lookup[str(code).casefold()] = code
+    return lookup
+
+
+def cell(row, name):
+    return (row.get(name) or '').strip()
+
+
+class RowLoader:
+    """
+    Turns batches of rows of one kind into unsaved model instances.
+    """
+
+    def __init__(self, kind, default_watcher=None, allow_duplicates=False):
+        self.kind = kind
+        self.model = KINDS[kind].model
+        # One serializer validates every row, so its fields are only built
+        # once. The house comes from `house_ref`/`house_id` instead.
+        self.validator = KINDS[kind].serializer_class()
+        self.validator.fields.pop('house', None)
+        self.default_watcher = default_watcher
+        self.allow_duplicates = allow_duplicates
+        self.watchers = {}
+        self.choices = {}
+        self.list_fields = set()
+        for name, field in self.validator.fields.items():
+            if isinstance(field, serializers.ListField):
+                field = field.child
+                self.list_fields.add(name)
+            if isinstance(field, ChoiceField):
+                self.choices[name] = choice_lookup(field.choices)
+
+    def data(self, row):
+        """
+        The row as serializer input, with labels mapped to codes.
+        """
+        data = {}
+        for name, field in self.validator.fields.items():
+            value = cell(row, name)
+            if field.read_only or not value:
+                continue
+            if isinstance(field, SpeciesCountsField):
+                value = species_cell(value)
+            elif name in self.list_fields:
+                value = [
+                    item.strip() for item in value.split(LIST_SEPARATOR)
+                    if item.strip()
+                ]
+            if name in self.choices:
+                lookup = self.choices[name]
+                if name in self.list_fields:
+                    value = [lookup.get(v.casefold(), v) for v in value]
+                else:
+                    value = lookup.get(value.casefold(), value)
+            data[name] = value
+        if self.kind == 'houses' and (cell(row, 'latitude')
+                                      or cell(row, 'longitude')):
+            data['location'] = {
+                'latitude': cell(row, 'latitude'),
+                'longitude': cell(row, 'longitude'),
+            }
+        return data
+
+    def load(self, rows):
+        """
+        Validates a batch of (line, row) pairs. Returns the instances to
+        create, and (line, row, errors) for every row rejected.
+        """
+        if self.kind == 'houses':
+            link = self.house_linker(rows)
+        else:
+            link = self.feature_linker(rows)
+        valid, rejects = [], []
+        for line, row in rows:
+            try:
+                links = link(row)
+                attrs = self.validate_fields(self.data(row))
+            except serializers.ValidationError as error:
+                rejects.append((line, row, error.detail))
+            else:
+                valid.append((line, row, links, attrs))
+
+        # Cross-field rules run over the whole batch in one pass.
+        check = getattr(self.validator, 'conditional_errors', None)
+        if check is None:
+            conditional = [{}] * len(valid)
+        else:
+            conditional = check([attrs for _, _, _, attrs in valid])
+        loaded = []
+        for (line, row, links, attrs), errors in zip(valid, conditional):
+            if errors:
+                rejects.append((line, row, errors))
+            else:
+                instance = self.model(**links, **attrs)
+                if self.kind == 'environment':
+                    # bulk_create() doesn't go through save().
+                    instance.update_water_resource_meters()
+                loaded.append((line, row, instance))
+        if self.kind == 'houses' and not self.allow_duplicates:
+            loaded = self.drop_duplicates(loaded, rejects)
+        rejects.sort(key=lambda reject: reject[0])
+        return [instance for _, _, instance in loaded], rejects
+
+    def drop_duplicates(self, loaded, rejects):
+        """
+        Rejects the houses registered already: close to one in the database,
+        where earlier batches of the file are too, or to one kept earlier in
+        the batch.
+        """
+        points = [instance.location for _, _, instance in loaded]
+        nearby = duplicates.nearby_house_ids(points)
+        earlier = {}
+        for i, j in duplicates.close_pairs(points):
+            earlier.setdefault(j, []).append(i)
+        kept, kept_indexes = [], set()
+        for index, (line, row, instance) in enumerate(loaded):
+            lines = [
+                loaded[i][0] for i in earlier.get(index, ())
+                if i in kept_indexes
+            ]
+            if nearby[index]:
+                error = "Within {} m of house {}.".format(
+                    duplicates.house_meters(),
+                    ', '.join(map(str, nearby[index])))
+            elif lines:
+                error = "Within {} m of the house on line {}.".format(
+                    duplicates.house_meters(), ', '.join(map(str, lines)))
+            else:
+                kept.append((line, row, instance))
+                kept_indexes.add(index)
+                continue
+            rejects.append((line, row, {'location': [error]}))
+        return kept
+
+    def validate_fields(self, data):
+        """
+        Serializer validation, short of validate(): to_internal_value()
+        and the serializer's validators.
+        """
+        attrs = self.validator.to_internal_value(data)
+        self.validator.run_validators(attrs)
+        return attrs
+
+    def house_linker(self, rows):
+        refs = {cell(row, 'ref') for _, row in rows} - {''}
+        taken = set(
+            House.objects.filter(source_ref__in=refs).values_list('source_ref',
+                                                                  flat=True))
+        usernames = {
+            cell(row, 'watcher') or self.default_watcher
+            for _, row in rows
+        } - {None, ''} - set(self.watchers)
+        User = get_user_model()
+        lookup = {User.USERNAME_FIELD + '__in': usernames}
+        for user in User.objects.filter(**lookup):
+            self.watchers[user.get_username()] = user
+
+        def link(row):
+            ref = cell(row, 'ref') or None
+            if ref in taken:
+                raise serializers.ValidationError(
+                    {'ref': ["A house with this reference exists."]})
+            watcher = self.watchers.get(
+                cell(row, 'watcher') or self.default_watcher)
+            if watcher is None:
+                raise serializers.ValidationError(
+                    {'watcher': ["Unknown user."]})
+            if ref:
+                taken.add(ref)
+            return {'watcher': watcher, 'source_ref': ref}
+
+        return link
+
+    def feature_linker(self, rows):
+        refs = {cell(row, 'house_ref') for _, row in rows} - {''}
+        by_ref = dict(
+            House.objects.filter(source_ref__in=refs).values_list(
+                'source_ref', 'id'))
+        ids = {
+            int(cell(row, 'house_id'))
+            for _, row in rows if cell(row, 'house_id').isdigit()
+        }
+        known_ids = set(
+            House.objects.filter(pk__in=ids).values_list('id', flat=True))
+
+        def link(row):
+            if cell(row, 'house_ref'):
+                house_id = by_ref.get(cell(row, 'house_ref'))
+            elif cell(row, 'house_id').isdigit():
+                house_id = int(cell(row, 'house_id'))
+                if house_id not in known_ids:
+                    house_id = None
+            else:
+                raise serializers.ValidationError(
+                    {'house_ref': ["Give house_ref or house_id."]})
+            if house_id is None:
+                raise serializers.ValidationError(
+                    {'house_ref': ["No such house."]})
+            return {'house_id': house_id}
+
+        return link
+
+
+class SurveyImporter:
+    """
+    Loads a survey file batch by batch, recording progress in a
+    SurveyImport so a rerun carries on after the last batch loaded.
+    """
+
+    def __init__(self,
+                 kind,
+                 path,
+                 batch_size=5000,
+                 default_watcher=None,
+                 reject_path=None,
+                 restart=False,
+                 allow_duplicates=False):
+        self.kind = kind
+        self.path = os.path.abspath(path)
+        self.batch_size = batch_size
+        self.reject_path = reject_path or self.path + '.rejects.csv'
+        self.restart = restart
+        self.loader = RowLoader(kind, default_watcher, allow_duplicates)
+
+    def checkpoint(self):
+        size = os.path.getsize(self.path)
+        progress = SurveyImport.objects.get_or_create(kind=self.kind,
+                                                      path=self.path,
+                                                      defaults={'size':
+                                                                size})[0]
+        if self.restart:
+            progress.size = size
+            progress.line = progress.imported = progress.rejected = 0
+            progress.finished = None
+            progress.save()
+            if os.path.exists(self.reject_path):
+                os.remove(self.reject_path)
+        elif progress.size != size:
+            raise SurveyImportError(
+                "The file changed since it was last imported; restart the "
+                "import to load it again from the top.")
+        return progress
+
+    def run(self):
+        """
+        Loads the rest of the file, yielding the SurveyImport after every
+        batch.
+        """
+        # Rows refer to houses created moments earlier.
+        with use_primary():
+            progress = self.checkpoint()
+            rows = ((line, row) for line, row in read_rows(self.path)
+                    if line > progress.line)
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                instances, rejects = self.loader.load(batch)
+                with transaction.atomic():
+                    self.loader.model.objects.bulk_create(instances,
+                                                          batch_size=1000)
+                    if self.kind == 'observations':
+                        # Lets sync clients pick the observations up.
+                        House.objects.filter(
+                            pk__in={o.house_id
+                                    for o in instances}).update(
+                                        updated=timezone.now())
+                    progress.line = batch[-1][0]
+                    progress.imported += len(instances)
+                    progress.rejected += len(rejects)
+                    progress.save()
+                self.write_rejects(rejects)
+                yield progress
+            progress.finished = timezone.now()
+            progress.save()
+
+    def write_rejects(self, rejects):
+        if not rejects:
+            return
+        new_file = not os.path.exists(self.reject_path)
+        columns = ['line', 'errors'
+                   ] + [name for name in rejects[0][1] if name is not None]
+        with open(self.reject_path, 'a', newline='',
+                  encoding='utf-8') as reject_file:
+            writer = csv.DictWriter(reject_file,
+                                    columns,
+                                    extrasaction='ignore')
+            if new_file:
+                writer.writeheader()
+            for line, row, errors in rejects:
+                writer.writerow(dict(row, line=line,
+                                     errors=json.dumps(errors)))
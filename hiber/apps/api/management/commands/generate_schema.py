@@ -0,0 +1,15 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from hiber.apps.api import schema
+
+
+class Command(BaseCommand):
+    help = ("Writes the OpenAPI schema as JSON and YAML to API_SCHEMA_DIR, "
+            "for the docs to serve without introspecting the API.")
+
+    def handle(self, *args, **options):
+        schema.write_schema_files()
+        self.stdout.write("Wrote schema version {} to {}".format(
+            schema.code_version(),
+            os.path.relpath(settings.API_SCHEMA_DIR, settings.BASE_DIR)))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from hiber.apps.api.imports import KINDS, SurveyImporter, SurveyImportError
+
+
+class Command(BaseCommand):
+    help = ("Loads historical surveys from a CSV or XLSX file, one kind of "
+            "record per file. Rejected rows are written next to the file "
+            "with the reason; rerunning an interrupted import resumes it.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(KINDS))
+        parser.add_argument('path')
+        parser.add_argument('--batch-size',
+                            type=int,
+                            default=5000,
+                            help="Rows validated and saved per transaction")
+        parser.add_argument('--watcher',
+                            help="Username of the watcher for houses that "
+                            "don't name one")
+        parser.add_argument('--rejects',
+                            help="Reject file, by default PATH.rejects.csv")
+        parser.add_argument('--restart',
+                            action='store_true',
+                            help="Load the file from the top again")
+        parser.add_argument('--allow-duplicates',
+                            action='store_true',
+                            help="Load houses close to one already loaded")
+
+    def handle(self, *args, **options):
+        importer = SurveyImporter(options['kind'],
+                                  options['path'],
+                                  batch_size=options['batch_size'],
+                                  default_watcher=options['watcher'],
+                                  reject_path=options['rejects'],
+                                  restart=options['restart'],
+                                  allow_duplicates=options['allow_duplicates'])
+        progress = None
+        try:
+            for progress in importer.run():
+                self.stdout.write(
+                    "Line {0.line}: {0.imported} imported, {0.rejected} "
+                    "rejected".format(progress))
+        except (OSError, SurveyImportError) as error:
+            raise CommandError(error)
+        if progress is None:
+            self.stdout.write("Nothing left to import.")
+        elif progress.rejected:
+            self.stdout.write("Rejected rows are in {}".format(
+                importer.reject_path))
@@ -0,0 +1,143 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter under `-X importtime`, so nothing this command
+# already imported skews the numbers.
+BOOTSTRAP = '''
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+handler_done = time.perf_counter()
+
+
+def request(path, host):
+    environ = {'PATH_INFO': path, 'HTTP_HOST': host}
+    setup_testing_defaults(environ)
+    statuses = []
+    response = application(environ, lambda status, *args: statuses.append(
+        status))
+    b''.join(response)
+    response.close()
+    return statuses[0]
+
+
+status = request(sys.argv[1], sys.argv[2])
+first_done = time.perf_counter()
+request(sys.argv[1], sys.argv[2])
+second_done = time.perf_counter()
+print(json.dumps({
+    'status': status,
+    'phases': [
+        ['django.setup()', setup_done - started],
+        ['WSGI handler', handler_done - setup_done],
+        ['first request', first_done - handler_done],
+        ['second request', second_done - first_done],
+    ],
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """
+    Returns (module, self seconds, cumulative seconds) for every line of
+    `python -X importtime` output.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        imports.append(
+            (fields[2].strip(), int(fields[0]) / 1e6, int(fields[1]) / 1e6))
+    return imports
+
+
+class Command(BaseCommand):
+    help = ("Starts the app in a fresh process and reports import time per "
+            "module and package, and the time to serve the first request.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path',
+                            default='/api/v1/choices',
+                            help="Path of the first request")
+        parser.add_argument('--host', help="Host header of the requests")
+        parser.add_argument('--top',
+                            type=int,
+                            default=20,
+                            help="Number of modules and packages to list")
+        parser.add_argument('--json',
+                            action='store_true',
+                            help="Print the report as JSON, for tracking")
+
+    def handle(self, *args, **options):
+        host = options['host'] or next(
+            (host for host in settings.ALLOWED_HOSTS
+             if not host.startswith(('.', '*'))), 'localhost')
+
+        command = [
+            sys.executable, '-X', 'importtime', '-c', BOOTSTRAP,
+            options['path'], host
+        ]
+        started = time.perf_counter()
+        process = subprocess.run(command,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE,
+                                 universal_newlines=True)
+        wall = time.perf_counter() - started
+        if process.returncode:
+            raise CommandError("Start-up failed:\n" + process.stderr[-2000:])
+
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        imports = parse_importtime(process.stderr)
+        modules = sorted(
+            ((module, self_time) for module, self_time, _ in imports),
+            key=lambda item: -item[1])
+        packages = defaultdict(float)
+        for module, self_time in modules:
+            packages[module.split('.')[0]] += self_time
+
+        report = {
+            'settings': os.environ['DJANGO_SETTINGS_MODULE'],
+            'path': options['path'],
+            'status': result['status'],
+            'wall': wall,
+            'phases': result['phases'],
+            'import_total': sum(packages.values()),
+        }
+        report['packages'] = sorted(packages.items(),
+                                    key=lambda item: -item[1])[:options['top']]
+        report['modules'] = modules[:options['top']]
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.write_report(report)
+
+    def write_report(self, report):
+        self.stdout.write("Settings: {settings}".format(**report))
+        self.stdout.write("Process wall time: {:.3f}s".format(report['wall']))
+        for name, seconds in report['phases']:
+            self.stdout.write("  {:<16} {:8.3f}s".format(name, seconds))
+        self.stdout.write(
+            "First request: GET {path} -> {status}".format(**report))
+        self.stdout.write("Imports: {:.3f}s (self time)".format(
+            report['import_total']))
+        for title, rows in (('package', report['packages']),
+                            ('module', report['modules'])):
+            self.stdout.write("\nSlowest imports by {}:".format(title))
+            for name, seconds in rows:
+                self.stdout.write("  {:8.3f}s  {}".format(seconds, name))
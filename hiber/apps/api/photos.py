@@ -0,0 +1,101 @@
+"""
+Observation photo uploads, for ObservationPhotoView and its ASGI consumer.
+
+The photo is the request body itself, named by a `Content-Disposition:
+attachment; filename="roost.jpg"` header. It is written to a temporary file
+chunk by chunk as it arrives, never held in memory whole, checked the way
+Wagtail checks image uploads, and then moved into storage. Renditions are
+left to the `render_observation_photo` job, run by the worker pool, so the
+request never decodes more of the image than its header.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
+from django.http.multipartparser import parse_header
+from rest_framework import exceptions, serializers, status
+from wagtail.images import get_image_model
+from wagtail.images.fields import WagtailImageField
+from ..bathouse.models import Observation, ObservationPhoto
+from ..jobs.models import Job
+
+
+class PhotoTooLarge(exceptions.APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "The photo is too large."
+    default_code = 'too_large'
+
+
+def max_upload_size():
+    return getattr(settings, 'WAGTAILIMAGES_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+
+
+def check_size(content_length):
+    """
+    Refuses uploads announced as too large before reading any of them.
+    """
+    try:
+        size = int(content_length or 0)
+    except ValueError:
+        size = 0
+    if size > max_upload_size():
+        raise PhotoTooLarge()
+
+
+def temporary_upload(content_disposition, content_type, content_length):
+    """
+    An empty temporary file to receive an upload, as Django's
+    TemporaryFileUploadHandler would make.
+    """
+    check_size(content_length)
+    _, params = parse_header((content_disposition or '').encode('latin1'))
+    name = params.get('filename', b'').decode('utf-8', 'replace').strip()
+    if not name:
+        raise exceptions.ParseError(
+            "Missing filename. Request should include a Content-Disposition "
+            "header with a filename parameter.")
+    return TemporaryUploadedFile(name, content_type
+                                 or 'application/octet-stream', 0, None)
+
+
+def write_chunk(upload, chunk):
+    upload.size += len(chunk)
+    if upload.size > max_upload_size():
+        raise PhotoTooLarge()
+    upload.write(chunk)
+
+
+def owned_observation(user, pk):
+    try:
+        return Observation.objects.get(pk=pk, house__watcher=user)
+    except Observation.DoesNotExist:
+        raise exceptions.NotFound()
+
+
+def create_photo(user, observation_id, upload, caption=''):
+    """
+    Stores an uploaded file as a photo of one of the user's observations
+    and queues the generation of its renditions.
+    """
+    observation = owned_observation(user, observation_id)
+    if upload is None:
+        raise serializers.ValidationError({'file': ["No file was sent."]})
+    if len(caption) > ObservationPhoto._meta.get_field('caption').max_length:
+        raise serializers.ValidationError({'caption': ["Too long."]})
+    # Flushes what was written, for the image check to read it back.
+    upload.seek(0)
+    try:
+        WagtailImageField().clean(upload)
+    except DjangoValidationError as error:
+        raise serializers.ValidationError({'file': error.messages})
+    image = get_image_model()(title=upload.name,
+                              file=upload,
+                              collection=ObservationPhoto.collection(),
+                              uploaded_by_user=user)
+    with transaction.atomic():
+        image.save()
+        photo = ObservationPhoto.objects.create(observation=observation,
+                                                image=image,
+                                                caption=caption)
+        Job.enqueue('render_observation_photo', {'photo': photo.pk})
+    return photo
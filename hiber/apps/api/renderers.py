@@ -0,0 +1,79 @@
+"""
+Compact binary renderers and parsers for clients on metered links.
+
+Both are content negotiated: send `Accept: application/msgpack` (or
+`application/cbor`) to receive, and the matching `Content-Type` to send.
+The payloads have the same structure as the JSON ones.
+"""
+import cbor2
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Anything msgpack/CBOR can't encode natively (Decimal, UUID, lazy strings,
+# ...) becomes what the JSON renderer would have produced.
+_encoder = JSONEncoder()
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, use_bin_type=True, default=_encoder.default)
+
+
+class CBORRenderer(BaseRenderer):
+    media_type = 'application/cbor'
+    format = 'cbor'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return cbor2.dumps(data,
+                           default=lambda encoder, value: encoder.encode(
+                               _encoder.default(value)))
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets EventSource clients, which only accept `text/event-stream`, reach
+    the change feed. Its events are streamed by the view; this only renders
+    errors, such as a missing token, as an `error` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b'event: error\ndata: ' + _encoder.encode(data).encode(
+            'utf-8') + b'\n\n'
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as e:
+            raise ParseError(f"MessagePack parse error - {e}")
+
+
+class CBORParser(BaseParser):
+    media_type = 'application/cbor'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return cbor2.loads(stream.read())
+        except (ValueError, cbor2.CBORDecodeError) as e:
+            raise ParseError(f"CBOR parse error - {e}")
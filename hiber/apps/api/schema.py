@@ -0,0 +1,190 @@
+"""
+Pre-generated, cached OpenAPI schema for the API docs.
+
+Generating the schema introspects every view and serializer. The
+`generate_schema` command writes it to API_SCHEMA_DIR at build time; at
+runtime the docs serve that file, or generate the schema once and cache it,
+provided it was built from the running code (see code_version()). Set
+API_SCHEMA_LIVE to generate it on every request while developing.
+"""
+import hashlib
+import json
+import os
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import permissions
+from rest_framework.response import Response
+
+SCHEMA_URLCONF = 'hiber.apps.api.urls'
+VERSION_FILE = 'openapi.version'
+
+
+def schema_info():
+    from drf_yasg import openapi
+    return openapi.Info(
+        title="Bat House API",
+        default_version="v1",
+        description="API to interact with bat house monitoring",
+    )
+
+
+@lru_cache()
+def code_version():
+    """
+    CODE_VERSION when the deployment sets it (e.g. to the git commit),
+    otherwise a digest of the project's Python sources.
+    """
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(settings.PROJECT_DIR):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.endswith('.py'):
+                continue
+            path = os.path.join(root, name)
+            digest.update(
+                os.path.relpath(path, settings.PROJECT_DIR).encode('utf-8'))
+            with open(path, 'rb') as source:
+                digest.update(source.read())
+    return digest.hexdigest()[:12]
+
+
+def build_schema():
+    """
+    Returns the encoded schema as {'json': bytes, 'yaml': bytes}.
+    """
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    # The same file is served from every host: with an empty url, drf_yasg
+    # leaves out host and schemes, and clients call the host and scheme they
+    # fetched the schema from.
+    generator = OpenAPISchemaGenerator(schema_info(),
+                                       url='',
+                                       urlconf=SCHEMA_URLCONF)
+    schema = generator.get_schema(request=None, public=True)
+    return {
+        'json': OpenAPICodecJson(validators=[]).encode(schema),
+        'yaml': OpenAPICodecYaml(validators=[]).encode(schema),
+    }
+
+
+def schema_path(name):
+    return os.path.join(settings.API_SCHEMA_DIR, name)
+
+
+def write_schema_files():
+    os.makedirs(settings.API_SCHEMA_DIR, exist_ok=True)
+    for fmt, content in build_schema().items():
+        with open(schema_path('openapi.' + fmt), 'wb') as schema_file:
+            schema_file.write(content)
+    with open(schema_path(VERSION_FILE), 'w') as version_file:
+        version_file.write(code_version())
+
+
+def read_schema_file(fmt):
+    """
+    Returns the pre-generated schema, or None if it is missing or was built
+    from other code.
+    """
+    try:
+        with open(schema_path(VERSION_FILE)) as version_file:
+            if version_file.read().strip() != code_version():
+                return None
+        with open(schema_path('openapi.' + fmt), 'rb') as schema_file:
+            return schema_file.read()
+    except FileNotFoundError:
+        return None
+
+
+def load_schema(fmt):
+    key = 'apischema:{}:{}'.format(code_version(), fmt)
+    content = cache.get(key)
+    if content is None:
+        content = read_schema_file(fmt)
+        if content is None:
+            content = build_schema()[fmt]
+        cache.set(key, content, None)
+    return content
+
+
+def load_swagger():
+    """
+    The cached schema as a drf_yasg Swagger object, for the docs page.
+    """
+    from drf_yasg import openapi
+
+    def swagger_dict(pairs):
+        value = openapi.SwaggerDict()
+        value.update(pairs)
+        return value
+
+    # The UI renderers want a Swagger instance; Swagger() itself would
+    # rebuild the document from its parts.
+    swagger = openapi.Swagger.__new__(openapi.Swagger)
+    openapi.SwaggerDict.__init__(swagger)
+    swagger.update(
+        json.loads(load_schema('json'), object_pairs_hook=swagger_dict))
+    return swagger
+
+
+@lru_cache()
+def get_schema_view():
+    """
+    drf_yasg's schema view, serving the schema from load_schema() unless
+    API_SCHEMA_LIVE is set, to the docs page as well as to spec downloads.
+    """
+    from drf_yasg.views import get_schema_view as yasg_schema_view
+
+    base_view = yasg_schema_view(
+        schema_info(),
+        urlconf=SCHEMA_URLCONF,
+        public=True,
+        permission_classes=(permissions.AllowAny, ),
+    )
+
+    class CachedSchemaView(base_view):
+        def get(self, request, version='', format=None):
+            if settings.API_SCHEMA_LIVE:
+                return super().get(request, version, format)
+            renderer = request.accepted_renderer
+            # Only the spec renderers (JSON/YAML) carry a codec; the docs
+            # page renders from a Swagger object.
+            if getattr(renderer, 'codec_class', None) is None:
+                return Response(load_swagger())
+            fmt = 'yaml' if renderer.format == '.yaml' else 'json'
+            return HttpResponse(load_schema(fmt),
+                                content_type=renderer.media_type)
+
+    return CachedSchemaView
+
+
+def lazy_view(factory):
+    """
+    Defers building the view returned by `factory()`, and so importing
+    drf_yasg, until the first request to it.
+    """
+    view = None
+
+    @csrf_exempt
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = factory()
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@lazy_view
+def docs_view():
+    return get_schema_view().with_ui('redoc', cache_timeout=0)
+
+
+@lazy_view
+def schema_file_view():
+    return get_schema_view().without_ui(cache_timeout=0)
@@ -1,19 +1,167 @@
-import collections
+import collections.abc
+import sys
+from collections import namedtuple
+from django.core.exceptions import FieldDoesNotExist
 from django.utils import timezone
 from drf_extra_fields.fields import FloatRangeField, IntegerRangeField
 from drf_extra_fields.geo_fields import PointField
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.reverse import reverse
 from wagtail.images.api.fields import ImageRenditionField
 from ..bathouse.models import (Bat, House, HouseEnvironmentFeatures,
-                               HousePhysicalFeatures, Observation)
+                               HousePhysicalFeatures, Observation,
+                               ObservationPhoto)
+from ..jobs import registry
+from ..jobs.models import Job
 
 OTHER = "OT"
 
+CHOICES_PARAM = 'choices'
+CHOICES_CODES = 'codes'
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def requested_fields(request):
+    """
+    Returns the sets of field names from `?fields=` and `?expand=`.
+    """
+    if request is None:
+        return set(), set()
+    return tuple({
+        name.strip()
+        for name in request.GET.get(param, '').split(',') if name.strip()
+    } for param in (FIELDS_PARAM, EXPAND_PARAM))
+
 
 class ChoiceField(serializers.ChoiceField):
+    """
+    Represents choices by their label, or by their code when the request
+    asks for `?choices=codes`. Codes are a fraction of the size of labels
+    such as "Valley or Bottomland Hillside"; clients map them back with the
+    dictionary served by ChoicesView.
+    """
+
     def to_representation(self, obj):
+        if self.use_codes:
+            return obj
         return self._choices[obj]
 
+    @property
+    def use_codes(self):
+        request = self.context.get('request')
+        return (request is not None
+                and request.GET.get(CHOICES_PARAM) == CHOICES_CODES)
+
+
+class SparseFieldsMixin:
+    """
+    Lets clients shape the representation:
+
+    `?fields=id,location` returns only those fields.
+    `?expand=observations` embeds related objects named in
+    `expandable_fields`, which maps a field name to the name of the
+    serializer that renders it and whether it is a to-many relation.
+
+    `optimize_queryset` carries the same selection through to the database,
+    so unrequested columns aren't read and expansions don't cost a query
+    per object. Only the top-level resource is shaped; embedded objects are
+    always complete. Serializers validating a write keep all their fields,
+    so `?fields=` on a POST or PATCH never drops what was sent.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        fields, expand = requested_fields(request)
+        for name in expand & set(self.expandable_fields):
+            serializer_class, many = self.get_expandable(name)
+            self.fields[name] = serializer_class(many=many, read_only=True)
+        if fields and self.only_renders(request):
+            for name in set(self.fields) - fields - expand:
+                self.fields.pop(name)
+
+    def only_renders(self, request):
+        return (not hasattr(self, 'initial_data')
+                or request.method in SAFE_METHODS)
+
+    @classmethod
+    def get_expandable(cls, name):
+        serializer_name, many = cls.expandable_fields[name]
+        return getattr(sys.modules[__name__], serializer_name), many
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        fields, expand = requested_fields(request)
+        expand &= set(cls.expandable_fields)
+        meta = queryset.model._meta
+        attnames = {f.attname: f for f in meta.concrete_fields}
+        # Columns can only be left out when we know what every requested
+        # field reads.
+        deferrable = bool(fields)
+        only = {meta.pk.name}
+        select = set()
+        prefetch = set()
+
+        for name, field in cls().fields.items():
+            if fields and name not in fields:
+                continue
+            attrs = field.source.split('.')
+            if attrs[0] in attnames:
+                # e.g. `house_id`, readable without a join.
+                only.add(attnames[attrs[0]].name)
+                continue
+            try:
+                model_field = meta.get_field(attrs[0])
+            except FieldDoesNotExist:
+                # The whole object ('*'), a property or a method.
+                deferrable = False
+                continue
+            if model_field.many_to_one or model_field.one_to_one:
+                only.add(model_field.name)
+                if len(attrs) > 1:
+                    select.add(model_field.name)
+                    only.add('__'.join(attrs))
+                elif not isinstance(field, serializers.PrimaryKeyRelatedField):
+                    select.add(model_field.name)
+            elif model_field.concrete:
+                only.add(model_field.name)
+            else:
+                prefetch.add(model_field.name)
+
+        for name in expand:
+            model_field = meta.get_field(name)
+            if model_field.many_to_one or model_field.one_to_one:
+                only.add(name)
+                select.add(name)
+            else:
+                prefetch.add(name)
+
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if deferrable:
+            queryset = queryset.only(*only)
+        return queryset
+
+
+class ConditionalRule(
+        namedtuple(
+            'ConditionalRule',
+            ('master_field', 'condition', 'triggers', 'required_fields'))):
+    """
+    A compiled entry of `conditional_required_fields`.
+    """
+
+    def triggered(self, value):
+        # Array fields trigger when any selected choice matches.
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return not self.triggers.isdisjoint(value)
+        return value in self.triggers
+
 
 class ConditionalRequiredMixin:
     """
@@ -29,38 +177,60 @@ class ConditionalRequiredMixin:
     ]
 
     If property_type == OTHER, then fields in required_fields are required.
+    For array fields, the rule applies when OTHER is one of the choices.
+    A condition can also be a list of values, any of which triggers it.
 
+    `conditional_errors` checks many records at once, for bulk loads.
     """
     REQUIRED_MSG = "Field is required due to {} being {}."
     conditional_required_fields = []
 
+    @classmethod
+    def conditional_rules(cls):
+        # Compiled once per class; subclasses get their own.
+        rules = cls.__dict__.get('_conditional_rules')
+        if rules is None:
+            rules = []
+            for master_field, conditions in cls.conditional_required_fields:
+                condition = conditions['condition']
+                if isinstance(condition, str) or not isinstance(
+                        condition, collections.abc.Iterable):
+                    triggers = frozenset([condition])
+                else:
+                    triggers = frozenset(condition)
+                rules.append(
+                    ConditionalRule(master_field, condition, triggers,
+                                    tuple(conditions['required_fields'])))
+            rules = cls._conditional_rules = tuple(rules)
+        return rules
+
+    @classmethod
+    def conditional_errors(cls, records):
+        """
+        Checks validated records against every rule. Returns, for each
+        record, a dict of {field: message} that is empty if it passes.
+        """
+        errors = [{} for _ in records]
+        for rule in cls.conditional_rules():
+            message = cls.REQUIRED_MSG.format(rule.master_field,
+                                              rule.condition)
+            for record, record_errors in zip(records, errors):
+                if not rule.triggered(record.get(rule.master_field)):
+                    continue
+                for field in rule.required_fields:
+                    if record.get(field) is None:
+                        record_errors.setdefault(field, message)
+        return errors
+
     def validate(self, attrs):
         attrs = super().validate(attrs)
-        for master_field, conditions in self.conditional_required_fields:
-            master_field_value = attrs.get(master_field)
-            condition = conditions['condition']
-            if not isinstance(condition, str) and isinstance(
-                    condition, collections.Iterable):
-                trigger = master_field_value in condition
-            else:
-                trigger = master_field_value == condition
-
-            if trigger:
-                additional_required_fields = conditions['required_fields']
-                absent_fields = [
-                    f for f in additional_required_fields
-                    if attrs.get(f) is None
-                ]
-                if absent_fields:
-                    error_dict = {
-                        f: self.REQUIRED_MSG.format(master_field, condition)
-                        for f in absent_fields
-                    }
-                    raise serializers.ValidationError(error_dict)
+        errors = self.conditional_errors([attrs])[0]
+        if errors:
+            raise serializers.ValidationError(errors)
         return attrs
 
 
-class BatSerializer(serializers.ModelSerializer):
+class BatSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     # TODO: Get current image to display an absolute path over API
     id = serializers.ReadOnlyField()
     rarity = ChoiceField(choices=Bat.RARITY_CHOICES)
@@ -79,7 +249,13 @@ class BatSerializer(serializers.ModelSerializer):
                   'size', 'pups', 'risk', 'risk_scope', 'bat_image')
 
 
-class HouseSerializer(ConditionalRequiredMixin, serializers.ModelSerializer):
+class HouseSerializer(SparseFieldsMixin, ConditionalRequiredMixin,
+                      serializers.ModelSerializer):
+    expandable_fields = {
+        'environment_features': ('HouseEnvironmentFeaturesSerializer', True),
+        'physical_features': ('HousePhysicalFeaturesSerializer', True),
+        'observations': ('ObservationSerializer', True),
+    }
     conditional_required_fields = [('property_type', {
         'condition': OTHER,
         'required_fields': ['other_property_type']
@@ -96,12 +272,14 @@ class HouseSerializer(ConditionalRequiredMixin, serializers.ModelSerializer):
 
     class Meta:
         model = House
-        fields = ('__all__')
+        exclude = ('search_vector', 'source_ref')
         read_only_fields = ('id', 'watcher', 'created', 'updated')
 
 
-class HouseEnvironmentFeaturesSerializer(ConditionalRequiredMixin,
+class HouseEnvironmentFeaturesSerializer(SparseFieldsMixin,
+                                         ConditionalRequiredMixin,
                                          serializers.ModelSerializer):
+    expandable_fields = {'house': ('HouseSerializer', False)}
     conditional_required_fields = [
         ('habitat_degradation', {
             'condition': OTHER,
@@ -157,8 +335,9 @@ class HouseEnvironmentFeaturesSerializer(ConditionalRequiredMixin,
     other_features = serializers.CharField(required=False)
 
     def create(self, validated_data):
-        house = House.objects.get(pk=self.context["view"].kwargs["house_pk"])
-        validated_data["house"] = house
+        if "house" not in validated_data:
+            validated_data["house"] = House.objects.get(
+                pk=self.context["view"].kwargs["house_pk"])
         return HouseEnvironmentFeatures.objects.create(**validated_data)
 
     class Meta:
@@ -166,8 +345,10 @@ class HouseEnvironmentFeaturesSerializer(ConditionalRequiredMixin,
         fields = ('__all__')
 
 
-class HousePhysicalFeaturesSerializer(ConditionalRequiredMixin,
+class HousePhysicalFeaturesSerializer(SparseFieldsMixin,
+                                      ConditionalRequiredMixin,
                                       serializers.ModelSerializer):
+    expandable_fields = {'house': ('HouseSerializer', False)}
     conditional_required_fields = [('color', {
         'condition': OTHER,
         'required_fields': ['other_color']
@@ -188,8 +369,9 @@ class HousePhysicalFeaturesSerializer(ConditionalRequiredMixin,
         choices=HousePhysicalFeatures._meta.get_field('mounted_on').choices)
 
     def create(self, validated_data):
-        house = House.objects.get(pk=self.context["view"].kwargs["house_pk"])
-        validated_data["house"] = house
+        if "house" not in validated_data:
+            validated_data["house"] = House.objects.get(
+                pk=self.context["view"].kwargs["house_pk"])
         return HousePhysicalFeatures.objects.create(**validated_data)
 
     class Meta:
@@ -197,17 +379,144 @@ class HousePhysicalFeaturesSerializer(ConditionalRequiredMixin,
         fields = ('__all__')
 
 
-class ObservationSerializer(serializers.ModelSerializer):
+class SpeciesCountsField(serializers.Field):
+    """
+    Observation.species and species_counts as one list:
+    `[{"bat": 3, "count": 12}, ...]`.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, observation):
+        return [{
+            'bat': bat,
+            'count': count
+        } for bat, count in zip(observation.species,
+                                observation.species_counts)]
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not all(
+                isinstance(item, dict) for item in data):
+            raise serializers.ValidationError(
+                'Expected a list of {"bat": id, "count": number}.')
+        try:
+            pairs = [(int(item['bat']), int(item['count'])) for item in data]
+        except (KeyError, TypeError, ValueError):
+            raise serializers.ValidationError(
+                'Expected a list of {"bat": id, "count": number}.')
+        bats = [bat for bat, _ in pairs]
+        if len(set(bats)) != len(bats):
+            raise serializers.ValidationError("Each bat may appear once.")
+        if any(count < 0 for _, count in pairs):
+            raise serializers.ValidationError("Counts can't be negative.")
+        unknown = set(bats) - set(
+            Bat.objects.filter(pk__in=bats).values_list('pk', flat=True))
+        if unknown:
+            raise serializers.ValidationError("Unknown bats: {}.".format(
+                ', '.join(map(str, sorted(unknown)))))
+        return {
+            'species': bats,
+            'species_counts': [count for _, count in pairs]
+        }
+
+
+class ObservationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'house': ('HouseSerializer', False)}
     id = serializers.ReadOnlyField()
     house_id = serializers.ReadOnlyField()
     acoustic_monitor = ChoiceField(
         choices=Observation._meta.get_field('acoustic_monitor').choices)
+    species = SpeciesCountsField(required=False)
 
     def create(self, validated_data):
-        house = House.objects.get(pk=self.context["view"].kwargs["house_pk"])
-        validated_data["house"] = house
+        if "house" not in validated_data:
+            validated_data["house"] = House.objects.get(
+                pk=self.context["view"].kwargs["house_pk"])
         return Observation.objects.create(**validated_data)
 
     class Meta:
         model = Observation
-        fields = ('__all__')
+        exclude = ('species_counts', )
+
+
+class ObservationPhotoSerializer(serializers.ModelSerializer):
+    renditions = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ObservationPhoto
+        fields = ('id', 'observation', 'caption', 'created', 'renditions')
+        read_only_fields = fields
+
+    def get_renditions(self, photo):
+        """
+        URLs by rendition name, null until the job has generated them: the
+        API never renders an image itself.
+        """
+        if photo.rendered is None:
+            return None
+        return {
+            name: photo.image.get_rendition(filter_spec).url
+            for name, filter_spec in ObservationPhoto.RENDITIONS.items()
+        }
+
+
+def optional_choice(model, name):
+    return serializers.ChoiceField(choices=model._meta.get_field(name).choices,
+                                   required=False)
+
+
+class SiteSerializer(serializers.Serializer):
+    """
+    The features of a proposed bat house site, to score its suitability.
+    All are optional; the model treats missing ones as average.
+    """
+    direction = optional_choice(HousePhysicalFeatures, 'direction')
+    color = optional_choice(HousePhysicalFeatures, 'color')
+    habitat_type = serializers.ListField(
+        required=False,
+        child=serializers.ChoiceField(
+            choices=HouseEnvironmentFeatures.HABITAT_TYPE_CHOICES))
+    night_light_pollution_amount = optional_choice(
+        HouseEnvironmentFeatures, 'night_light_pollution_amount')
+    morning_sunlight = serializers.IntegerField(min_value=0, required=False)
+    afternoon_sunlight = serializers.IntegerField(min_value=0, required=False)
+    water_resource_distance = serializers.IntegerField(min_value=1,
+                                                       required=False)
+    water_resource_units = optional_choice(HouseEnvironmentFeatures,
+                                           'water_resource_units')
+
+    def validate(self, data):
+        if ('water_resource_distance' in data) != (
+                'water_resource_units' in data):
+            raise serializers.ValidationError(
+                "Give water_resource_distance with water_resource_units.")
+        return data
+
+
+class JobSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField()
+    status = ChoiceField(choices=Job.STATUS_CHOICES, read_only=True)
+    download = serializers.SerializerMethodField()
+
+    def get_download(self, job):
+        if job.status != Job.SUCCEEDED or not (job.result or {}).get('file'):
+            return None
+        return reverse('job-download',
+                       args=[job.pk],
+                       request=self.context.get('request'))
+
+    def validate_name(self, value):
+        if value not in registry.public_tasks():
+            raise serializers.ValidationError(
+                "Unknown job. Choose one of: {}.".format(', '.join(
+                    registry.public_tasks())))
+        return value
+
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'payload', 'status', 'attempts', 'run_at',
+                  'result', 'download', 'last_error', 'created', 'updated')
+        read_only_fields = ('attempts', 'run_at', 'result', 'last_error',
+                            'created', 'updated')
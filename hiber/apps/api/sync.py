@@ -0,0 +1,207 @@
+"""
+Synchronous building blocks for the sync, change feed and export endpoints.
+
+Both the WSGI views and the ASGI consumers are thin wrappers around these
+functions, so the two serving paths return identical data.
+"""
+import csv
+import io
+import json
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from hiber.db.routers import use_replica
+from ..bathouse import changefeed
+from ..bathouse.models import House, Observation
+from .serializers import ObservationSerializer
+
+# How often a long-poll re-checks for changes, and the longest a client may
+# ask to wait before getting an empty answer.
+CHANGES_POLL_INTERVAL = 1.0
+CHANGES_MAX_TIMEOUT = 55
+
+# The change feed sends a comment when nothing happened for FEED_KEEPALIVE
+# seconds, so proxies keep the connection open, and ends the stream after
+# FEED_MAX_SECONDS; EventSource clients reconnect on their own.
+FEED_KEEPALIVE = 15
+FEED_MAX_SECONDS = 5 * 60
+FEED_HEADERS = [(b'Content-Type', b'text/event-stream'),
+                (b'Cache-Control', b'no-cache'), (b'X-Accel-Buffering', b'no')]
+FEED_KEEPALIVE_COMMENT = b': keepalive\n\n'
+
+EXPORT_BATCH_SIZE = 2000
+EXPORT_COLUMNS = ('id', 'house_id', 'checked', 'present', 'occupants',
+                  'acoustic_monitor', 'notes')
+
+BULK_SYNC_MAX_RECORDS = 1000
+
+
+def user_for_token(key):
+    """
+    Returns the active user owning the given API token, or None.
+    """
+    try:
+        token = Token.objects.select_related('user').get(key=key)
+    except Token.DoesNotExist:
+        return None
+    return token.user if token.user.is_active else None
+
+
+def parse_changes_params(params):
+    """
+    Reads `since` (ISO 8601) and `timeout` (seconds) from a mapping of query
+    parameters.
+    """
+    since = parse_datetime(params.get('since') or '')
+    if since is None:
+        raise serializers.ValidationError(
+            {'since': ["An ISO 8601 datetime is required."]})
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, timezone.utc)
+    try:
+        timeout = float(params.get('timeout', 25))
+    except ValueError:
+        raise serializers.ValidationError(
+            {'timeout': ["A number of seconds is required."]})
+    return since, max(0.0, min(timeout, CHANGES_MAX_TIMEOUT))
+
+
+def changed_houses(user, since):
+    """
+    Returns ids of the user's houses updated after `since`.
+    """
+    return list(
+        House.objects.filter(watcher=user,
+                             updated__gt=since).values_list('id', flat=True))
+
+
+def touch_houses(house_ids):
+    """
+    Bumps `updated` on houses whose features or observations were written,
+    for long-polling clients, and clients catching up after the change feed,
+    to pick up the new data.
+    """
+    House.objects.filter(id__in=house_ids).update(updated=timezone.now())
+
+
+def changes_response(house_ids, now):
+    return {'server_time': now.isoformat(), 'houses': house_ids}
+
+
+def watched_house_ids(user):
+    return set(House.objects.filter(watcher=user).values_list('id', flat=True))
+
+
+def follows(change, user, house_ids):
+    """
+    Whether the user's feed carries `change`. Keeps `house_ids`, the user's
+    houses, current as houses are created, deleted or change watcher.
+    """
+    house = change['house']
+    if change['model'] != 'house':
+        return house in house_ids
+    was_watched = house in house_ids
+    if change['action'] != 'delete' and change['watcher'] == user.pk:
+        house_ids.add(house)
+        return True
+    house_ids.discard(house)
+    return was_watched
+
+
+def feed_ready(now):
+    """
+    The first event of a feed. Clients catch up on what they missed while
+    disconnected from /sync/changes, using `server_time` as `since`.
+    """
+    return sse_event('ready', {'server_time': now.isoformat()})
+
+
+def feed_change(change, event_id):
+    return sse_event('change', change, event_id)
+
+
+def sse_event(name, data, event_id=None):
+    lines = [f'event: {name}', f'data: {json.dumps(data)}']
+    if event_id is not None:
+        lines.insert(0, f'id: {event_id}')
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def export_storage():
+    """
+    Where export jobs write their files, outside of MEDIA_ROOT.
+    """
+    return FileSystemStorage(location=settings.EXPORT_DIR)
+
+
+def export_header():
+    return csv_rows([EXPORT_COLUMNS])
+
+
+@use_replica()
+def export_batch(user, after_id=0, size=EXPORT_BATCH_SIZE):
+    """
+    Returns the next batch of the user's observations as CSV bytes, and the
+    id to continue after. Keyset pagination keeps every batch an index range
+    scan, no matter how deep into the export we are. Exports are reporting
+    traffic, so they are always read from a replica.
+    """
+    rows = list(
+        Observation.objects.filter(house__watcher=user,
+                                   id__gt=after_id).order_by('id').values_list(
+                                       *EXPORT_COLUMNS)[:size])
+    if not rows:
+        return b'', None
+    return csv_rows(rows), rows[-1][0]
+
+
+def csv_rows(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+    return buffer.getvalue().encode('utf-8')
+
+
+def bulk_create_observations(user, records):
+    """
+    Validates and stores many observations in a single transaction.
+
+    Returns the created observations. Raises ValidationError with the errors
+    of each record, in order, if any record is invalid or targets a house the
+    user does not watch.
+    """
+    if not isinstance(records, list):
+        raise serializers.ValidationError(
+            {'non_field_errors': ["Expected a list of observations."]})
+    if len(records) > BULK_SYNC_MAX_RECORDS:
+        raise serializers.ValidationError({
+            'non_field_errors':
+            [f"At most {BULK_SYNC_MAX_RECORDS} observations per request."]
+        })
+
+    serializer = ObservationSerializer(data=records, many=True)
+    serializer.is_valid(raise_exception=True)
+    house_ids = {attrs['house'].id for attrs in serializer.validated_data}
+    owned = set(
+        House.objects.filter(watcher=user,
+                             id__in=house_ids).values_list('id', flat=True))
+    if house_ids - owned:
+        raise serializers.ValidationError(
+            [{} if attrs['house'].id in owned else {
+                'house': ["You are not the watcher of this house."]
+            } for attrs in serializer.validated_data])
+
+    with transaction.atomic():
+        created = Observation.objects.bulk_create(
+            [Observation(**attrs) for attrs in serializer.validated_data])
+        touch_houses(house_ids)
+        # bulk_create() sends no signals.
+        changefeed.publish([
+            changefeed.event(observation, 'create') for observation in created
+        ])
+    return created
@@ -0,0 +1,23 @@
+import secrets
+import tempfile
+from django.core.files import File
+from hiber.apps.jobs.registry import task
+from . import sync
+
+
+@task(public=True)
+def export_observations(job):
+    """
+    Writes all of the submitter's observations to a CSV file, under a name
+    nobody can guess, for them to download from the job.
+    """
+    with tempfile.TemporaryFile() as f:
+        f.write(sync.export_header())
+        chunk, after = sync.export_batch(job.owner)
+        while after is not None:
+            f.write(chunk)
+            chunk, after = sync.export_batch(job.owner, after)
+        f.seek(0)
+        name = sync.export_storage().save(
+            f"observations-{secrets.token_urlsafe(24)}.csv", File(f))
+    return {'file': name}
@@ -1,2 +1,322 @@
+import json
+import os
+from types import SimpleNamespace
+import pytest
+from asgiref.sync import async_to_sync
+from channels.http import AsgiHandler
+from channels.testing import HttpCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.http import Http404
+from django.test import RequestFactory
+from drf_yasg.generators import OpenAPISchemaGenerator
+from rest_framework import exceptions
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from ..bathouse.models import House
+from . import batch, consumers, photos, schema
+from .imports import SurveyImporter, SurveyImportError
+from .serializers import (OTHER, HouseEnvironmentFeaturesSerializer,
+                          HouseSerializer)
+from .sync import follows
+from .throttling import take
+
+
 def test_hello_world():
     assert "hello_world" == "hello_world"
+
+
+def test_conditional_errors_per_record():
+    errors = HouseSerializer.conditional_errors([
+        {
+            'property_type': OTHER
+        },
+        {
+            'property_type': OTHER,
+            'other_property_type': "Church"
+        },
+        {
+            'property_type': 'ST'
+        },
+    ])
+    assert errors == [
+        {
+            'other_property_type':
+            "Field is required due to property_type being OT."
+        },
+        {},
+        {},
+    ]
+
+
+def test_conditional_errors_on_array_fields():
+    errors = HouseEnvironmentFeaturesSerializer.conditional_errors([
+        {
+            'habitat_type': ['FE', OTHER]
+        },
+        {
+            'habitat_type': ['FE']
+        },
+    ])
+    assert set(errors[0]) == {'other_habitat_type'}
+    assert errors[1] == {}
+
+
+def test_sparse_fields_only_shape_output():
+    factory = APIRequestFactory()
+    read = factory.get('/api/v1/houses', {'fields': 'id'})
+    assert set(HouseSerializer(context={'request': read}).fields) == {'id'}
+    for write in (factory.post('/api/v1/houses?fields=id'),
+                  factory.patch('/api/v1/houses/1?fields=id')):
+        serializer = HouseSerializer(data={}, context={'request': write})
+        assert {'id', 'location', 'property_type'} <= set(serializer.fields)
+
+
+def test_feed_follows_houses_as_they_change_hands():
+    user = SimpleNamespace(pk=1)
+    house_ids = {10}
+    observation = {'model': 'observation', 'action': 'create', 'house': 11}
+    assert follows({**observation, 'house': 10}, user, house_ids)
+    assert not follows(observation, user, house_ids)
+    assert follows(
+        {
+            'model': 'house',
+            'action': 'create',
+            'house': 11,
+            'watcher': 1
+        }, user, house_ids)
+    assert follows(observation, user, house_ids)
+    # Handing a house over is the last event about it the user sees.
+    assert follows(
+        {
+            'model': 'house',
+            'action': 'update',
+            'house': 10,
+            'watcher': 2
+        }, user, house_ids)
+    assert house_ids == {11}
+
+
+def test_token_bucket_refills_up_to_capacity(settings):
+    settings.API_THROTTLE_BUCKETS = {'test': {'capacity': 3, 'rate': 1.0}}
+    now = 1000.0
+    assert [take('test', 'a', now).allowed
+            for _ in range(4)] == [True, True, True, False]
+    assert take('test', 'a', now).wait == 1
+    assert take('test', 'a', now + 1).remaining == 0
+    # A long pause fills the bucket, but no further.
+    assert [take('test', 'a', now + 600).allowed
+            for _ in range(4)] == [True, True, True, False]
+
+
+def test_batch_rejects_other_paths_and_nesting(settings):
+    settings.API_BATCH_MAX_REQUESTS = 2
+    paths = ['/admin/', '/api/v1/batch', '/api/v1/bats?fields=id']
+    valid = [
+        batch.BatchSerializer(data={
+            'requests': [{
+                'path': path
+            }]
+        }).is_valid() for path in paths
+    ]
+    assert valid == [False, False, True]
+    too_many = [{'path': '/api/v1/bats'}] * 3
+    assert not batch.BatchSerializer(data={'requests': too_many}).is_valid()
+
+
+def test_batch_reports_each_failure_on_its_own(monkeypatch):
+    def created(request):
+        return Response({'id': 1}, status=201)
+
+    def missing(request):
+        raise Http404()
+
+    def broken(request):
+        raise RuntimeError("Broken view")
+
+    views = {
+        '/api/v1/' + view.__name__: view
+        for view in (broken, created, missing)
+    }
+    monkeypatch.setattr(
+        batch, 'resolve', lambda path: SimpleNamespace(
+            func=views[path], args=(), kwargs={}))
+    request = APIRequestFactory().post('/api/v1/batch')
+    request.user = SimpleNamespace(pk=1)
+    request.auth = None
+    items = [{'method': 'POST', 'path': path} for path in views]
+    responses = batch.run(request, items)
+    assert [response['status'] for response in responses] == [500, 201, 404]
+    assert responses[1]['body'] == {'id': 1}
+
+
+def test_consumer_without_a_handler_answers_405(monkeypatch):
+    async def authenticate(self):
+        return SimpleNamespace(pk=1)
+
+    monkeypatch.setattr(consumers.TokenAuthHttpConsumer, 'authenticate',
+                        authenticate)
+    communicator = HttpCommunicator(consumers.TokenAuthHttpConsumer, 'PUT',
+                                    '/api/v1/sync/changes')
+    response = async_to_sync(communicator.get_response)()
+    assert response['status'] == 405
+
+
+def test_only_the_consumer_urls_skip_django_middleware():
+    from hiber.routing import application
+    routes = application.application_mapping['http'].routes
+    around_middleware = [
+        str(route.pattern) for route in routes
+        if route.callback is not AsgiHandler
+    ]
+    assert around_middleware == [
+        'api/v1/sync/changes', 'api/v1/sync/feed', 'api/v1/sync/observations',
+        'api/v1/export/observations.csv', 'api/v1/observations/<int:pk>/photos'
+    ]
+    # Everything else, CORS and compression included, is Django's.
+    assert routes[-1].callback is AsgiHandler
+
+
+def test_schema_leaves_the_host_to_the_client():
+    spec = json.loads(schema.build_schema()['json'])
+    assert 'host' not in spec
+    assert 'schemes' not in spec
+
+
+def test_docs_page_serves_the_cached_schema(monkeypatch, settings):
+    settings.API_SCHEMA_LIVE = False
+    cached = {'swagger': '2.0', 'info': {'title': "Cached", 'version': 'v1'}}
+    monkeypatch.setattr(
+        schema, 'load_schema', lambda fmt: json.dumps(cached).encode('utf-8'))
+
+    def introspect(*args, **kwargs):
+        raise AssertionError("The docs page generated the schema.")
+
+    monkeypatch.setattr(OpenAPISchemaGenerator, 'get_schema', introspect)
+    response = schema.docs_view(RequestFactory().get('/api/v1/docs/'))
+    response.render()
+    assert response.status_code == 200
+    assert b'Cached' in response.content
+
+
+def write_houses(path, count):
+    lines = ['ref,watcher,latitude,longitude,property_type']
+    lines += [f'H{i},surveyor,{40 + i},-72,State' for i in range(count)]
+    path.write('\n'.join(lines) + '\n')
+
+
+@pytest.mark.django_db
+def test_interrupted_import_resumes_after_the_last_batch(tmpdir):
+    get_user_model().objects.create_user('surveyor')
+    survey = tmpdir.join('houses.csv')
+    write_houses(survey, 5)
+
+    run = SurveyImporter('houses', str(survey), batch_size=2).run()
+    assert next(run).line == 3
+    # The worker dies after its first batch.
+    run.close()
+    assert House.objects.count() == 2
+
+    for progress in SurveyImporter('houses', str(survey), batch_size=2).run():
+        pass
+    assert (progress.line, progress.imported) == (6, 5)
+    assert progress.finished is not None
+    refs = House.objects.order_by('source_ref').values_list('source_ref',
+                                                            flat=True)
+    assert list(refs) == ['H0', 'H1', 'H2', 'H3', 'H4']
+
+
+@pytest.mark.django_db
+def test_import_rejects_duplicates_within_a_batch(tmpdir):
+    get_user_model().objects.create_user('surveyor')
+    survey = tmpdir.join('houses.csv')
+    # About 8 m apart.
+    survey.write('ref,watcher,latitude,longitude,property_type\n'
+                 'H0,surveyor,42,-72,State\n'
+                 'H1,surveyor,42,-72.0001,State\n')
+    for progress in SurveyImporter('houses', str(survey)).run():
+        pass
+    assert (progress.imported, progress.rejected) == (1, 1)
+    assert House.objects.get().source_ref == 'H0'
+
+
+@pytest.mark.django_db
+def test_import_refuses_to_resume_a_changed_file(tmpdir):
+    get_user_model().objects.create_user('surveyor')
+    survey = tmpdir.join('houses.csv')
+    write_houses(survey, 3)
+    next(SurveyImporter('houses', str(survey), batch_size=2).run())
+    write_houses(survey, 4)
+    with pytest.raises(SurveyImportError):
+        next(SurveyImporter('houses', str(survey), batch_size=2).run())
+
+
+@pytest.mark.django_db
+def test_house_features_are_validated_before_saving():
+    user = get_user_model().objects.create_user('surveyor')
+    house = House.objects.create(watcher=user,
+                                 location=Point(-72, 42),
+                                 property_type='ST')
+    client = APIClient()
+    client.force_authenticate(user)
+    url = f'/api/v1/houses/{house.pk}/physical'
+    physical = {
+        'house_size': 'S',
+        'color': 'OT',
+        'chambers': 2,
+        'direction': 'SO',
+        'mounted_on': 'PI',
+        'ground_height': 12,
+        'installed': '2018-05-01',
+    }
+    response = client.post(url, physical, format='json')
+    assert response.status_code == 400
+    assert set(response.data) == {'other_color'}
+    assert not house.physical_features.exists()
+
+    physical['other_color'] = "Green"
+    response = client.post(url, physical, format='json')
+    assert response.status_code == 201
+    assert response.data['house_id'] == house.pk
+
+
+def test_photo_uploads_are_refused_early(settings):
+    settings.WAGTAILIMAGES_MAX_UPLOAD_SIZE = 10
+    attachment = 'attachment; filename="roost.jpg"'
+    with pytest.raises(photos.PhotoTooLarge):
+        photos.temporary_upload(attachment, 'image/jpeg', '11')
+    with pytest.raises(exceptions.ParseError):
+        photos.temporary_upload('attachment', 'image/jpeg', '5')
+    # Uploads without a Content-Length are checked as they arrive.
+    upload = photos.temporary_upload(attachment, 'image/jpeg', '')
+    photos.write_chunk(upload, b'12345')
+    with pytest.raises(photos.PhotoTooLarge):
+        photos.write_chunk(upload, b'123456')
+    upload.close()
+
+
+def test_failed_photo_upload_answers_500_and_removes_the_file(monkeypatch):
+    paths = []
+
+    async def authenticate(self):
+        return SimpleNamespace(pk=1)
+
+    def create_photo(user, observation_id, upload, caption=''):
+        paths.append(upload.temporary_file_path())
+        raise OSError("The storage is full.")
+
+    monkeypatch.setattr(consumers.TokenAuthHttpConsumer, 'authenticate',
+                        authenticate)
+    monkeypatch.setattr(consumers.ObservationPhotoConsumer, 'observation_id',
+                        1)
+    monkeypatch.setattr(photos, 'create_photo', create_photo)
+    communicator = HttpCommunicator(consumers.ObservationPhotoConsumer,
+                                    'POST',
+                                    '/api/v1/observations/1/photos',
+                                    body=b'not really a jpeg',
+                                    headers=[(b'content-disposition',
+                                              b'attachment; filename="a.jpg"')
+                                             ])
+    response = async_to_sync(communicator.get_response)()
+    assert response['status'] == 500
+    assert not os.path.exists(paths[0])
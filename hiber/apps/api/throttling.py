@@ -0,0 +1,136 @@
+"""
+Token bucket rate limits, kept in the shared cache.
+
+Each client (user, or address when anonymous) has a bucket per scope
+(API_THROTTLE_BUCKETS): `read` and `write` by request method, and the
+scopes that views name themselves, such as `bulk` and `batch`. A bucket
+holds up to `capacity` tokens and gains `rate` per second; every request
+takes one, and requests finding it empty get a 429 with Retry-After.
+
+A bucket is a single counter of the tokens taken since the start of the
+day, moved with atomic incr(), so concurrent workers never race. The tokens
+left are `capacity + rate * seconds into the day - taken`. A client back
+from a quiet spell would have more than `capacity`; the counter is then
+raised to make up the difference. One request at a time does that, holding
+a lock and reading the counter afresh, so the difference is made up once.
+Each day starts with a fresh counter, so a bucket is full at midnight UTC.
+
+Every worker must see the same counters: production refuses to start with
+a per-process cache (see hiber.cache).
+
+A throttled request is refused before the view runs a query of its own, for
+one or two cache round trips. If the cache can't be reached, requests are
+let through.
+"""
+import math
+import time
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+DAY = 24 * 60 * 60
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+Bucket = namedtuple('Bucket', ('allowed', 'limit', 'remaining', 'wait'))
+
+
+def take(scope, ident, now=None):
+    """
+    Takes a token from the client's bucket for `scope`. Returns a Bucket.
+    """
+    config = settings.API_THROTTLE_BUCKETS[scope]
+    capacity, rate = config['capacity'], config['rate']
+    now = time.time() if now is None else now
+    day, seconds = divmod(now, DAY)
+    key = f'throttle:{scope}:{ident}:{int(day)}'
+    refilled = int(seconds * rate)
+
+    taken = incr(key)
+    if taken is None:
+        return Bucket(True, capacity, capacity, None)
+    if taken - 1 < refilled:
+        taken = forfeit_excess(key, refilled) or taken
+    left = min(capacity, capacity + refilled - taken)
+    if left >= 0:
+        return Bucket(True, capacity, left, None)
+    # Denied requests don't cost a token.
+    incr(key, -1)
+    return Bucket(False, capacity, 0, math.ceil((-left) / rate))
+
+
+def forfeit_excess(key, refilled):
+    """
+    Raises the counter to `refilled` tokens taken before this request, so
+    the bucket holds no more than `capacity`. Corrections are serialized
+    and each reads the counter under the lock, so one already made by
+    another request, seconds ago or just now, is never made again. Returns
+    the new counter, or None when another request holds the lock.
+    """
+    lock = f'{key}:refill'
+    if not cache.add(lock, 1, 10):
+        return None
+    try:
+        taken = cache.get(key)
+        if taken is None or taken - 1 >= refilled:
+            return taken
+        return incr(key, refilled - (taken - 1))
+    finally:
+        cache.delete(lock)
+
+
+def incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:  # No such key yet.
+        cache.add(key, 0, 2 * DAY)
+        try:
+            return cache.incr(key, delta)
+        except ValueError:  # The cache is down.
+            return None
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    Throttles with take(). Views name their scope with `throttle_scope`;
+    otherwise reads and writes have a bucket each.
+    """
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            scope = 'read' if request.method in SAFE_METHODS else 'write'
+        if request.user and request.user.is_authenticated:
+            ident = f'user-{request.user.pk}'
+        else:
+            ident = self.get_ident(request)
+        self.bucket = take(scope, ident)
+        request.rate_limit = self.bucket
+        return self.bucket.allowed
+
+    def wait(self):
+        return self.bucket.wait
+
+
+def rate_limit_headers(bucket):
+    return {
+        'X-RateLimit-Limit': str(bucket.limit),
+        'X-RateLimit-Remaining': str(bucket.remaining),
+    }
+
+
+class RateLimitHeadersMixin:
+    """
+    Tells clients how much of their bucket is left, so well-behaved ones
+    can slow down before they are refused.
+    """
+    throttle_classes = (BucketThrottle, )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args,
+                                             **kwargs)
+        bucket = getattr(request, 'rate_limit', None)
+        if bucket is not None:
+            for name, value in rate_limit_headers(bucket).items():
+                response[name] = value
+        return response
@@ -1,34 +1,50 @@
+from django.apps import apps
 from django.conf.urls import url
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
-
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Bat House API",
-        default_version="v1",
-        description="API to interact with bat house monitoring",
-    ),
-    urlconf='hiber.apps.api.urls',
-    public=True,
-    permission_classes=(permissions.AllowAny, ),
-)
+from .schema import docs_view, schema_file_view
 
 router = DefaultRouter(trailing_slash=False)
 router.register(r'bats', views.BatViewSet)
 router.register(r'houses', views.HouseViewSet)
+router.register(r'jobs', views.JobViewSet)
 
 v1_urlpatterns = [
-    path('docs/',
-         schema_view.with_ui('redoc', cache_timeout=0),
-         name='schema-redoc'),
+    path('batch', views.BatchView.as_view(), name='batch'),
+    path('choices', views.ChoicesView.as_view(), name='choices'),
+    path('search', views.SearchView.as_view(), name='api-search'),
+    path('species/richness',
+         views.SpeciesRichnessView.as_view(),
+         name='species-richness'),
+    path('suitability', views.SuitabilityView.as_view(), name='suitability'),
+    path('density/<str:layer>/<int:season>/<int:z>/<int:x>/<int:y>.png',
+         views.density_tile,
+         name='density-tile'),
+    path('observations/<int:pk>/photos',
+         views.ObservationPhotoView.as_view(),
+         name='observation-photos'),
+    path('sync/changes', views.ChangesView.as_view(), name='sync-changes'),
+    path('sync/feed', views.ChangeFeedView.as_view(), name='sync-feed'),
+    path('sync/observations',
+         views.BulkObservationView.as_view(),
+         name='sync-observations'),
+    path('export/observations.csv',
+         views.ObservationExportView.as_view(),
+         name='export-observations'),
     url('^', include(router.urls)),
 ]
 
+# The docs views import drf_yasg on first use; API-only workers
+# (hiber.settings.api) leave it out altogether.
+if apps.is_installed('drf_yasg'):
+    v1_urlpatterns = [
+        path('docs/', docs_view, name='schema-redoc'),
+        url(r'^schema(?P<format>\.json|\.yaml)$',
+            schema_file_view,
+            name='schema-json'),
+    ] + v1_urlpatterns
+
 # This is to let drf_yasg auto-generate the route while excluding
 # other routes from being generated.
 urlpatterns = [url(r'api/v1/', include(v1_urlpatterns))]
@@ -1,17 +1,156 @@
-from django.http import HttpResponseServerError
-from rest_framework import status, viewsets
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from django.conf import settings
+from django.contrib.gis.geos import Polygon
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified, HttpResponseServerError,
+                         StreamingHttpResponse)
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from rest_framework import generics, mixins, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import (NotAuthenticated, NotFound,
+                                       ValidationError)
+from rest_framework.parsers import FileUploadParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework.views import APIView
+from ..bathouse import (changefeed, density, duplicates, search, species,
+                        suitability)
 from ..bathouse.models import (Bat, House, HouseEnvironmentFeatures,
                                HousePhysicalFeatures, Observation)
+from ..jobs.models import Job
+from hiber.db.middleware import PrimaryStickinessMiddleware
+from hiber.db.routers import release_primary, use_primary, use_replica
+from . import batch, photos, sync
 from .permissions import (IsOwnerAndAuthenticated)
+from .renderers import EventStreamRenderer
 from .serializers import (BatSerializer, HouseSerializer,
                           HouseEnvironmentFeaturesSerializer,
-                          HousePhysicalFeaturesSerializer,
-                          ObservationSerializer)
+                          HousePhysicalFeaturesSerializer, JobSerializer,
+                          ObservationPhotoSerializer, ObservationSerializer,
+                          SiteSerializer)
+from .throttling import RateLimitHeadersMixin
+
+
+def parse_bbox(value):
+    """
+    Parses `min_lon,min_lat,max_lon,max_lat` into a Polygon usable
+    against the spatial index on House.location.
+    """
+    try:
+        coords = [float(c) for c in value.split(',')]
+    except ValueError:
+        coords = []
+    if len(coords) != 4:
+        raise ValidationError(
+            {'in_bbox': "Expected min_lon,min_lat,max_lon,max_lat."})
+    bbox = Polygon.from_bbox(coords)
+    bbox.srid = 4326
+    return bbox
+
+
+def filter_seasons(queryset, params):
+    """
+    Applies the `season` (a year) and `since` (an ISO 8601 date or time)
+    filters to observations. Both narrow `checked`, so only the matching
+    partitions of the observation table are read.
+    """
+    if params.get('season'):
+        try:
+            queryset = queryset.seasons(int(params['season']))
+        except ValueError:
+            raise ValidationError({'season': "Expected a year."})
+    if params.get('since'):
+        since = parse_datetime(params['since'])
+        if since is None:
+            day = parse_date(params['since'])
+            if day is None:
+                raise ValidationError(
+                    {'since': "Expected an ISO 8601 date or time."})
+            since = datetime.combine(day, datetime.min.time())
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        queryset = queryset.since(since)
+    return queryset
+
+
+def filter_water(queryset, params):
+    """
+    Applies `water_min` and `water_max` (meters) to houses, keeping those
+    with an environment survey that puts water in that range, and sorts
+    them by their nearest water with `ordering=water_distance` (or
+    `-water_distance`). The range is one scan of the index on
+    water_resource_meters.
+    """
+    bounds = {}
+    for param, lookup in (('water_min', 'gte'), ('water_max', 'lte')):
+        if params.get(param):
+            try:
+                bounds['water_resource_meters__' + lookup] = float(
+                    params[param])
+            except ValueError:
+                raise ValidationError({param: "Expected a number of meters."})
+    if bounds:
+        queryset = queryset.filter(
+            pk__in=HouseEnvironmentFeatures.objects.filter(
+                **bounds).values('house_id'))
+    ordering = params.get('ordering')
+    if ordering:
+        if ordering.lstrip('-') != 'water_distance':
+            raise ValidationError(
+                {'ordering': "Expected water_distance or -water_distance."})
+        nearest = HouseEnvironmentFeatures.objects.filter(
+            house=OuterRef('pk'), water_resource_meters__isnull=False)
+        queryset = queryset.annotate(water_distance=Subquery(
+            nearest.order_by('water_resource_meters').values(
+                'water_resource_meters')[:1]))
+        if ordering.startswith('-'):
+            order = F('water_distance').desc(nulls_last=True)
+        else:
+            order = F('water_distance').asc(nulls_last=True)
+        queryset = queryset.order_by(order, 'pk')
+    return queryset
+
+
+def research_observations(request):
+    """
+    The observations open to the user's species queries, narrowed by the
+    `in_bbox`, `season` and `since` parameters. Users granted
+    `bathouse.view_observation` see everyone's, others only their own.
+    """
+    queryset = Observation.objects.all()
+    if not request.user.has_perm('bathouse.view_observation'):
+        queryset = queryset.filter(house__watcher=request.user)
+    bbox = request.query_params.get('in_bbox')
+    if bbox:
+        queryset = queryset.filter(house__location__within=parse_bbox(bbox))
+    return filter_seasons(queryset, request.query_params)
+
+
+def sighting(row, bat_id):
+    location = row['house__location']
+    counts = dict(zip(row['species'], row['species_counts']))
+    return {
+        'observation': row['id'],
+        'house_id': row['house_id'],
+        'location': {
+            'latitude': location.y,
+            'longitude': location.x
+        },
+        'checked': row['checked'],
+        'count': counts[bat_id]
+    }
 
 
 class BatViewSet(viewsets.ReadOnlyModelViewSet):
@@ -19,17 +158,59 @@ class BatViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Bat.objects.all()
     serializer_class = BatSerializer
 
+    def get_queryset(self, *args, **kwargs):
+        return BatSerializer.optimize_queryset(Bat.objects.all(), self.request)
+
+    @action(detail=True, permission_classes=[IsAuthenticated])
+    @use_replica()
+    def sightings(self, request, pk=None):
+        """
+        Returns the observations in which the bat was seen, newest first,
+        with where and how many. Takes `?in_bbox=`, `?season=` and
+        `?since=`. Reporting traffic, read from a replica.
+        """
+        bat = self.get_object()
+        rows = research_observations(request).of_species(bat.pk).values(
+            'id', 'house_id', 'house__location', 'checked', 'species',
+            'species_counts')
+        page = self.paginate_queryset(rows.order_by('-checked'))
+        return self.get_paginated_response(
+            [sighting(row, bat.pk) for row in page])
 
-class HouseViewSet(viewsets.ModelViewSet):
+
+class HouseViewSet(RateLimitHeadersMixin, viewsets.ModelViewSet):
     model = House
     permission_classes = (IsAuthenticated, )
     queryset = House.objects.all()
     serializer_class = HouseSerializer
 
     def get_queryset(self, *args, **kwargs):
-        return House.objects.all().filter(watcher=self.request.user)
+        queryset = House.objects.all().filter(watcher=self.request.user)
+        bbox = self.request.query_params.get('in_bbox')
+        if bbox:
+            queryset = queryset.filter(location__within=parse_bbox(bbox))
+        if self.action == 'list':
+            queryset = filter_water(queryset, self.request.query_params)
+        if self.action in ('list', 'retrieve'):
+            queryset = HouseSerializer.optimize_queryset(
+                queryset, self.request)
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        """
+        Also answers the ids of the user's houses close enough to be the
+        same one, `possible_duplicates`, for the client to warn about.
+        """
+        response = super().create(request, *args, **kwargs)
+        response.data['possible_duplicates'] = self.possible_duplicates
+        return response
 
     def perform_create(self, serializer):
+        # Only the user's own: anyone else's would tell where they are.
+        nearby = duplicates.nearby_houses(
+            serializer.validated_data['location'],
+            queryset=House.objects.filter(watcher=self.request.user))
+        self.possible_duplicates = list(nearby.values_list('id', flat=True))
         serializer.save(watcher=self.request.user)
 
     @action(detail=True,
@@ -42,9 +223,12 @@ class HouseViewSet(viewsets.ModelViewSet):
         """
         house = self.get_object()
         if (request.method == "GET"):
-            ef = HouseEnvironmentFeatures.objects.all().filter(house=house)
+            ef = HouseEnvironmentFeaturesSerializer.optimize_queryset(
+                HouseEnvironmentFeatures.objects.all().filter(house=house),
+                request)
             data = [
-                HouseEnvironmentFeaturesSerializer(feature).data
+                HouseEnvironmentFeaturesSerializer(
+                    feature, context=self.get_serializer_context()).data
                 for feature in ef
             ]
             return Response({
@@ -53,12 +237,15 @@ class HouseViewSet(viewsets.ModelViewSet):
             },
                             status=status.HTTP_200_OK)
         elif (request.method == "POST"):
-            data = request.data
-            data["house_id"] = house.id
-            record = HouseEnvironmentFeatures(**data)
-            record.save()
-            return Response(HouseEnvironmentFeaturesSerializer(record).data,
-                            status=status.HTTP_201_CREATED)
+            data = request.data.copy()
+            data["house"] = house.id
+            serializer = HouseEnvironmentFeaturesSerializer(
+                data=data, context=self.get_serializer_context())
+            serializer.is_valid(raise_exception=True)
+            with transaction.atomic():
+                serializer.save(house=house)
+                sync.touch_houses([house.id])
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
         return HttpResponseServerError()
 
     @action(detail=True,
@@ -71,9 +258,13 @@ class HouseViewSet(viewsets.ModelViewSet):
         """
         house = self.get_object()
         if (request.method == "GET"):
-            pf = HousePhysicalFeatures.objects.all().filter(house=house)
+            pf = HousePhysicalFeaturesSerializer.optimize_queryset(
+                HousePhysicalFeatures.objects.all().filter(house=house),
+                request)
             data = [
-                HousePhysicalFeaturesSerializer(feature).data for feature in pf
+                HousePhysicalFeaturesSerializer(
+                    feature, context=self.get_serializer_context()).data
+                for feature in pf
             ]
             return Response({
                 "count": len(pf),
@@ -81,12 +272,15 @@ class HouseViewSet(viewsets.ModelViewSet):
             },
                             status=status.HTTP_200_OK)
         elif (request.method == "POST"):
-            data = request.data
-            data["house_id"] = house.id
-            record = HousePhysicalFeatures(**data)
-            record.save()
-            return Response(HousePhysicalFeaturesSerializer(record).data,
-                            status=status.HTTP_201_CREATED)
+            data = request.data.copy()
+            data["house"] = house.id
+            serializer = HousePhysicalFeaturesSerializer(
+                data=data, context=self.get_serializer_context())
+            serializer.is_valid(raise_exception=True)
+            with transaction.atomic():
+                serializer.save(house=house)
+                sync.touch_houses([house.id])
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
         return HttpResponseServerError()
 
     @action(detail=True,
@@ -94,27 +288,399 @@ class HouseViewSet(viewsets.ModelViewSet):
             permission_classes=[IsOwnerAndAuthenticated])
     def observations(self, request, pk=None):
         """
-        Returns a list of all the observations the house has
+        Returns a list of all the observations the house has, optionally
+        narrowed with `?season=` or `?since=`
         """
         house = self.get_object()
         if (request.method == "GET"):
-            ob = Observation.objects.all().filter(house=house)
-            data = [ObservationSerializer(feature).data for feature in ob]
+            ob = ObservationSerializer.optimize_queryset(
+                filter_seasons(Observation.objects.all().filter(house=house),
+                               request.query_params), request)
+            data = [
+                ObservationSerializer(
+                    feature, context=self.get_serializer_context()).data
+                for feature in ob
+            ]
             return Response({
                 "count": len(ob),
                 "results": data
             },
                             status=status.HTTP_200_OK)
         elif (request.method == "POST"):
-            data = request.data
-            data["house_id"] = house.id
-            record = Observation(**data)
-            record.save()
-            return Response(ObservationSerializer(record).data,
-                            status=status.HTTP_201_CREATED)
+            data = request.data.copy()
+            data["house"] = house.id
+            serializer = ObservationSerializer(
+                data=data, context=self.get_serializer_context())
+            serializer.is_valid(raise_exception=True)
+            with transaction.atomic():
+                serializer.save(house=house)
+                sync.touch_houses([house.id])
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
         return HttpResponseServerError()
 
 
+class JobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
+                 mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Submits background jobs and reports on their progress. A job is accepted
+    immediately and run by a `manage.py run_worker` process.
+    """
+    model = Job
+    permission_classes = (IsAuthenticated, )
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+
+    def get_queryset(self, *args, **kwargs):
+        return Job.objects.all().filter(
+            owner=self.request.user).order_by('-created')
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    @action(detail=True)
+    def download(self, request, pk=None):
+        """
+        Sends the file a succeeded job wrote, to the user who submitted it.
+        """
+        job = self.get_object()
+        name = (job.result or {}).get('file')
+        if job.status != Job.SUCCEEDED or not name:
+            raise NotFound("This job has no file to download.")
+        try:
+            f = sync.export_storage().open(name)
+        except FileNotFoundError:
+            raise NotFound("The file is no longer available.")
+        return FileResponse(f,
+                            as_attachment=True,
+                            filename=os.path.basename(name))
+
+
+class SearchView(RateLimitHeadersMixin, generics.ListAPIView):
+    """
+    Ranked type-ahead search: `?q=little br&type=bats` (the default) or
+    `type=houses` for the user's houses by town. Tolerates typos.
+    """
+    SEARCH_TYPES = ('bats', 'houses')
+
+    def get_search_type(self):
+        search_type = self.request.query_params.get('type', 'bats')
+        if search_type not in self.SEARCH_TYPES:
+            raise ValidationError(
+                {'type': f"Expected one of {', '.join(self.SEARCH_TYPES)}."})
+        return search_type
+
+    def get_serializer_class(self):
+        if self.get_search_type() == 'houses':
+            return HouseSerializer
+        return BatSerializer
+
+    def get_queryset(self):
+        text = self.request.query_params.get('q', '')
+        if self.get_search_type() == 'houses':
+            if not self.request.user.is_authenticated:
+                raise NotAuthenticated()
+            queryset = search.search_houses(
+                text,
+                House.objects.all().filter(watcher=self.request.user))
+        else:
+            queryset = search.search_bats(text)
+        return self.get_serializer_class().optimize_queryset(
+            queryset, self.request)
+
+
+class SpeciesRichnessView(APIView):
+    """
+    Species seen in the user's observations: `?in_bbox=`, `?season=` and
+    `?since=` narrow them, and `?grid=` (degrees) counts the species in
+    each cell of a grid instead. Reporting traffic, read from a replica.
+    """
+    permission_classes = (IsAuthenticated, )
+    MAX_GRID_CELLS = 10000
+
+    @use_replica()
+    def get(self, request, *args, **kwargs):
+        observations = research_observations(request)
+        grid = request.query_params.get('grid')
+        if not grid:
+            return Response(species.richness(observations))
+        try:
+            grid = float(grid)
+        except ValueError:
+            grid = 0
+        if grid <= 0:
+            raise ValidationError({'grid': "Expected a cell size in degrees."})
+        bbox = request.query_params.get('in_bbox')
+        min_lon, min_lat, max_lon, max_lat = (parse_bbox(bbox).extent if bbox
+                                              else (-180, -90, 180, 90))
+        cells = ((max_lon - min_lon) / grid + 1) * (
+            (max_lat - min_lat) / grid + 1)
+        if cells > self.MAX_GRID_CELLS:
+            raise ValidationError(
+                {'grid': "Too fine for the area; use a larger cell size."})
+        return Response(species.richness_grid(observations, grid))
+
+
+class SuitabilityView(APIView):
+    """
+    Habitat suitability, the predicted chance of occupancy from 0 to 1.
+
+    GET ranks the user's houses, best first (every house for users granted
+    `bathouse.view_house`), narrowed by `?in_bbox=`; `?limit=` caps the
+    number returned; ranking reads from a replica, like other reporting
+    traffic. POST scores a proposed site from its features.
+    """
+    permission_classes = (IsAuthenticated, )
+    DEFAULT_LIMIT = 100
+
+    def get_scorer(self):
+        scorer = suitability.current_scorer()
+        if scorer is None:
+            raise NotFound("No suitability model has been fitted yet.")
+        return scorer
+
+    @use_replica()
+    def get(self, request, *args, **kwargs):
+        scorer = self.get_scorer()
+        houses = House.objects.all()
+        if not request.user.has_perm('bathouse.view_house'):
+            houses = houses.filter(watcher=request.user)
+        bbox = request.query_params.get('in_bbox')
+        if bbox:
+            houses = houses.filter(location__within=parse_bbox(bbox))
+        try:
+            limit = int(request.query_params.get('limit', self.DEFAULT_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': "Expected a number."})
+        house_ids, scores = suitability.score_houses(scorer,
+                                                     houses.values('id'))
+        results = [{
+            'house_id': int(house_id),
+            'score': float(score)
+        } for house_id, score in zip(house_ids[:limit], scores[:limit])]
+        return Response({
+            'model': scorer.fitted.pk,
+            'count': len(house_ids),
+            'results': results
+        })
+
+    def post(self, request, *args, **kwargs):
+        scorer = self.get_scorer()
+        serializer = SiteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        score = scorer.score([serializer.validated_data])[0]
+        return Response({'model': scorer.fitted.pk, 'score': float(score)})
+
+
+def density_tile(request, layer, season, z, x, y):
+    """
+    Serves an occupancy density tile, or a blank one where there is nothing
+    to show. Tiles only change when compute_density runs, so clients and
+    proxies may keep them for DENSITY_TILE_MAX_AGE.
+    """
+    if layer not in density.LAYERS:
+        raise Http404("No such layer.")
+    path = density.tile_path(layer, season, z, x, y)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        response = HttpResponse(density.blank_tile(), content_type='image/png')
+    else:
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                                  stat.st_mtime, stat.st_size):
+            return HttpResponseNotModified()
+        response = FileResponse(open(path, 'rb'), content_type='image/png')
+        response['Last-Modified'] = http_date(stat.st_mtime)
+    patch_cache_control(response,
+                        public=True,
+                        max_age=settings.DENSITY_TILE_MAX_AGE)
+    return response
+
+
+class ChangesView(APIView):
+    """
+    Long-polls for the user's houses changed after `since`.
+
+    Served by a worker thread for the whole wait under WSGI; the ASGI
+    application answers the same URL from a consumer instead.
+    """
+    permission_classes = (IsAuthenticated, )
+
+    def get(self, request, *args, **kwargs):
+        since, timeout = sync.parse_changes_params(request.query_params)
+        deadline = time.monotonic() + timeout
+        while True:
+            now = timezone.now()
+            houses = sync.changed_houses(request.user, since)
+            if houses or time.monotonic() >= deadline:
+                return Response(sync.changes_response(houses, now))
+            time.sleep(sync.CHANGES_POLL_INTERVAL)
+
+
+class ChangeFeedView(APIView):
+    """
+    Streams changes to the user's houses, their features and observations
+    as Server-Sent Events, as they are committed.
+
+    Holds a worker thread and a database connection for as long as the
+    client listens under WSGI; the ASGI application answers the same URL
+    from a consumer instead.
+    """
+    permission_classes = (IsAuthenticated, )
+    renderer_classes = (JSONRenderer, EventStreamRenderer)
+
+    def get(self, request, *args, **kwargs):
+        def events():
+            now = timezone.now()
+            connection = changefeed.listen()
+            try:
+                house_ids = sync.watched_house_ids(request.user)
+                yield sync.feed_ready(now)
+                deadline = time.monotonic() + sync.FEED_MAX_SECONDS
+                event_id = 0
+                while time.monotonic() < deadline:
+                    changes = changefeed.wait(connection, sync.FEED_KEEPALIVE)
+                    if not changes:
+                        yield sync.FEED_KEEPALIVE_COMMENT
+                    for change in changes:
+                        if sync.follows(change, request.user, house_ids):
+                            event_id += 1
+                            yield sync.feed_change(change, event_id)
+            finally:
+                connection.close()
+
+        response = StreamingHttpResponse(events())
+        for name, value in sync.FEED_HEADERS:
+            response[name.decode('latin1')] = value.decode('latin1')
+        return response
+
+
+class BulkObservationView(RateLimitHeadersMixin, APIView):
+    """
+    Creates many observations, across any of the user's houses, at once.
+    """
+    permission_classes = (IsAuthenticated, )
+    throttle_scope = 'bulk'
+
+    def post(self, request, *args, **kwargs):
+        created = sync.bulk_create_observations(request.user, request.data)
+        return Response(ObservationSerializer(created,
+                                              many=True,
+                                              context={
+                                                  'request': request
+                                              }).data,
+                        status=status.HTTP_201_CREATED)
+
+
+class ObservationExportView(RateLimitHeadersMixin, APIView):
+    """
+    Streams all of the user's observations as CSV.
+    """
+    permission_classes = (IsAuthenticated, )
+    throttle_scope = 'bulk'
+
+    def get(self, request, *args, **kwargs):
+        def rows():
+            yield sync.export_header()
+            chunk, after = sync.export_batch(request.user)
+            while after is not None:
+                yield chunk
+                chunk, after = sync.export_batch(request.user, after)
+
+        response = StreamingHttpResponse(rows(), content_type='text/csv')
+        response['Content-Disposition'] = (
+            'attachment; filename="observations.csv"')
+        return response
+
+
+class ObservationPhotoView(RateLimitHeadersMixin, APIView):
+    """
+    Lists the photos of one of the user's observations, or adds one: POST
+    the image itself as the body, with `Content-Disposition: attachment;
+    filename="roost.jpg"` and an optional `?caption=`. See photos.py.
+    """
+    permission_classes = (IsAuthenticated, )
+    parser_classes = (FileUploadParser, )
+
+    def get(self, request, pk, *args, **kwargs):
+        observation = photos.owned_observation(request.user, pk)
+        queryset = observation.photos.select_related('image').order_by('id')
+        return Response(ObservationPhotoSerializer(queryset, many=True).data)
+
+    def post(self, request, pk, *args, **kwargs):
+        photos.check_size(request.META.get('CONTENT_LENGTH'))
+        # Straight to a temporary file, however small the photo.
+        request._request.upload_handlers = [
+            TemporaryFileUploadHandler(request._request)
+        ]
+        photo = photos.create_photo(request.user, pk,
+                                    request.FILES.get('file'),
+                                    request.query_params.get('caption', ''))
+        return Response(ObservationPhotoSerializer(photo).data,
+                        status=status.HTTP_201_CREATED)
+
+
+@lru_cache(maxsize=None)
+def choice_labels():
+    """
+    Maps model -> field -> code -> label for every field with choices,
+    including the elements of array fields.
+    """
+    labels = {}
+    for model in (Bat, House, HouseEnvironmentFeatures, HousePhysicalFeatures,
+                  Observation, Job):
+        fields = {}
+        for field in model._meta.concrete_fields:
+            choices = field.choices or getattr(
+                getattr(field, 'base_field', None), 'choices', None)
+            if choices:
+                fields[field.name] = dict(choices)
+        labels[model._meta.model_name] = fields
+    return labels
+
+
+class BatchView(RateLimitHeadersMixin, APIView):
+    """
+    Runs several API requests in one round trip; see batch.py. Send
+    `{"requests": [{"method": "GET", "path": "/api/v1/houses/1"}, ...]}`.
+    """
+    permission_classes = (IsAuthenticated, )
+    throttle_scope = 'batch'
+
+    def post(self, request, *args, **kwargs):
+        serializer = batch.BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['requests']
+        if batch.writes(items):
+            return Response({'responses': batch.run(request, items)})
+        # A batch of reads is a read: it reads from a replica unless the
+        # client just wrote, and doesn't pin the client to the primary.
+        request._request.db_writes = False
+        if PrimaryStickinessMiddleware.is_sticky(request):
+            pin = use_primary()
+        else:
+            pin = release_primary()
+        with pin:
+            return Response({'responses': batch.run(request, items)})
+
+
+class ChoicesView(APIView):
+    """
+    Return the label of every choice code, for clients requesting
+    `?choices=codes`.
+    """
+
+    def get(self, request, *args, **kwargs):
+        response = Response(choice_labels())
+        # Labels only change with a deploy.
+        patch_cache_control(response, public=True, max_age=60 * 60)
+        return response
+
+
 class AuthView(APIView):
     """
     Return the URLs from the authentication portion of the application.
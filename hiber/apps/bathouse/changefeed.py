@@ -0,0 +1,92 @@
+"""
+Change events for houses and everything recorded about them, published on
+a PostgreSQL NOTIFY channel for the API's change feed to stream.
+
+Saving or deleting a House, one of its feature records or an Observation
+sends `{"model", "action", "id", "house"}` (plus `"watcher"` for houses)
+from the connection that wrote it. PostgreSQL only delivers notifications
+once the transaction commits and drops them if it rolls back, so listeners
+never hear of changes they can't read. bulk_create() and update() send no
+signals; code using them calls publish() itself.
+"""
+import json
+import select
+import psycopg2
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+
+CHANNEL = 'bathouse_changes'
+
+SENDERS = ('bathouse.House', 'bathouse.HouseEnvironmentFeatures',
+           'bathouse.HousePhysicalFeatures', 'bathouse.Observation')
+
+
+def event(instance, action):
+    model = instance._meta.model_name
+    change = {'model': model, 'action': action, 'id': instance.pk}
+    if model == 'house':
+        change['house'] = instance.pk
+        change['watcher'] = instance.watcher_id
+    else:
+        change['house'] = instance.house_id
+    return change
+
+
+def publish(changes, using='default'):
+    connection = connections[using]
+    if connection.vendor != 'postgresql' or not changes:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) payload",
+            [CHANNEL, [json.dumps(change) for change in changes]])
+
+
+def saved(sender, instance, created, using, raw=False, **kwargs):
+    if not raw:
+        publish([event(instance, 'create' if created else 'update')], using)
+
+
+def deleted(sender, instance, using, **kwargs):
+    publish([event(instance, 'delete')], using)
+
+
+for sender in SENDERS:
+    post_save.connect(saved, sender=sender, dispatch_uid='changefeed')
+    post_delete.connect(deleted, sender=sender, dispatch_uid='changefeed')
+
+
+def listen(using='default'):
+    """
+    A new connection, outside of Django's, listening on the channel. It is
+    in autocommit mode, so notifications arrive as soon as they are sent.
+    """
+    connection = psycopg2.connect(**connections[using].get_connection_params())
+    connection.set_isolation_level(
+        psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    with connection.cursor() as cursor:
+        cursor.execute(f"LISTEN {CHANNEL}")
+    return connection
+
+
+def received(connection):
+    """
+    Reads the changes that have arrived on a listening connection.
+    """
+    connection.poll()
+    changes = [
+        json.loads(notify.payload) for notify in connection.notifies
+        if notify.channel == CHANNEL
+    ]
+    connection.notifies.clear()
+    return changes
+
+
+def wait(connection, timeout):
+    """
+    Blocks until changes arrive or `timeout` seconds pass; for the
+    synchronous serving path.
+    """
+    if not connection.notifies:
+        select.select([connection], [], [], timeout)
+    return received(connection)
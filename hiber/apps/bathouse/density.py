@@ -0,0 +1,195 @@
+"""
+Occupancy hotspots as map tiles.
+
+For a season, every house where bats were present is a point, weighing 1
+in the `houses` layer and the most bats counted at it in the `occupants`
+layer. A Gaussian kernel density estimate of the points is drawn on
+256 pixel Web Mercator (XYZ) tiles for each zoom level in DENSITY_ZOOMS and
+saved as PNG files under DENSITY_TILE_DIR, so the public map shows where
+bats are without being sent any house's location.
+
+A tile only looks at the points within reach of the kernel: they are binned
+into its pixels, plus a margin, and smoothed with the kernel as two matrix
+products. A season's tiles are all rebuilt at once and replace the previous
+ones by renaming the directory.
+"""
+import io
+import math
+import os
+import shutil
+from collections import defaultdict
+from functools import lru_cache
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+from PIL import Image
+from .models import House, Observation
+
+TILE_SIZE = 256
+LAYERS = ('houses', 'occupants')
+EARTH_CIRCUMFERENCE = 40075016.686  # meters, around the equator
+MAX_LATITUDE = 85.0511287798  # Where Web Mercator is square.
+
+# Densities are shown on a log scale, saturating at this many points'
+# worth of kernel peak.
+SATURATION = {'houses': 20, 'occupants': 1000}
+MAX_OPACITY = 0.8
+
+
+def season_directory(layer, season, directory=None):
+    return os.path.join(directory or settings.DENSITY_TILE_DIR, layer,
+                        str(season))
+
+
+def tile_path(layer, season, z, x, y, directory=None):
+    return os.path.join(season_directory(layer, season, directory), str(z),
+                        str(x), f'{y}.png')
+
+
+def season_points(season):
+    """
+    Arrays of longitude, latitude and most occupants of the houses where
+    bats were present during `season`.
+    """
+    occupants = dict(
+        Observation.objects.seasons(season).filter(
+            present=True).order_by().values('house_id').annotate(
+                most=Max('occupants')).values_list('house_id', 'most'))
+    locations = House.objects.filter(pk__in=list(occupants)).values_list(
+        'pk', 'location')
+    points = [(location.x, location.y, occupants[pk] or 0)
+              for pk, location in locations]
+    if not points:
+        return np.empty(0), np.empty(0), np.empty(0)
+    return tuple(np.array(column, dtype=float) for column in zip(*points))
+
+
+def mercator(longitude, latitude):
+    """
+    Projects to Web Mercator as fractions of the world, from the top left.
+    """
+    latitude = np.radians(np.clip(latitude, -MAX_LATITUDE, MAX_LATITUDE))
+    x = (longitude + 180) / 360
+    y = (1 - np.log(np.tan(latitude) + 1 / np.cos(latitude)) / math.pi) / 2
+    return x, y
+
+
+def kernel_matrix(sigma, margin):
+    """
+    Smooths and crops one axis of a histogram binned with `margin` extra
+    pixels on each side: (K @ histogram @ K.T) is the density of the tile.
+    The kernel peaks at 1, so a lone point reads as 1.
+    """
+    offsets = np.arange(TILE_SIZE + 2 * margin)[None, :] - (
+        np.arange(TILE_SIZE)[:, None] + margin)
+    kernel = np.exp(-0.5 * (offsets / sigma)**2)
+    kernel[np.abs(offsets) > margin] = 0.0
+    return kernel
+
+
+def render(density, saturation):
+    """
+    RGBA pixels for a density tile, from transparent yellow to red, or None
+    if nothing would show.
+    """
+    level = np.clip(np.log1p(density) / math.log1p(saturation), 0, 1)
+    alpha = np.round(level * MAX_OPACITY * 255).astype(np.uint8)
+    if not alpha.any():
+        return None
+    pixels = np.empty(density.shape + (4, ), dtype=np.uint8)
+    pixels[..., 0] = 255
+    pixels[..., 1] = np.round(255 * (1 - level) * 0.9).astype(np.uint8)
+    pixels[..., 2] = 0
+    pixels[..., 3] = alpha
+    return pixels
+
+
+def zoom_tiles(x, y, weights, zoom, bandwidth):
+    """
+    Yields (tile x, tile y, density) for the tiles at `zoom` within reach
+    of the points, given as Web Mercator fractions.
+    """
+    world = TILE_SIZE * 2**zoom
+    px, py = x * world, y * world
+    # One kernel width for the zoom level, from the points' mean latitude.
+    latitude = math.atan(math.sinh(math.pi * (1 - 2 * float(np.mean(y)))))
+    meters_per_pixel = EARTH_CIRCUMFERENCE * math.cos(latitude) / world
+    sigma = max(bandwidth / meters_per_pixel, 1.0)
+    margin = int(math.ceil(3 * sigma))
+    kernel = kernel_matrix(sigma, margin)
+    reach = int(math.ceil(margin / TILE_SIZE))
+
+    by_tile = defaultdict(list)
+    for i, tile in enumerate(
+            zip((px // TILE_SIZE).astype(int), (py // TILE_SIZE).astype(int))):
+        by_tile[tile].append(i)
+    nearby = {(tx + dx, ty + dy)
+              for tx, ty in by_tile for dx in range(-reach, reach + 1)
+              for dy in range(-reach, reach + 1)}
+    extent = [-margin, TILE_SIZE + margin]
+    for tx, ty in sorted(nearby):
+        if not (0 <= tx < 2**zoom and 0 <= ty < 2**zoom):
+            continue
+        points = [
+            i for dx in range(-reach, reach + 1)
+            for dy in range(-reach, reach + 1)
+            for i in by_tile.get((tx + dx, ty + dy), ())
+        ]
+        histogram = np.histogram2d(py[points] - ty * TILE_SIZE,
+                                   px[points] - tx * TILE_SIZE,
+                                   bins=TILE_SIZE + 2 * margin,
+                                   range=[extent, extent],
+                                   weights=weights[points])[0]
+        yield tx, ty, kernel @ histogram @ kernel.T
+
+
+def png(pixels):
+    output = io.BytesIO()
+    Image.fromarray(pixels, 'RGBA').save(output, 'PNG', optimize=True)
+    return output.getvalue()
+
+
+@lru_cache(maxsize=None)
+def blank_tile():
+    return png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+
+
+def compute_density(season,
+                    layers=LAYERS,
+                    zooms=None,
+                    bandwidth=None,
+                    directory=None):
+    """
+    Rebuilds the tiles of `layers` for `season`. Returns the number of tiles
+    written per layer; tiles with nothing to show aren't.
+    """
+    first, last = zooms or settings.DENSITY_ZOOMS
+    bandwidth = bandwidth or settings.DENSITY_BANDWIDTH
+    directory = directory or settings.DENSITY_TILE_DIR
+    longitude, latitude, occupants = season_points(season)
+    x, y = mercator(longitude, latitude)
+    written = {}
+    for layer in layers:
+        weights = np.ones_like(x) if layer == 'houses' else occupants
+        target = season_directory(layer, season, directory)
+        staging = target + '.new'
+        for leftover in (staging, target + '.old'):
+            shutil.rmtree(leftover, ignore_errors=True)
+        written[layer] = 0
+        for zoom in range(first, last + 1) if len(x) else ():
+            for tx, ty, density in zoom_tiles(x, y, weights, zoom, bandwidth):
+                pixels = render(density, SATURATION[layer])
+                if pixels is None:
+                    continue
+                path = os.path.join(staging, str(zoom), str(tx), f'{ty}.png')
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as tile:
+                    tile.write(png(pixels))
+                written[layer] += 1
+        os.makedirs(staging, exist_ok=True)
+        # Swap the new tiles in; requests in between get blank tiles.
+        if os.path.exists(target):
+            os.rename(target, target + '.old')
+        os.rename(staging, target)
+        shutil.rmtree(target + '.old', ignore_errors=True)
+    return written
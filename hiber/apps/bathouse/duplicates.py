@@ -0,0 +1,174 @@
+"""
+Houses registered more than once: houses within DUPLICATE_HOUSE_METERS of
+each other are taken to be the same physical house.
+
+Distances are measured on the sphere, `location::geography`, which has a
+GiST index of its own (migration 0008), so ST_DWithin() only looks at the
+houses close by. Creating a house through the API reports the user's houses
+near it, and the survey importer rejects them. `manage.py
+merge_duplicate_houses` lists the clusters already in the table, houses of
+one watcher all near each other, and merges the ones it is given into the
+oldest house.
+"""
+import math
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from . import changefeed
+from .models import (House, HouseEnvironmentFeatures, HousePhysicalFeatures,
+                     Observation)
+
+# Models moved over to the house a cluster is merged into.
+HOUSE_RECORDS = (HouseEnvironmentFeatures, HousePhysicalFeatures, Observation)
+
+WITHIN = ("ST_DWithin(bathouse_house.location::geography, "
+          "ST_GeogFromText(%s), %s)")
+
+EARTH_RADIUS = 6371008.8
+METERS_PER_DEGREE = EARTH_RADIUS * math.pi / 180
+
+
+def house_meters(meters=None):
+    return settings.DUPLICATE_HOUSE_METERS if meters is None else meters
+
+
+def nearby_houses(point, meters=None, queryset=None):
+    """
+    Houses of `queryset` (all of them by default) within `meters` of a point.
+    """
+    if queryset is None:
+        queryset = House.objects.all()
+    return queryset.extra(where=[WITHIN],
+                          params=[point.wkt, house_meters(meters)])
+
+
+def nearby_house_ids(points, meters=None):
+    """
+    For a list of points, the ids of the houses near each one, in one query.
+    """
+    nearby = [[] for _ in points]
+    if not points:
+        return nearby
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT point.i, bathouse_house.id "
+            "FROM unnest(%s::text[]) WITH ORDINALITY AS point (wkt, i) "
+            "JOIN bathouse_house ON ST_DWithin("
+            "bathouse_house.location::geography, "
+            "ST_GeogFromText(point.wkt), %s) ORDER BY bathouse_house.id",
+            [[point.wkt for point in points],
+             house_meters(meters)])
+        for i, house_id in cursor.fetchall():
+            nearby[i - 1].append(house_id)
+    return nearby
+
+
+def distance(a, b):
+    """
+    Meters between two points, on the sphere.
+    """
+    lat_a, lat_b = math.radians(a.y), math.radians(b.y)
+    half_chord = (math.sin((lat_b - lat_a) / 2)**2 + math.cos(lat_a) *
+                  math.cos(lat_b) * math.sin(math.radians(b.x - a.x) / 2)**2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(half_chord)))
+
+
+def close_pairs(points, meters=None):
+    """
+    (i, j), i < j, for every two of `points` within `meters`, as indexes in
+    the list: for houses that aren't saved yet. Points are put in a grid of
+    cells `meters` high, so each is only compared with those around it.
+    """
+    meters = house_meters(meters)
+    size = meters / METERS_PER_DEGREE
+    grid = {}
+    pairs = []
+    for j, point in enumerate(points):
+        row, col = int(point.y // size), int(point.x // size)
+        # A degree of longitude shrinks away from the equator.
+        span = math.ceil(1 / max(math.cos(math.radians(point.y)), 0.01))
+        for r in range(row - 1, row + 2):
+            for c in range(col - span, col + span + 1):
+                pairs.extend((i, j) for i in grid.get((r, c), ())
+                             if distance(points[i], point) <= meters)
+        grid.setdefault((row, col), []).append(j)
+    return sorted(pairs)
+
+
+def duplicate_pairs(meters=None):
+    """
+    (lower id, higher id) for every two houses of the same watcher within
+    `meters`. The index is used for the inner side of the self-join.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT a.id, b.id FROM bathouse_house a "
+            "JOIN bathouse_house b ON a.id < b.id "
+            "AND a.watcher_id = b.watcher_id "
+            "AND ST_DWithin(b.location::geography, a.location::geography, %s)",
+            [house_meters(meters)])
+        return cursor.fetchall()
+
+
+def clusters(pairs):
+    """
+    Groups pairs of ids into clusters, lists of ids in ascending order, in
+    which every house is near every other one: a row of houses a few meters
+    apart along a fence is not one house. Houses join the cluster of the
+    oldest house they can.
+    """
+    near = {}
+    for a, b in pairs:
+        near.setdefault(a, set()).add(b)
+        near.setdefault(b, set()).add(a)
+    found, placed = [], set()
+    for house_id in sorted(near):
+        if house_id in placed:
+            continue
+        cluster = [house_id]
+        for other in sorted(near[house_id] - placed):
+            if all(other in near[member] for member in cluster[1:]):
+                cluster.append(other)
+        if len(cluster) > 1:
+            found.append(sorted(cluster))
+            placed.update(cluster)
+    return sorted(found)
+
+
+def move_records(model, duplicate_ids, house_id, batch_size):
+    """
+    Moves the records of the duplicates over, `batch_size` rows per
+    transaction so no lock is held on many rows for long.
+    """
+    moved = 0
+    while True:
+        with transaction.atomic():
+            records = list(
+                model.objects.filter(house__in=duplicate_ids).only(
+                    'pk', 'house')[:batch_size])
+            if not records:
+                return moved
+            ids = [record.pk for record in records]
+            model.objects.filter(pk__in=ids).update(house=house_id)
+            for record in records:
+                record.house_id = house_id
+            # update() sends no signals.
+            changefeed.publish(
+                [changefeed.event(record, 'update') for record in records])
+        moved += len(records)
+
+
+def merge(cluster, batch_size=5000):
+    """
+    Merges a cluster of house ids into its first, oldest, house. Returns the
+    number of records moved.
+    """
+    house_id, duplicate_ids = cluster[0], cluster[1:]
+    moved = sum(
+        move_records(model, duplicate_ids, house_id, batch_size)
+        for model in HOUSE_RECORDS)
+    with transaction.atomic():
+        House.objects.filter(pk=house_id).update(updated=timezone.now())
+        for duplicate in House.objects.filter(pk__in=duplicate_ids):
+            duplicate.delete()
+    return moved
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+from hiber.apps.bathouse import partitions
+
+
+class Command(BaseCommand):
+    help = ("Archives closed seasons of observations to gzipped CSV files "
+            "and drops their partitions and photos, after making sure this "
+            "season and the next have partitions. Run it at least once a "
+            "year.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-seasons',
+            type=int,
+            default=settings.OBSERVATION_KEEP_SEASONS,
+            help="Number of seasons, counting the current one, to keep in "
+            "the database")
+        parser.add_argument('--directory',
+                            default=settings.OBSERVATION_ARCHIVE_DIR,
+                            help="Where archive files are written and read")
+        parser.add_argument('--restore',
+                            type=int,
+                            nargs='+',
+                            metavar='SEASON',
+                            help="Load these archived seasons back instead")
+        parser.add_argument('--dry-run',
+                            action='store_true',
+                            help="Only list the seasons that would be "
+                            "archived")
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if not partitions.is_partitioned(connection):
+            raise CommandError(
+                "The observation table is not partitioned; that needs "
+                "PostgreSQL 11 or later when migrating to bathouse 0003.")
+        if options['keep_seasons'] < 1:
+            raise CommandError("The current season is always kept.")
+
+        if options['restore']:
+            for year in options['restore']:
+                rows = partitions.restore_partition(connection, year,
+                                                    options['directory'])
+                self.stdout.write(f"Restored {rows} observations of {year}")
+            return
+
+        this_year = timezone.now().year
+        if not options['dry_run']:
+            for year in partitions.ensure_partitions(
+                    connection, (this_year, this_year + 1)):
+                self.stdout.write(f"Created the partition for {year}")
+
+        cutoff = this_year - options['keep_seasons'] + 1
+        for year in partitions.partition_years(connection):
+            if year >= cutoff:
+                continue
+            if options['dry_run']:
+                self.stdout.write(f"Would archive {year}")
+                continue
+            rows = partitions.archive_partition(connection, year,
+                                                options['directory'])
+            path = partitions.archive_path(options['directory'], year)
+            self.stdout.write(f"Archived {rows} observations of {year} to "
+                              f"{path}")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from hiber.apps.bathouse import density
+
+
+class Command(BaseCommand):
+    help = ("Rebuilds the occupancy density tiles of a season, served to "
+            "the public map.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--season',
+                            type=int,
+                            default=timezone.now().year,
+                            help="The season (year), by default this one")
+        parser.add_argument('--layers',
+                            nargs='+',
+                            choices=density.LAYERS,
+                            default=density.LAYERS)
+        parser.add_argument('--zooms',
+                            type=int,
+                            nargs=2,
+                            metavar=('FIRST', 'LAST'),
+                            help="Zoom levels to draw, by default "
+                            "DENSITY_ZOOMS")
+
+    def handle(self, *args, **options):
+        written = density.compute_density(options['season'], options['layers'],
+                                          options['zooms'])
+        for layer, tiles in written.items():
+            self.stdout.write(f"Wrote {tiles} {layer} tiles for "
+                              f"{options['season']}")
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from hiber.apps.bathouse import suitability
+
+
+class Command(BaseCommand):
+    help = ("Refits the habitat suitability model on the houses' features "
+            "and observations. The new model scores from then on.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seasons',
+                            type=int,
+                            nargs='+',
+                            metavar='SEASON',
+                            help="Only count observations of this season, "
+                            "or of this range of seasons")
+        parser.add_argument('--l2',
+                            type=float,
+                            default=1.0,
+                            help="Strength of the L2 regularization")
+        parser.add_argument('--top',
+                            type=int,
+                            default=0,
+                            help="List the best scoring houses afterwards")
+
+    def handle(self, *args, **options):
+        seasons = options['seasons']
+        if seasons and len(seasons) > 2:
+            raise CommandError("Give a season, or the first and last.")
+        try:
+            fitted = suitability.fit(seasons, options['l2'])
+        except suitability.SuitabilityError as error:
+            raise CommandError(error)
+        self.stdout.write(
+            f"Fitted {fitted} with {fitted.occupied} occupied; log loss "
+            f"{fitted.log_loss:.4f}")
+        if options['top']:
+            house_ids, scores = suitability.score_houses(
+                suitability.Scorer(fitted))
+            for house_id, score in zip(house_ids[:options['top']],
+                                       scores[:options['top']]):
+                self.stdout.write(f"House {house_id}: {score:.3f}")
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from hiber.apps.bathouse import duplicates
+
+
+class Command(BaseCommand):
+    help = ("Lists the clusters of houses of one watcher within "
+            "DUPLICATE_HOUSE_METERS of each other. With --merge and houses "
+            "of one cluster, moves their records to the oldest of them and "
+            "deletes the others.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meters',
+                            type=float,
+                            help="Distance under which houses are the same, "
+                            "by default DUPLICATE_HOUSE_METERS")
+        parser.add_argument('--merge',
+                            nargs='+',
+                            type=int,
+                            metavar='HOUSE_ID',
+                            help="Houses of a listed cluster to merge, after "
+                            "checking they are the same house")
+        parser.add_argument('--batch-size',
+                            type=int,
+                            default=5000,
+                            help="Records moved per transaction")
+
+    def handle(self, *args, **options):
+        found = duplicates.clusters(
+            duplicates.duplicate_pairs(options['meters']))
+        if options['merge']:
+            self.merge(sorted(set(options['merge'])), found,
+                       options['batch_size'])
+            return
+        for cluster in found:
+            house_id, others = cluster[0], cluster[1:]
+            self.stdout.write(f"House {house_id}: duplicated by "
+                              f"{', '.join(map(str, others))}")
+        self.stdout.write(f"{len(found)} clusters of duplicate houses")
+
+    def merge(self, cluster, found, batch_size):
+        if len(cluster) < 2 or not any(
+                set(cluster) <= set(other) for other in found):
+            raise CommandError(
+                "Give two or more houses of one of the clusters listed "
+                "without --merge.")
+        moved = duplicates.merge(cluster, batch_size)
+        self.stdout.write(f"Merged {len(cluster) - 1} houses into house "
+                          f"{cluster[0]}, moving {moved} records")
@@ -0,0 +1,73 @@
+# Generated by Django 2.1.7 on 2026-10-19 00:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bathouse', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='bat',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='house',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bat',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='bathouse_ba_search__fef2d9_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='house',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='bathouse_ho_search__b8a81c_gin'),
+        ),
+        # Trigram indexes back typo-tolerant matching (`%` / similarity()).
+        # Django 2.1's GinIndex can't take an operator class, hence raw SQL.
+        migrations.RunSQL(
+            sql=[
+                'CREATE INDEX bathouse_bat_common_name_trgm ON bathouse_bat USING gin (common_name gin_trgm_ops)',
+                'CREATE INDEX bathouse_bat_scientific_name_trgm ON bathouse_bat USING gin (scientific_name gin_trgm_ops)',
+                'CREATE INDEX bathouse_house_town_name_trgm ON bathouse_house USING gin (town_name gin_trgm_ops)',
+            ],
+            reverse_sql=[
+                'DROP INDEX bathouse_bat_common_name_trgm',
+                'DROP INDEX bathouse_bat_scientific_name_trgm',
+                'DROP INDEX bathouse_house_town_name_trgm',
+            ],
+        ),
+        # Triggers keep search_vector current for every write path, including
+        # bulk_create() and queryset update().
+        migrations.RunSQL(
+            sql=[
+                """
+                CREATE TRIGGER bathouse_bat_search_vector_update
+                BEFORE INSERT OR UPDATE OF common_name, scientific_name ON bathouse_bat
+                FOR EACH ROW EXECUTE PROCEDURE
+                tsvector_update_trigger(search_vector, 'pg_catalog.simple', common_name, scientific_name)
+                """,
+                """
+                CREATE TRIGGER bathouse_house_search_vector_update
+                BEFORE INSERT OR UPDATE OF town_name ON bathouse_house
+                FOR EACH ROW EXECUTE PROCEDURE
+                tsvector_update_trigger(search_vector, 'pg_catalog.simple', town_name)
+                """,
+                "UPDATE bathouse_bat SET search_vector = to_tsvector('pg_catalog.simple', common_name || ' ' || scientific_name)",
+                "UPDATE bathouse_house SET search_vector = to_tsvector('pg_catalog.simple', town_name)",
+            ],
+            reverse_sql=[
+                'DROP TRIGGER bathouse_bat_search_vector_update ON bathouse_bat',
+                'DROP TRIGGER bathouse_house_search_vector_update ON bathouse_house',
+            ],
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 2.1.7 on 2026-10-19 00:00
+
+from django.db import migrations
+from django.utils import timezone
+
+from hiber.apps.bathouse import partitions
+
+TABLE = partitions.TABLE
+OLD_TABLE = TABLE + '_old'
+
+
+def recreate_table(cursor, partitioned):
+    """
+    Moves the observations into a new table of the same shape, partitioned
+    by `checked` or not. The id sequence is handed over before the old table
+    is dropped, which would otherwise drop it too.
+    """
+    cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}")
+    # Free the constraint and index names for the new table.
+    cursor.execute(f"ALTER TABLE {OLD_TABLE} DROP CONSTRAINT {TABLE}_pkey")
+    cursor.execute(f"ALTER TABLE {OLD_TABLE} DROP CONSTRAINT "
+                   f"{TABLE}_house_id_fkey")
+    cursor.execute(
+        f"DROP INDEX IF EXISTS {TABLE}_house_id_idx, {TABLE}_checked_idx")
+    cursor.execute(
+        f"CREATE TABLE {TABLE} (LIKE {OLD_TABLE} INCLUDING DEFAULTS)" +
+        (" PARTITION BY RANGE (checked)" if partitioned else ""))
+    cursor.execute(f"ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+    # A partitioned table's primary key must include the partition key.
+    cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey "
+                   f"PRIMARY KEY (id{', checked' if partitioned else ''})")
+    cursor.execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_house_id_fkey "
+        "FOREIGN KEY (house_id) REFERENCES bathouse_house (id) "
+        "DEFERRABLE INITIALLY DEFERRED")
+
+
+def copy_and_drop_old(cursor):
+    cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {OLD_TABLE}")
+    cursor.execute(f"DROP TABLE {OLD_TABLE}")
+    cursor.execute(f"CREATE INDEX {TABLE}_house_id_idx ON {TABLE} (house_id)")
+    cursor.execute(f"CREATE INDEX {TABLE}_checked_idx ON {TABLE} (checked)")
+
+
+def find_fk_name(cursor):
+    cursor.execute(
+        "SELECT conname FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND contype = 'f'", [TABLE])
+    return cursor.fetchone()[0]
+
+
+def partition_observations(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql' or connection.pg_version < 110000:
+        return  # Declarative partitioning needs PostgreSQL 11.
+
+    with connection.cursor() as cursor:
+        # Django named the foreign key with a hash; use a fixed name from now
+        # on, which recreate_table() can rely on.
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME CONSTRAINT "
+                       f"{find_fk_name(cursor)} TO {TABLE}_house_id_fkey")
+        recreate_table(cursor, partitioned=True)
+        cursor.execute(f"CREATE TABLE {partitions.DEFAULT_PARTITION} "
+                       f"PARTITION OF {TABLE} DEFAULT")
+        cursor.execute(
+            "SELECT DISTINCT extract(year FROM checked AT TIME ZONE 'UTC') "
+            f"FROM {OLD_TABLE}")
+        years = {int(row[0]) for row in cursor.fetchall()}
+    this_year = timezone.now().year
+    # Partitions are created while the table is still empty, so no rows
+    # have to be moved out of the default partition.
+    for year in sorted(years | {this_year, this_year + 1}):
+        partitions.create_partition(connection, year)
+    with connection.cursor() as cursor:
+        copy_and_drop_old(cursor)
+
+
+def unpartition_observations(apps, schema_editor):
+    connection = schema_editor.connection
+    if not partitions.is_partitioned(connection):
+        return
+    with connection.cursor() as cursor:
+        recreate_table(cursor, partitioned=False)
+        copy_and_drop_old(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bathouse', '0002_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_observations, unpartition_observations),
+    ]
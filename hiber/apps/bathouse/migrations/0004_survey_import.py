@@ -0,0 +1,36 @@
+# Generated by Django 2.1.7 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bathouse', '0003_partition_observations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='house',
+            name='source_ref',
+            field=models.CharField(blank=True, editable=False, help_text='Reference of the house in imported survey files', max_length=64, null=True, unique=True),
+        ),
+        migrations.CreateModel(
+            name='SurveyImport',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(help_text='Kind of rows loaded', max_length=16)),
+                ('path', models.CharField(help_text='Absolute path of the survey file', max_length=1024)),
+                ('size', models.BigIntegerField(help_text='Size of the file when the import started')),
+                ('line', models.PositiveIntegerField(default=0, help_text='Last line of the file that was processed')),
+                ('imported', models.PositiveIntegerField(default=0)),
+                ('rejected', models.PositiveIntegerField(default=0)),
+                ('started', models.DateTimeField(auto_now_add=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='surveyimport',
+            unique_together={('kind', 'path')},
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.1.7 on 2026-10-19 00:00
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bathouse', '0004_survey_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='observation',
+            name='species',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, help_text='Ids of the bat species seen', size=None),
+        ),
+        migrations.AddField(
+            model_name='observation',
+            name='species_counts',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.PositiveIntegerField(), blank=True, default=list, help_text='Number of bats seen of each species in `species`', size=None),
+        ),
+        migrations.AddIndex(
+            model_name='observation',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['species'], name='bathouse_ob_species_fab2cd_gin'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.1.7 on 2026-10-19 00:00
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bathouse', '0005_observation_species'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuitabilityModel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('columns', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=64), help_text='Names of the feature columns', size=None)),
+                ('center', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), help_text='Mean of each column, subtracted before scoring', size=None)),
+                ('scale', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), help_text='Standard deviation of each column', size=None)),
+                ('coefficients', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=None)),
+                ('intercept', models.FloatField()),
+                ('houses', models.PositiveIntegerField(help_text='Number of houses the model was fitted on')),
+                ('occupied', models.PositiveIntegerField(help_text='Number of those houses where bats were seen')),
+                ('log_loss', models.FloatField(help_text='Mean log loss over the houses fitted on')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 2.1.7 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+TABLE = 'bathouse_houseenvironmentfeatures'
+INDEX = 'bathouse_ho_water_r_6b7ad1_idx'
+BATCH_SIZE = 10000
+METERS_PER_UNIT = {'FT': 0.3048, 'KM': 1000, 'ME': 1, 'MI': 1609.344}
+
+
+def backfill_meters(apps, schema_editor):
+    """
+    Converts the existing distances a range of ids at a time. The migration
+    isn't atomic, so every batch commits on its own and no lock is held on
+    the whole table for long.
+    """
+    factor = "CASE water_resource_units {} END".format(' '.join(
+        "WHEN '{}' THEN {}".format(units, meters)
+        for units, meters in METERS_PER_UNIT.items()))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT min(id), max(id) FROM {TABLE}")
+        first, last = cursor.fetchone()
+        if first is None:
+            return
+        for start in range(first, last + 1, BATCH_SIZE):
+            cursor.execute(
+                f"UPDATE {TABLE} SET water_resource_meters = "
+                f"water_resource_distance * {factor} "
+                "WHERE id >= %s AND id < %s", [start, start + BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('bathouse', '0006_suitability_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='houseenvironmentfeatures',
+            name='water_resource_meters',
+            field=models.FloatField(blank=True, editable=False, help_text='Distance to nearest water resource in meters', null=True),
+        ),
+        migrations.RunPython(backfill_meters, migrations.RunPython.noop),
+        # Built without blocking writes, once the column is filled.
+        migrations.RunSQL(
+            f"CREATE INDEX CONCURRENTLY {INDEX} ON {TABLE} "
+            "(water_resource_meters)",
+            f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX}",
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='houseenvironmentfeatures',
+                    index=models.Index(fields=['water_resource_meters'], name=INDEX),
+                ),
+            ],
+        ),
+    ]
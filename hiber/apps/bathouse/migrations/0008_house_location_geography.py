@@ -0,0 +1,24 @@
+# Generated by Django 2.1.7 on 2026-10-19 00:00
+
+from django.db import migrations
+
+TABLE = 'bathouse_house'
+INDEX = 'bathouse_house_location_geog_idx'
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('bathouse', '0007_water_resource_meters'),
+    ]
+
+    operations = [
+        # For distances in meters, see bathouse/duplicates.py. Django can't
+        # describe an index on an expression, so it isn't in the model state.
+        migrations.RunSQL(
+            f"CREATE INDEX CONCURRENTLY {INDEX} ON {TABLE} "
+            "USING gist ((location::geography))",
+            f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX}",
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.1.7 on 2026-10-19 00:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailimages', '0001_squashed_0021'),
+        ('bathouse', '0008_house_location_geography'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ObservationPhoto',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('caption', models.CharField(blank=True, max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('rendered', models.DateTimeField(blank=True, editable=False, help_text='When the renditions were generated', null=True)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wagtailimages.Image')),
+                ('observation', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='photos', to='bathouse.Observation')),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.1.7 on 2026-10-19 00:00
+
+from django.db import migrations, models
+
+TABLE = 'bathouse_house'
+INDEX = 'bathouse_ho_propert_59c217_idx'
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('bathouse', '0009_observation_photo'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f"CREATE INDEX CONCURRENTLY {INDEX} ON {TABLE} (property_type)",
+            f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX}",
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='house',
+                    index=models.Index(fields=['property_type'], name=INDEX),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+
+NAME = "Observation photos"
+# django-treebeard's materialized path: four base-36 digits per level.
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+STEPLEN = 4
+
+
+def path_step(number):
+    digits = ''
+    while number:
+        number, digit = divmod(number, len(ALPHABET))
+        digits = ALPHABET[digit] + digits
+    return digits.rjust(STEPLEN, '0')
+
+
+def create_collection(apps, schema_editor):
+    """
+    Keeps volunteers' photos out of the CMS's image chooser: they go in a
+    collection of their own, under the root one.
+    """
+    Collection = apps.get_model('wagtailcore.Collection')
+    Image = apps.get_model('wagtailimages.Image')
+    ObservationPhoto = apps.get_model('bathouse.ObservationPhoto')
+    root = Collection.objects.get(depth=1)
+    collection = Collection.objects.filter(depth=2, name=NAME).first()
+    if collection is None:
+        last = Collection.objects.filter(depth=2).order_by('-path').first()
+        number = int(last.path[-STEPLEN:], len(ALPHABET)) + 1 if last else 1
+        collection = Collection.objects.create(
+            name=NAME, path=root.path + path_step(number), depth=2,
+            numchild=0)
+        root.numchild += 1
+        root.save(update_fields=['numchild'])
+    photos = ObservationPhoto.objects.values('image_id')
+    Image.objects.filter(pk__in=photos).update(collection=collection)
+
+
+def remove_collection(apps, schema_editor):
+    Collection = apps.get_model('wagtailcore.Collection')
+    Image = apps.get_model('wagtailimages.Image')
+    root = Collection.objects.get(depth=1)
+    collection = Collection.objects.filter(depth=2, name=NAME).first()
+    if collection is None:
+        return
+    Image.objects.filter(collection=collection).update(collection=root)
+    collection.delete()
+    root.numchild -= 1
+    root.save(update_fields=['numchild'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailcore', '0025_collection_initial_data'),
+        ('bathouse', '0010_house_property_type_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_collection, remove_collection),
+    ]
@@ -0,0 +1,338 @@
+"""
+Wagtail ModelAdmin building blocks for the large bathouse tables.
+
+Index pages never count a whole table: EstimatedCountIndexView asks the
+planner how many rows a listing has and only counts exactly when that is
+small. List filters only filter on indexed columns; the map filter uses the
+spatial index on House.location, and its map (static/js/bbox_filter.js)
+only loads OpenStreetMap tiles, no third-party script. Bulk actions act on
+every row the current filters select, not only the page shown.
+"""
+import csv
+from django.conf.urls import url
+from django.contrib.admin import SimpleListFilter
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Polygon
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections, transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from wagtail.admin import messages
+from wagtail.contrib.modeladmin.options import ModelAdmin
+from wagtail.contrib.modeladmin.views import IndexView
+from . import changefeed, partitions, search
+from .models import Bat, House
+
+# Listings the planner expects to have fewer rows than this are counted.
+EXACT_COUNT_BELOW = 10000
+# Rows changed per transaction by bulk actions.
+BULK_BATCH_SIZE = 1000
+
+
+def planned_rows(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        return int(cursor.fetchone()[0][0]['Plan']['Plan Rows'])
+
+
+def estimated_count(queryset):
+    """
+    The number of rows in `queryset`, as estimated by the planner when it
+    is large.
+    """
+    estimate = planned_rows(queryset)
+    if estimate < EXACT_COUNT_BELOW:
+        return queryset.count()
+    return estimate
+
+
+def batches(ids, size=BULK_BATCH_SIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+class EstimatedCountIndexView(IndexView):
+    """
+    IndexView with estimated counts. Wagtail's counts the whole table, then
+    the filtered listing twice, once more for the paginator.
+    """
+
+    def get_context_data(self, **kwargs):
+        all_count = estimated_count(self.get_base_queryset())
+        if self.get_filters_params() or self.query:
+            result_count = estimated_count(self.queryset)
+        else:
+            result_count = all_count
+        paginator = Paginator(self.queryset, self.items_per_page)
+        paginator.count = result_count
+        try:
+            page_obj = paginator.page(self.page_num + 1)
+        except InvalidPage:
+            page_obj = paginator.page(1)
+        query_string = self.get_query_string()
+        context = {
+            'view':
+            self,
+            'all_count':
+            all_count,
+            'result_count':
+            result_count,
+            'paginator':
+            paginator,
+            'page_obj':
+            page_obj,
+            'object_list':
+            page_obj.object_list,
+            'user_can_create':
+            self.permission_helper.user_can_create(self.request.user),
+            'bulk_actions':
+            [(label, self.url_helper.get_action_url(name) + query_string)
+             for name, label, _ in self.model_admin.bulk_actions],
+        }
+        context.update(kwargs)
+        # Past IndexView's, which would count again.
+        return super(IndexView, self).get_context_data(**context)
+
+    def get_search_results(self, request, queryset, search_term):
+        fields = self.search_fields
+        if not search_term or not fields:
+            return queryset, False
+        # On the trigram and full-text indexes (search_fields must have
+        # them), where Wagtail's icontains lookups read the whole table.
+        return search.ranked(queryset, search_term, fields), False
+
+
+class ExportView(EstimatedCountIndexView):
+    """
+    Streams the selected rows as CSV, a database cursor at a time.
+    """
+
+    def get(self, request, *args, **kwargs):
+        fields = [
+            field.attname for field in self.opts.concrete_fields
+            if field.name != 'search_vector'
+        ]
+        rows = self.queryset.values_list(*fields).iterator(chunk_size=2000)
+        writer = csv.writer(Echo())
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in prepend(fields, rows)),
+            content_type='text/csv')
+        response['Content-Disposition'] = (
+            f'attachment; filename="{self.opts.model_name}.csv"')
+        return response
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def prepend(first, rows):
+    yield first
+    yield from rows
+
+
+class ReassignWatcherView(EstimatedCountIndexView):
+    """
+    Hands the selected houses over to another watcher, who sees them in
+    their change feed while the former watchers see them go. Refuses to
+    act on the whole table: the listing must be filtered or searched.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.permission_helper.user_has_specific_permission(
+                request.user,
+                self.permission_helper.get_perm_codename('change')):
+            raise PermissionDenied
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        if self.selects_everything():
+            return self.refuse(request)
+        return self.form(request)
+
+    def post(self, request, *args, **kwargs):
+        if self.selects_everything():
+            return self.refuse(request)
+        User = get_user_model()
+        username = request.POST.get('watcher', '').strip()
+        try:
+            watcher = User.objects.get(**{User.USERNAME_FIELD: username})
+        except User.DoesNotExist:
+            return self.form(request, error=f"No user {username!r}.")
+        ids = list(self.queryset.values_list('pk', flat=True))
+        for batch in batches(ids):
+            with transaction.atomic():
+                House.objects.filter(pk__in=batch).update(
+                    watcher=watcher, updated=timezone.now())
+                # update() sends no signals.
+                changefeed.publish([
+                    changefeed.event(House(pk=pk, watcher=watcher), 'update')
+                    for pk in batch
+                ])
+        messages.success(request,
+                         f"Reassigned {len(ids)} houses to {username}.")
+        return redirect(self.index_url + self.get_query_string())
+
+    def selects_everything(self):
+        return not (self.get_filters_params() or self.query)
+
+    def refuse(self, request):
+        messages.error(
+            request, "Filter or search the houses to reassign first; "
+            "all of them can't be reassigned at once.")
+        return redirect(self.index_url)
+
+    def form(self, request, error=None):
+        return TemplateResponse(
+            request, 'modeladmin/bathouse/reassign_watcher.html', {
+                'view': self,
+                'count': estimated_count(self.queryset),
+                'error': error,
+            })
+
+
+class BBoxFilter(SimpleListFilter):
+    """
+    Rows located in the area shown on a map, which staff pan and zoom
+    before filtering to it. Takes `min_lon,min_lat,max_lon,max_lat`, like
+    the API's `in_bbox`.
+    """
+    title = "area"
+    parameter_name = 'in_bbox'
+    template = 'modeladmin/bathouse/includes/bbox_filter.html'
+    location_field = 'location'
+    # Roughly the extent of the houses surveyed so far.
+    default_extent = (-73.7, 41.0, -71.8, 42.1)
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def extent(self):
+        try:
+            coords = [float(c) for c in (self.value() or '').split(',')]
+        except ValueError:
+            coords = []
+        return coords if len(coords) == 4 else None
+
+    def map_extent(self):
+        return ','.join(map(str, self.extent() or self.default_extent))
+
+    def queryset(self, request, queryset):
+        extent = self.extent()
+        if extent is None:
+            return queryset
+        bbox = Polygon.from_bbox(extent)
+        bbox.srid = 4326
+        return queryset.filter(**{f"{self.location_field}__within": bbox})
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.extent() is None,
+            'query_string': changelist.get_query_string({},
+                                                        [self.parameter_name]),
+            'display': "Anywhere",
+        }
+
+
+class HouseBBoxFilter(BBoxFilter):
+    title = "house area"
+    location_field = 'house__location'
+
+
+class SeasonFilter(SimpleListFilter):
+    """
+    Observations of a season: PostgreSQL only reads that season's partition.
+    """
+    title = "season"
+    parameter_name = 'season'
+
+    def lookups(self, request, model_admin):
+        connection = connections[model_admin.model.objects.db]
+        if partitions.is_partitioned(connection):
+            years = partitions.partition_years(connection)
+        else:
+            this_year = timezone.now().year
+            years = range(this_year - 4, this_year + 1)
+        return [(str(year), str(year)) for year in reversed(years)]
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.seasons(int(self.value()))
+        return queryset
+
+
+class SpeciesFilter(SimpleListFilter):
+    """
+    Observations where a species was seen, on the GIN index of `species`.
+    """
+    title = "species"
+    parameter_name = 'species'
+
+    def lookups(self, request, model_admin):
+        return [(str(pk), name) for pk, name in Bat.objects.order_by(
+            'common_name').values_list('pk', 'common_name')]
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.of_species(int(self.value()))
+        return queryset
+
+
+class WaterDistanceFilter(SimpleListFilter):
+    """
+    Ranges of the distance to water, on the index of its value in meters.
+    """
+    title = "distance to water"
+    parameter_name = 'water'
+    RANGES = {
+        'near': ("Under 100 m", 0, 100),
+        'mid': ("100 m to 1 km", 100, 1000),
+        'far': ("Over 1 km", 1000, None),
+    }
+
+    def lookups(self, request, model_admin):
+        return [(key, label) for key, (label, _, _) in self.RANGES.items()]
+
+    def queryset(self, request, queryset):
+        if self.value() not in self.RANGES:
+            return queryset
+        _, low, high = self.RANGES[self.value()]
+        queryset = queryset.filter(water_resource_meters__gte=low)
+        if high is not None:
+            queryset = queryset.filter(water_resource_meters__lt=high)
+        return queryset
+
+
+class LargeTableModelAdmin(ModelAdmin):
+    """
+    ModelAdmin for tables too large to count, with bulk actions: (name,
+    label, view class) triples, each view acting on the rows the index
+    page's filters select.
+    """
+    index_view_class = EstimatedCountIndexView
+    index_view_extra_css = ['css/bbox_filter.css']
+    index_view_extra_js = ['js/bbox_filter.js']
+    list_per_page = 50
+    bulk_actions = (('export', "Export as CSV", ExportView), )
+
+    def bulk_action_view(self, view_class):
+        def view(request):
+            return view_class.as_view(model_admin=self)(request)
+
+        return view
+
+    def get_admin_urls_for_registration(self):
+        urls = super().get_admin_urls_for_registration()
+        return urls + tuple(
+            url(self.url_helper._get_action_url_pattern(name),
+                self.bulk_action_view(view_class),
+                name=self.url_helper.get_action_url_name(name))
+            for name, _, view_class in self.bulk_actions)
@@ -3,10 +3,16 @@ from django.contrib.auth import get_user_model
 from django.contrib.gis.db import models
 from django.contrib.postgres.fields import (ArrayField, FloatRangeField,
                                             IntegerRangeField)
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.signals import post_delete
 from wagtail.admin.edit_handlers import (MultiFieldPanel, FieldRowPanel,
                                          FieldPanel)
+from wagtail.core.models import Collection
 from wagtail.images.edit_handlers import ImageChooserPanel
+from wagtail.images.models import Image
+from . import changefeed, partitions  # noqa: F401
 
 
 class ChoiceArrayField(ArrayField):
@@ -110,6 +116,12 @@ class Bat(models.Model):
         ImageChooserPanel('bat_image')
     ]
 
+    # Kept up to date from the name columns by a database trigger.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [GinIndex(fields=['search_vector'])]
+
     def __str__(self):
         return f"{self.common_name} ({self.scientific_name})"
 
@@ -152,6 +164,26 @@ class House(models.Model):
     updated = models.DateTimeField(auto_now=True,
                                    help_text="Date when House was updated")
 
+    # Kept up to date from town_name by a database trigger.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Set by `manage.py import_surveys` for houses loaded from survey files,
+    # which refer to them by this reference.
+    source_ref = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+        help_text="Reference of the house in imported survey files")
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector']),
+            # For the admin's list filter.
+            models.Index(fields=['property_type']),
+        ]
+
 
 class HouseEnvironmentFeatures(models.Model):
     """
@@ -305,6 +337,14 @@ class HouseEnvironmentFeatures(models.Model):
             ('MI', 'Miles'),
         ),
         help_text="Units of distance to nearest water resource")
+    METERS_PER_UNIT = {'FT': 0.3048, 'KM': 1000, 'ME': 1, 'MI': 1609.344}
+    # The distance in meters, whatever the units, so it can be filtered
+    # and sorted on. Kept up to date by save().
+    water_resource_meters = models.FloatField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Distance to nearest water resource in meters")
 
     # Sunlight on bat house
     morning_sunlight = models.PositiveIntegerField(
@@ -319,6 +359,27 @@ class HouseEnvironmentFeatures(models.Model):
     other_features = models.TextField(
         help_text="Other environmental features not covered")
 
+    class Meta:
+        indexes = [models.Index(fields=['water_resource_meters'])]
+
+    def update_water_resource_meters(self):
+        """
+        Sets water_resource_meters; for bulk_create(), which skips save().
+        """
+        factor = self.METERS_PER_UNIT.get(self.water_resource_units)
+        if factor is None or self.water_resource_distance is None:
+            self.water_resource_meters = None
+        else:
+            self.water_resource_meters = self.water_resource_distance * factor
+
+    def save(self, *args, **kwargs):
+        self.update_water_resource_meters()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = [
+                *kwargs['update_fields'], 'water_resource_meters'
+            ]
+        super().save(*args, **kwargs)
+
 
 class HousePhysicalFeatures(models.Model):
     """
@@ -390,10 +451,31 @@ class HousePhysicalFeatures(models.Model):
         help_text="Date when the bat house was installed")
 
 
+class ObservationQuerySet(models.QuerySet):
+    def seasons(self, first, last=None):
+        """
+        Observations checked from season `first` to `last` (inclusive),
+        seasons being calendar years. The range on `checked` lets
+        PostgreSQL skip the partitions of every other season.
+        """
+        start = partitions.season_bounds(first)[0]
+        end = partitions.season_bounds(last or first)[1]
+        return self.filter(checked__gte=start, checked__lt=end)
+
+    def since(self, moment):
+        return self.filter(checked__gte=moment)
+
+    def of_species(self, bat_id):
+        # Uses the GIN index on `species`.
+        return self.filter(species__contains=[bat_id])
+
+
 class Observation(models.Model):
     """
     Describes a model that a user will submit about observations for the
     presence of bats in their bat house.
+
+    The table is partitioned by season; see partitions.py.
     """
     house = models.ForeignKey(House,
                               on_delete=models.CASCADE,
@@ -413,3 +495,115 @@ class Observation(models.Model):
             the bat house?")
     notes = models.TextField(blank=True,
                              help_text="Other notes about observations")
+
+    # Arrays rather than a through model to Bat: no foreign key can point
+    # into the partitioned observation table, and the GIN index on
+    # `species` finds the observations of a species directly.
+    species = ArrayField(models.IntegerField(),
+                         default=list,
+                         blank=True,
+                         help_text="Ids of the bat species seen")
+    species_counts = ArrayField(
+        models.PositiveIntegerField(),
+        default=list,
+        blank=True,
+        help_text="Number of bats seen of each species in `species`")
+
+    objects = ObservationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [GinIndex(fields=['species'])]
+
+    def species_count(self, bat_id):
+        return dict(zip(self.species, self.species_counts)).get(bat_id, 0)
+
+
+class ObservationPhoto(models.Model):
+    """
+    A photo attached to an observation, of guano or of roosting bats. The
+    file is a Wagtail image, in the COLLECTION made by migration 0011 so
+    editors don't find volunteers' photos among the site's images. The
+    `render_observation_photo` job makes its RENDITIONS in the worker pool
+    and then sets `rendered`. Deleting a photo deletes its image.
+    """
+    RENDITIONS = {'thumbnail': 'fill-200x200', 'web': 'max-1600x1600'}
+    COLLECTION = "Observation photos"
+
+    # No foreign key constraint can point into the partitioned observation
+    # table; Django still deletes the photos of a deleted observation.
+    observation = models.ForeignKey(Observation,
+                                    on_delete=models.CASCADE,
+                                    db_constraint=False,
+                                    related_name='photos')
+    image = models.ForeignKey('wagtailimages.Image',
+                              on_delete=models.CASCADE,
+                              related_name='+')
+    caption = models.CharField(max_length=255, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    rendered = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When the renditions were generated")
+
+    @classmethod
+    def collection(cls):
+        return Collection.objects.get(depth=2, name=cls.COLLECTION)
+
+
+def delete_photo_image(sender, instance, **kwargs):
+    # The image only ever belongs to the photo. Wagtail deletes its file
+    # and renditions along with it.
+    Image.objects.filter(pk=instance.image_id).delete()
+
+
+post_delete.connect(delete_photo_image, sender=ObservationPhoto)
+
+
+class SurveyImport(models.Model):
+    """
+    Progress of loading a survey file with `manage.py import_surveys`. It is
+    saved in the same transaction as each batch of rows, so an interrupted
+    import resumes without skipping or repeating any.
+    """
+    kind = models.CharField(max_length=16, help_text="Kind of rows loaded")
+    path = models.CharField(max_length=1024,
+                            help_text="Absolute path of the survey file")
+    size = models.BigIntegerField(
+        help_text="Size of the file when the import started")
+    line = models.PositiveIntegerField(
+        default=0, help_text="Last line of the file that was processed")
+    imported = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    started = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('kind', 'path')
+
+
+class SuitabilityModel(models.Model):
+    """
+    A logistic regression of house occupancy on house features, fitted by
+    `manage.py fit_suitability`. The latest one scores houses and sites;
+    see suitability.py.
+    """
+    columns = ArrayField(models.CharField(max_length=64),
+                         help_text="Names of the feature columns")
+    center = ArrayField(models.FloatField(),
+                        help_text="Mean of each column, subtracted before "
+                        "scoring")
+    scale = ArrayField(models.FloatField(),
+                       help_text="Standard deviation of each column")
+    coefficients = ArrayField(models.FloatField())
+    intercept = models.FloatField()
+    houses = models.PositiveIntegerField(
+        help_text="Number of houses the model was fitted on")
+    occupied = models.PositiveIntegerField(
+        help_text="Number of those houses where bats were seen")
+    log_loss = models.FloatField(
+        help_text="Mean log loss over the houses fitted on")
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Suitability model #{self.pk} ({self.houses} houses)"
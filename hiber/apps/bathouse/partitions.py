@@ -0,0 +1,187 @@
+"""
+Yearly range partitions of the observation table, on `checked`.
+
+Migration 0003 turns the table into a partitioned one on PostgreSQL 11 and
+later; on older servers it stays a plain table and the functions here
+report it as not partitioned. Each season (calendar year, UTC) gets its own
+partition, and rows for years without one land in the default partition.
+Queries that filter on `checked` (see ObservationQuerySet.seasons()) only
+scan the partitions of the years they ask for.
+
+Closed seasons can be archived: their rows are written to a gzipped CSV file
+and the partition is dropped, along with the observations' photos, which
+are not archived. restore_partition() loads a file back.
+"""
+import gzip
+import os
+import re
+from datetime import datetime
+from django.db import transaction
+from django.utils import timezone
+
+TABLE = 'bathouse_observation'
+DEFAULT_PARTITION = TABLE + '_default'
+PARTITION_NAME = re.compile(r'^{}_y(\d{{4}})$'.format(TABLE))
+
+
+def partition_name(year):
+    return '{}_y{}'.format(TABLE, year)
+
+
+def season_bounds(year):
+    """
+    The [start, end) range of `checked` for a season.
+    """
+    return (datetime(year, 1, 1, tzinfo=timezone.utc),
+            datetime(year + 1, 1, 1, tzinfo=timezone.utc))
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql' or connection.pg_version < 110000:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table "
+            "WHERE partrelid = to_regclass(%s)", [TABLE])
+        return cursor.fetchone() is not None
+
+
+def partition_years(connection):
+    """
+    Seasons that have a partition of their own, oldest first.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)", [TABLE])
+        names = [row[0] for row in cursor.fetchall()]
+    return sorted(
+        int(match.group(1)) for match in map(PARTITION_NAME.match, names)
+        if match)
+
+
+def unpartitioned_years(connection):
+    """
+    Seasons with rows in the default partition.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT DISTINCT extract(year FROM checked AT TIME ZONE 'UTC') "
+            "FROM {}".format(DEFAULT_PARTITION))
+        return sorted(int(row[0]) for row in cursor.fetchall())
+
+
+def create_partition(connection, year):
+    """
+    Creates the partition for `year`, moving its rows out of the default
+    partition, which PostgreSQL would otherwise refuse.
+    """
+    name = partition_name(year)
+    start, end = season_bounds(year)
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        cursor.execute("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS "
+                       "INCLUDING CONSTRAINTS)".format(name, TABLE))
+        cursor.execute(
+            "WITH moved AS (DELETE FROM {} WHERE checked >= %s "
+            "AND checked < %s RETURNING *) "
+            "INSERT INTO {} SELECT * FROM moved".format(
+                DEFAULT_PARTITION, name), [start, end])
+        cursor.execute(
+            "ALTER TABLE {} ATTACH PARTITION {} "
+            "FOR VALUES FROM (%s) TO (%s)".format(TABLE, name), [start, end])
+
+
+def ensure_partitions(connection, years):
+    """
+    Creates the partitions missing for `years` and for every season found in
+    the default partition. Returns the seasons created.
+    """
+    existing = set(partition_years(connection))
+    missing = sorted((set(years) | set(unpartitioned_years(connection))) -
+                     existing)
+    for year in missing:
+        create_partition(connection, year)
+    return missing
+
+
+def archive_path(directory, year):
+    return os.path.join(directory, 'observations-{}.csv.gz'.format(year))
+
+
+def archive_partition(connection, year, directory):
+    """
+    Writes the season's rows to a gzipped CSV file in `directory`, then
+    detaches and drops its partition. The partition is only dropped once the
+    file is safely on disk. Returns the number of rows archived.
+    """
+    name = partition_name(year)
+    path = archive_path(directory, year)
+    os.makedirs(directory, exist_ok=True)
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        # No writes to the season until it is gone.
+        cursor.execute("LOCK TABLE {} IN SHARE MODE".format(name))
+        cursor.execute("SELECT count(*) FROM {}".format(name))
+        rows = cursor.fetchone()[0]
+        with open(path + '.partial', 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+                cursor.copy_expert(
+                    "COPY (SELECT * FROM {} ORDER BY id) TO STDOUT "
+                    "WITH (FORMAT csv, HEADER)".format(name), archive)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(path + '.partial', path)
+        images = photo_images(connection, name)
+        cursor.execute("ALTER TABLE {} DETACH PARTITION {}".format(
+            TABLE, name))
+        cursor.execute("DROP TABLE {}".format(name))
+        # Files can't be rolled back: only delete them, and the photos with
+        # their images, once the season is gone for good.
+        transaction.on_commit(images.delete, using=connection.alias)
+    return rows
+
+
+def photo_images(connection, partition):
+    """
+    The images of the photos of the observations in `partition`. No
+    constraint ties photos to rows dropped in SQL, so archiving deletes them
+    itself; deleting an image deletes its photo and its file.
+    """
+    # models.py imports this module.
+    from wagtail.images.models import Image
+    from .models import ObservationPhoto
+    using = connection.alias
+    photos = ObservationPhoto.objects.using(using).extra(
+        where=[f"observation_id IN (SELECT id FROM {partition})"])
+    # Read now: the partition is dropped before they are deleted.
+    image_ids = list(photos.values_list('image_id', flat=True))
+    return Image.objects.using(using).filter(pk__in=image_ids)
+
+
+def restore_partition(connection, year, directory):
+    """
+    Loads an archived season back into the observation table. Fails, and
+    changes nothing, if any of its rows are still there. Returns the number
+    of rows restored.
+    """
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        if year not in partition_years(connection):
+            create_partition(connection, year)
+        with gzip.open(archive_path(directory, year), 'rb') as archive:
+            # Columns are matched by the header, so archives stay loadable
+            # after columns are added to the table.
+            header = archive.readline().decode('utf-8').strip()
+            columns = ', '.join(
+                connection.ops.quote_name(column)
+                for column in header.split(','))
+            cursor.copy_expert(
+                "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+                    TABLE, columns), archive)
+        start, end = season_bounds(year)
+        cursor.execute(
+            "SELECT count(*) FROM {} WHERE checked >= %s AND checked < %s".
+            format(TABLE), [start, end])
+        return cursor.fetchone()[0]
@@ -0,0 +1,61 @@
+"""
+Ranked, typo-tolerant search over bats and houses.
+
+Each query matches on two indexes at once: the full-text `search_vector`
+with every word treated as a prefix (type-ahead), and trigram similarity on
+the name columns (misspellings). Results are ranked by the better of the two
+scores.
+"""
+import re
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from .models import Bat, House
+
+SEARCH_CONFIG = 'simple'
+
+
+class PrefixSearchQuery(SearchQuery):
+    """
+    Matches every word of the query as a prefix: "little br" finds
+    "Little brown bat". Django 2.1's SearchQuery only offers plainto_tsquery,
+    which matches whole words.
+    """
+
+    def __init__(self, value, **kwargs):
+        words = re.findall(r'\w+', value.lower())
+        super().__init__(' & '.join(f"{word}:*" for word in words),
+                         config=SEARCH_CONFIG,
+                         **kwargs)
+
+    def as_sql(self, compiler, connection):
+        template, params = super().as_sql(compiler, connection)
+        return template.replace('plainto_tsquery', 'to_tsquery'), params
+
+
+def ranked(queryset, text, fields):
+    """
+    Filters `queryset` to rows matching `text` on `search_vector` or on any
+    of the trigram-indexed `fields`, best matches first.
+    """
+    if not re.search(r'\w', text):
+        return queryset.none()
+    query = PrefixSearchQuery(text)
+    matches = Q(search_vector=query)
+    for field in fields:
+        matches |= Q(**{f"{field}__trigram_similar": text})
+    similarity = [TrigramSimilarity(field, text) for field in fields]
+    return queryset.filter(matches).annotate(rank=Greatest(
+        SearchRank(F('search_vector'), query), *similarity)).order_by(
+            '-rank', 'pk')
+
+
+def search_bats(text):
+    return ranked(Bat.objects.all(), text, ('common_name', 'scientific_name'))
+
+
+def search_houses(text, queryset=None):
+    if queryset is None:
+        queryset = House.objects.all()
+    return ranked(queryset, text, ('town_name', ))
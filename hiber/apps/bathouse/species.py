@@ -0,0 +1,67 @@
+"""
+Species distribution queries over observations.
+
+Observations record species as parallel arrays (see Observation.species), so
+totals are computed in the database by unnesting them, one row per species
+seen, on top of an ordinary Observation queryset. Filters on the queryset
+(season, bounding box, owner) keep their indexes and partition pruning.
+"""
+from collections import defaultdict
+from django.contrib.gis.db.models.functions import SnapToGrid
+from django.db import connections
+
+
+def species_totals(observations, grid=None):
+    """
+    Totals per species over `observations`: how many observations, bats and
+    houses. With `grid` (in degrees), totals are per grid cell as well.
+
+    Returns rows of (bat id, observations, bats, houses), or of (bat id,
+    cell longitude, cell latitude, observations, bats, houses) with a grid.
+    """
+    inner = observations.values('house_id', 'species', 'species_counts')
+    cell = ''
+    if grid:
+        inner = inner.annotate(cell=SnapToGrid('house__location', grid))
+        cell = ', ST_X(obs.cell), ST_Y(obs.cell)'
+    sql, params = inner.query.sql_with_params()
+    query = (f"SELECT s.bat_id{cell}, count(*), sum(s.bats), "
+             f"count(DISTINCT obs.house_id) FROM ({sql}) obs "
+             "CROSS JOIN LATERAL unnest(obs.species, obs.species_counts) "
+             f"AS s(bat_id, bats) GROUP BY s.bat_id{cell} ORDER BY s.bat_id")
+    with connections[observations.db].cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+
+def richness(observations):
+    """
+    The species seen in `observations`, most observed first.
+    """
+    species = [{
+        'bat': bat,
+        'observations': count,
+        'bats': bats,
+        'houses': houses
+    } for bat, count, bats, houses in species_totals(observations)]
+    species.sort(key=lambda row: -row['observations'])
+    return {'richness': len(species), 'species': species}
+
+
+def richness_grid(observations, grid):
+    """
+    The number of species seen in each grid cell of `observations`.
+    """
+    cells = defaultdict(list)
+    for bat, longitude, latitude, *_ in species_totals(observations, grid):
+        cells[(longitude, latitude)].append(bat)
+    return {
+        'grid':
+        grid,
+        'cells': [{
+            'longitude': longitude,
+            'latitude': latitude,
+            'richness': len(bats),
+            'species': bats
+        } for (longitude, latitude), bats in sorted(cells.items())]
+    }
@@ -0,0 +1,259 @@
+"""
+Habitat suitability: the chance that a bat house is occupied, predicted
+from its latest environment and physical features.
+
+Features are encoded into a NumPy matrix, one row per house: one-hot
+columns for the choices (several per row for array fields such as
+`habitat_type`) and standardized columns for the numbers. A logistic
+regression is fitted on whether bats were ever present in each house's
+observations (`manage.py fit_suitability`) and saved as a SuitabilityModel.
+Scoring is then a single matrix product over every house.
+
+Columns are named, and saved with the coefficients, so a model keeps
+scoring correctly when choices are added; new columns just weigh nothing.
+"""
+import math
+import numpy as np
+from django.contrib.postgres.aggregates import BoolOr
+from django.core.cache import cache
+from .models import (HouseEnvironmentFeatures, HousePhysicalFeatures,
+                     Observation, SuitabilityModel)
+
+CACHE_KEY = 'suitability:model'
+
+CHOICE_FEATURES = (
+    (HousePhysicalFeatures, 'direction'),
+    (HousePhysicalFeatures, 'color'),
+    (HouseEnvironmentFeatures, 'habitat_type'),
+    (HouseEnvironmentFeatures, 'night_light_pollution_amount'),
+)
+NUMBER_FEATURES = ('morning_sunlight', 'afternoon_sunlight', 'water_distance')
+
+# The columns read for each house, from its latest row of each model.
+SOURCE_FIELDS = {
+    HousePhysicalFeatures: ('direction', 'color'),
+    HouseEnvironmentFeatures:
+    ('habitat_type', 'night_light_pollution_amount', 'morning_sunlight',
+     'afternoon_sunlight', 'water_resource_meters'),
+}
+
+
+class SuitabilityError(Exception):
+    pass
+
+
+def feature_columns():
+    """
+    The names of the matrix columns: `field:code` for every choice, then
+    the numbers.
+    """
+    columns = []
+    for model, name in CHOICE_FEATURES:
+        field = model._meta.get_field(name)
+        choices = field.choices or field.base_field.choices
+        columns.extend(f'{name}:{code}' for code, _ in choices)
+    return columns + list(NUMBER_FEATURES)
+
+
+def water_distance(record):
+    """
+    Log distance to water, as meters grow less telling the further away.
+    Proposed sites give a distance and units instead of meters.
+    """
+    meters = record.get('water_resource_meters')
+    if meters is None and record.get('water_resource_distance'):
+        per_unit = HouseEnvironmentFeatures.METERS_PER_UNIT
+        meters = record['water_resource_distance'] * per_unit[
+            record['water_resource_units']]
+    if meters is None:
+        return None
+    return math.log1p(meters)
+
+
+def encode(records, columns):
+    """
+    The feature matrix of `records` (dicts of feature values, as returned by
+    house_records()). Missing numbers are NaN; missing choices are all 0.
+    """
+    index = {column: i for i, column in enumerate(columns)}
+    matrix = np.zeros((len(records), len(columns)))
+    rows, cols = [], []
+    for i, record in enumerate(records):
+        for _, name in CHOICE_FEATURES:
+            codes = record.get(name) or ()
+            if isinstance(codes, str):
+                codes = (codes, )
+            for code in codes:
+                col = index.get(f'{name}:{code}')
+                if col is not None:
+                    rows.append(i)
+                    cols.append(col)
+    matrix[np.array(rows, dtype=int), np.array(cols, dtype=int)] = 1.0
+    for name in NUMBER_FEATURES:
+        if name not in index:
+            continue
+        if name == 'water_distance':
+            values = [water_distance(record) for record in records]
+        else:
+            values = [record.get(name) for record in records]
+        matrix[:, index[name]] = np.array(values, dtype=float)
+    return matrix
+
+
+def latest_features(model, order, house_ids=None):
+    queryset = model.objects.all()
+    if house_ids is not None:
+        queryset = queryset.filter(house_id__in=house_ids)
+    # DISTINCT ON keeps the first, i.e. latest, row per house.
+    return queryset.order_by('house_id', order).distinct('house_id').values(
+        'house_id', *SOURCE_FIELDS[model])
+
+
+def house_records(house_ids=None):
+    """
+    {house id: features} from the latest environment survey and physical
+    description of each house.
+    """
+    records = {}
+    for model, order in ((HouseEnvironmentFeatures, '-surveyed'),
+                         (HousePhysicalFeatures, '-id')):
+        for row in latest_features(model, order, house_ids):
+            records.setdefault(row.pop('house_id'), {}).update(row)
+    return records
+
+
+def sigmoid(z):
+    # exp(-log(1 + e^-z)) never overflows.
+    return np.exp(-np.logaddexp(0, -z))
+
+
+def fit_logistic(matrix, outcomes, l2=1.0, iterations=50, tolerance=1e-8):
+    """
+    L2-regularized logistic regression by Newton's method. Returns the
+    intercept and the coefficients.
+    """
+    design = np.hstack([np.ones((matrix.shape[0], 1)), matrix])
+    penalty = l2 * np.eye(design.shape[1])
+    penalty[0, 0] = 0  # The intercept isn't shrunk.
+    weights = np.zeros(design.shape[1])
+    for _ in range(iterations):
+        predicted = sigmoid(design @ weights)
+        gradient = design.T @ (predicted - outcomes) + penalty @ weights
+        hessian = (design.T * (predicted * (1 - predicted))) @ design
+        step = np.linalg.solve(hessian + penalty, gradient)
+        weights -= step
+        if np.abs(step).max() < tolerance:
+            break
+    return weights[0], weights[1:]
+
+
+def log_loss(outcomes, predicted):
+    predicted = np.clip(predicted, 1e-12, 1 - 1e-12)
+    return float(-np.mean(outcomes * np.log(predicted) +
+                          (1 - outcomes) * np.log(1 - predicted)))
+
+
+class Scorer:
+    """
+    Scores feature records with a fitted SuitabilityModel.
+    """
+
+    def __init__(self, fitted):
+        self.fitted = fitted
+        self.columns = list(fitted.columns)
+        self.center = np.array(fitted.center)
+        self.scale = np.array(fitted.scale)
+        self.coefficients = np.array(fitted.coefficients)
+        self.intercept = fitted.intercept
+
+    def standardize(self, matrix):
+        matrix = (matrix - self.center) / self.scale
+        # Unknown numbers count as average.
+        matrix[np.isnan(matrix)] = 0.0
+        return matrix
+
+    def score_matrix(self, matrix):
+        return sigmoid(
+            self.standardize(matrix) @ self.coefficients + self.intercept)
+
+    def score(self, records):
+        return self.score_matrix(encode(records, self.columns))
+
+
+def fit(seasons=None, l2=1.0):
+    """
+    Fits a SuitabilityModel on every house with observations and features,
+    optionally only counting observations of `seasons` (a
+    (first, last) pair). Returns the saved model, which scores from now on.
+    """
+    observations = Observation.objects.all()
+    if seasons:
+        observations = observations.seasons(*seasons)
+    occupied = dict(observations.order_by().values('house_id').annotate(
+        occupied=BoolOr('present')).values_list('house_id', 'occupied'))
+    records = house_records(list(occupied))
+    if not records:
+        raise SuitabilityError("No house has observations and features.")
+    house_ids = list(records)
+    columns = feature_columns()
+    matrix = encode([records[pk] for pk in house_ids], columns)
+    outcomes = np.array([occupied[pk] for pk in house_ids], dtype=float)
+
+    center = np.zeros(len(columns))
+    scale = np.ones(len(columns))
+    for name in NUMBER_FEATURES:
+        col = columns.index(name)
+        values = matrix[:, col]
+        if not np.isnan(values).all():
+            center[col] = np.nanmean(values)
+            scale[col] = np.nanstd(values) or 1.0
+    fitted = SuitabilityModel(columns=columns,
+                              center=center.tolist(),
+                              scale=scale.tolist(),
+                              coefficients=[],
+                              intercept=0.0,
+                              houses=len(house_ids),
+                              occupied=int(outcomes.sum()))
+    scorer = Scorer(fitted)
+    intercept, coefficients = fit_logistic(scorer.standardize(matrix),
+                                           outcomes, l2)
+    fitted.intercept = float(intercept)
+    fitted.coefficients = coefficients.tolist()
+    scorer = Scorer(fitted)
+    fitted.log_loss = log_loss(outcomes, scorer.score_matrix(matrix))
+    fitted.save()
+    cache.set(cache_key(fitted.pk), fitted, None)
+    return fitted
+
+
+def cache_key(pk):
+    return f'{CACHE_KEY}:{pk}'
+
+
+def current_scorer():
+    """
+    A Scorer for the latest SuitabilityModel, or None before any is fitted.
+    Every call looks up which model is the latest, one indexed query, so
+    processes pick up a fit made elsewhere; the model itself is cached.
+    """
+    latest = SuitabilityModel.objects.order_by('-pk').values_list(
+        'pk', flat=True).first()
+    if latest is None:
+        return None
+    fitted = cache.get(cache_key(latest))
+    if fitted is None:
+        fitted = SuitabilityModel.objects.get(pk=latest)
+        cache.set(cache_key(latest), fitted, None)
+    return Scorer(fitted)
+
+
+def score_houses(scorer, house_ids=None):
+    """
+    Scores houses in one pass. Returns (house ids, scores) as arrays,
+    highest score first; houses without any features are left out.
+    """
+    records = house_records(house_ids)
+    ids = np.array(list(records), dtype=int)
+    scores = scorer.score(list(records.values()))
+    order = np.argsort(-scores, kind='stable')
+    return ids[order], scores[order]
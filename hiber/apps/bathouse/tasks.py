@@ -0,0 +1,65 @@
+from django.utils import timezone
+from hiber.apps.jobs.registry import task
+from . import density, suitability
+from .models import Bat, ObservationPhoto
+
+DEFAULT_RENDITIONS = ('fill-200x200', )
+
+
+@task()
+def warm_renditions(job):
+    """
+    Generates image renditions ahead of time so API requests never have to.
+
+    Takes an optional `filters` list in the payload, which defaults to the
+    renditions the API serves.
+    """
+    filters = job.payload.get('filters', DEFAULT_RENDITIONS)
+    generated = 0
+    for bat in Bat.objects.exclude(bat_image=None).select_related('bat_image'):
+        for filter_spec in filters:
+            bat.bat_image.get_rendition(filter_spec)
+            generated += 1
+    return {'renditions': generated}
+
+
+@task()
+def fit_suitability(job):
+    """
+    Refits the habitat suitability model, like `manage.py fit_suitability`.
+    Takes optional `seasons` and `l2` in the payload.
+    """
+    fitted = suitability.fit(job.payload.get('seasons'),
+                             job.payload.get('l2', 1.0))
+    return {
+        'model': fitted.pk,
+        'houses': fitted.houses,
+        'log_loss': fitted.log_loss
+    }
+
+
+@task()
+def compute_density(job):
+    """
+    Rebuilds the occupancy density tiles of a season, the current one
+    unless the payload names a `season`.
+    """
+    season = job.payload.get('season', timezone.now().year)
+    layers = job.payload.get('layers', density.LAYERS)
+    tiles = density.compute_density(season, layers)
+    return {'season': season, 'tiles': tiles}
+
+
+@task()
+def render_observation_photo(job):
+    """
+    Generates the renditions of an uploaded observation photo, `photo` in
+    the payload, which the API serves once `rendered` is set.
+    """
+    photo = ObservationPhoto.objects.select_related('image').get(
+        pk=job.payload['photo'])
+    for filter_spec in ObservationPhoto.RENDITIONS.values():
+        photo.image.get_rendition(filter_spec)
+    photo.rendered = timezone.now()
+    photo.save(update_fields=['rendered'])
+    return {'photo': photo.pk}
@@ -1,3 +1,96 @@
+import numpy as np
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
 from django.test import TestCase  # noqa
+from django.urls import reverse
+from .density import mercator, render, zoom_tiles
+from .duplicates import close_pairs, clusters
+from .models import House, HouseEnvironmentFeatures
+from .search import PrefixSearchQuery
+from .suitability import fit_logistic, log_loss, sigmoid
 
-# Create your tests here.
+
+def test_clusters_hold_houses_all_near_each_other():
+    # 1-2-5 and 3-7-9 are chains: 1 and 5 are too far apart, as are 3 and 9.
+    assert clusters([(3, 7), (1, 2), (7, 9), (2, 5)]) == [[1, 2], [3, 7]]
+    assert clusters([(1, 2), (2, 3), (1, 3), (3, 4)]) == [[1, 2, 3]]
+
+
+def test_close_pairs_of_unsaved_houses():
+    points = [
+        Point(-72, 42),
+        Point(-72.001, 42),
+        Point(-72.0001, 42),
+        Point(-72.0011, 42.00005),
+    ]
+    # About 8 m apart, where the others are 80 m or more.
+    assert close_pairs(points, meters=15) == [(0, 2), (1, 3)]
+
+
+@pytest.mark.django_db
+def test_reassigning_needs_a_filtered_listing(client):
+    User = get_user_model()
+    admin = User.objects.create_superuser('admin', 'admin@example.com',
+                                          'secret')
+    watcher = User.objects.create_user('surveyor')
+    house = House.objects.create(watcher=watcher,
+                                 location=Point(-72, 42),
+                                 property_type='ST')
+    client.force_login(admin)
+    url = reverse('bathouse_house_modeladmin_reassign')
+
+    response = client.post(url, {'watcher': 'admin'})
+    assert response.status_code == 302
+    house.refresh_from_db()
+    assert house.watcher == watcher
+
+    response = client.post(url + '?property_type__exact=ST',
+                           {'watcher': 'admin'})
+    assert response.status_code == 302
+    house.refresh_from_db()
+    assert house.watcher == admin
+
+
+def test_search_matches_every_word_as_a_prefix():
+    query = PrefixSearchQuery("Little  br-own")
+    assert query.value == 'little:* & br:* & own:*'
+
+
+def test_logistic_fit_finds_the_feature_that_matters():
+    rng = np.random.RandomState(0)
+    matrix = rng.normal(size=(500, 2))
+    # Occupancy follows the first feature, noisily; the second is noise.
+    outcomes = (matrix[:, 0] + 0.3 * rng.normal(size=500) > 0).astype(float)
+    intercept, coefficients = fit_logistic(matrix, outcomes, l2=0.1)
+    assert coefficients[0] > 2
+    assert abs(coefficients[1]) < 0.5
+    predicted = sigmoid(matrix @ coefficients + intercept)
+    assert log_loss(outcomes, predicted) < 0.3
+
+
+def test_sigmoid_saturates_without_overflowing():
+    scores = sigmoid(np.array([-1000.0, 0.0, 1000.0]))
+    assert scores.tolist() == [0.0, 0.5, 1.0]
+
+
+def test_a_lone_house_peaks_at_its_weight():
+    x, y = mercator(np.array([-72.0]), np.array([42.0]))
+    tiles = list(zoom_tiles(x, y, np.array([3.0]), zoom=12, bandwidth=100))
+    peak = max(density.max() for _, _, density in tiles)
+    assert peak == pytest.approx(3.0)
+    # Tiles without anything to show aren't drawn.
+    assert render(np.zeros((256, 256)), saturation=20) is None
+
+
+def test_water_distance_is_kept_in_meters():
+    features = HouseEnvironmentFeatures(water_resource_distance=2,
+                                        water_resource_units='KM')
+    features.update_water_resource_meters()
+    assert features.water_resource_meters == 2000
+    features.water_resource_units = 'FT'
+    features.update_water_resource_meters()
+    assert features.water_resource_meters == pytest.approx(0.6096)
+    features.water_resource_distance = None
+    features.update_water_resource_meters()
+    assert features.water_resource_meters is None
@@ -1,7 +1,12 @@
-from wagtail.contrib.modeladmin.options import (ModelAdmin,
+from wagtail.contrib.modeladmin.options import (ModelAdmin, ModelAdminGroup,
                                                 modeladmin_register)
 
-from hiber.apps.bathouse.models import Bat
+from hiber.apps.bathouse.modeladmin import (BBoxFilter, HouseBBoxFilter,
+                                            LargeTableModelAdmin,
+                                            ReassignWatcherView, SeasonFilter,
+                                            SpeciesFilter, WaterDistanceFilter)
+from hiber.apps.bathouse.models import (Bat, House, HouseEnvironmentFeatures,
+                                        HousePhysicalFeatures, Observation)
 
 
 class BatModelAdmin(ModelAdmin):
@@ -12,4 +17,62 @@ class BatModelAdmin(ModelAdmin):
     exclude_from_explorer = False
 
 
+class HouseModelAdmin(LargeTableModelAdmin):
+    model = House
+    menu_label = 'Houses'
+    menu_icon = 'home'
+    list_display = ('id', 'town_name', 'watcher', 'property_type', 'updated')
+    list_filter = (BBoxFilter, 'property_type')
+    list_select_related = ('watcher', )
+    search_fields = ('town_name', )
+    bulk_actions = LargeTableModelAdmin.bulk_actions + (
+        ('reassign', "Reassign watcher", ReassignWatcherView), )
+
+
+class HouseRecordModelAdmin(LargeTableModelAdmin):
+    """
+    Records about a house, listed with the house's watcher.
+    """
+    list_select_related = ('house__watcher', )
+
+    def watcher(self, obj):
+        return obj.house.watcher
+
+
+class ObservationModelAdmin(HouseRecordModelAdmin):
+    model = Observation
+    menu_label = 'Observations'
+    menu_icon = 'view'
+    list_display = ('id', 'house', 'watcher', 'checked', 'present',
+                    'occupants')
+    list_filter = (SeasonFilter, SpeciesFilter, HouseBBoxFilter)
+    # Each season's partition has an index on `checked`.
+    ordering = ('-checked', )
+
+
+class EnvironmentFeaturesModelAdmin(HouseRecordModelAdmin):
+    model = HouseEnvironmentFeatures
+    menu_label = 'Environment features'
+    menu_icon = 'site'
+    list_display = ('id', 'house', 'watcher', 'water_resource_meters')
+    list_filter = (WaterDistanceFilter, HouseBBoxFilter)
+
+
+class PhysicalFeaturesModelAdmin(HouseRecordModelAdmin):
+    model = HousePhysicalFeatures
+    menu_label = 'Physical features'
+    menu_icon = 'cogs'
+    list_display = ('id', 'house', 'watcher')
+    list_filter = (HouseBBoxFilter, )
+
+
+class SurveyModelAdminGroup(ModelAdminGroup):
+    menu_label = 'Surveys'
+    menu_icon = 'folder-open-inverse'
+    menu_order = 100
+    items = (HouseModelAdmin, ObservationModelAdmin,
+             EnvironmentFeaturesModelAdmin, PhysicalFeaturesModelAdmin)
+
+
 modeladmin_register(BatModelAdmin)
+modeladmin_register(SurveyModelAdminGroup)
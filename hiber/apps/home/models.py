@@ -1,5 +1,9 @@
 from wagtail.core.models import Page
 
+# Connects the page cache purge receivers in every process, including
+# management commands such as publish_scheduled_pages.
+from . import page_cache  # noqa: F401
+
 
 class HomePage(Page):
     pass
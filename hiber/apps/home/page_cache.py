@@ -0,0 +1,106 @@
+"""
+Full-page cache for pages served by Wagtail.
+
+Anonymous GET requests for the views named in PAGE_CACHE_URL_NAMES are
+answered from the cache, keyed by site, full path and auth state. Rather
+than hunting down keys, publishing or unpublishing any page (or changing a
+view restriction) moves every key to a new version, so stale entries are
+never read again and simply expire.
+"""
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.urls import Resolver404, resolve
+from wagtail.core.models import PageViewRestriction
+from wagtail.core.signals import page_published, page_unpublished
+
+VERSION_KEY = 'pagecache:version'
+
+# Sent instead of running the view when a response comes from the cache, for
+# views that have side effects to account for (e.g. search hit counts).
+served_from_cache = Signal(providing_args=['request', 'url_name'])
+
+
+def get_cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def current_version():
+    # A timestamp rather than a counter, so a version evicted from the cache
+    # can never come back and revive old entries.
+    return get_cache().get_or_set(VERSION_KEY, lambda: int(time.time() * 1000),
+                                  None)
+
+
+def purge():
+    get_cache().set(VERSION_KEY, int(time.time() * 1000), None)
+
+
+def cache_key(request, version=None):
+    auth = 'auth' if request.user.is_authenticated else 'anon'
+    path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+    site_id = request.site.pk if request.site else 0
+    return 'pagecache:{}:{}:{}:{}'.format(version or current_version(),
+                                          site_id, auth, path)
+
+
+class PageCacheMiddleware:
+    """
+    Must come after AuthenticationMiddleware and SiteMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        url_name = self.cached_url_name(request)
+        if url_name is None:
+            return self.get_response(request)
+
+        key = cache_key(request)
+        response = get_cache().get(key)
+        if response is not None:
+            served_from_cache.send(sender=self.__class__,
+                                   request=request,
+                                   url_name=url_name)
+            return response
+
+        response = self.get_response(request)
+        if request.method == 'GET' and self.is_cacheable(request, response):
+            get_cache().set(key, response, settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+    def cached_url_name(self, request):
+        if (request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated):
+            return None
+        try:
+            url_name = resolve(request.path_info).url_name
+        except Resolver404:
+            return None
+        if url_name in settings.PAGE_CACHE_URL_NAMES:
+            return url_name
+        return None
+
+    def is_cacheable(self, request, response):
+        cache_control = response.get('Cache-Control', '')
+        return (response.status_code == 200 and not response.streaming
+                and not response.cookies
+                and not request.META.get('CSRF_COOKIE_USED') and
+                not any(directive in cache_control
+                        for directive in ('private', 'no-cache', 'no-store')))
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+def purge_on_publish(sender, **kwargs):
+    purge()
+
+
+@receiver(post_save, sender=PageViewRestriction)
+@receiver(post_delete, sender=PageViewRestriction)
+def purge_on_restriction_change(sender, **kwargs):
+    purge()
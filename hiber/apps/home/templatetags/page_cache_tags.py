@@ -0,0 +1,17 @@
+from django import template
+
+from ..page_cache import current_version
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_cache_version():
+    """
+    Pass to `{% cache %}` so cached fragments are dropped whenever a page is
+    published or unpublished:
+
+        {% page_cache_version as version %}
+        {% cache 600 sidebar version %}...{% endcache %}
+    """
+    return current_version()
@@ -0,0 +1,70 @@
+import multiprocessing
+import signal
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from hiber.apps.jobs import registry
+from hiber.apps.jobs.models import Job
+
+
+def work(stop, poll_interval, max_jobs=None):
+    """
+    Claims and runs jobs until `stop` is set. Sleeps for `poll_interval`
+    whenever the queue has nothing due.
+    """
+    done = 0
+    while not stop.is_set() and (max_jobs is None or done < max_jobs):
+        close_old_connections()
+        job = Job.claim()
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        job.run()
+        done += 1
+
+
+class Command(BaseCommand):
+    help = "Runs background jobs from the Job table in a pool of processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes',
+                            type=int,
+                            default=2,
+                            help="Number of worker processes")
+        parser.add_argument('--poll-interval',
+                            type=float,
+                            default=2.0,
+                            help="Seconds to wait when no job is due")
+        parser.add_argument('--max-jobs',
+                            type=int,
+                            help="Exit each process after this many jobs, "
+                            "so a supervisor can recycle them")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Registered tasks: {}".format(', '.join(
+            registry.task_names())))
+
+        stop = multiprocessing.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop.set())
+
+        if options['processes'] <= 1:
+            work(stop, options['poll_interval'], options['max_jobs'])
+            return
+
+        # Connections must not be shared across the fork.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=work,
+                                    args=(stop, options['poll_interval'],
+                                          options['max_jobs']))
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} worker processes")
+        while not stop.is_set() and any(p.is_alive() for p in processes):
+            time.sleep(1)
+        stop.set()
+        for process in processes:
+            process.join()
@@ -0,0 +1,40 @@
+# Generated by Django 2.1.7 on 2026-10-19 00:00
+
+from django.conf import settings
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Name of the registered task to run', max_length=100)),
+                ('payload', django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, help_text='Arguments handed to the task')),
+                ('status', models.CharField(choices=[('PE', 'Pending'), ('RU', 'Running'), ('SU', 'Succeeded'), ('FA', 'Failed')], default='PE', max_length=2)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Number of times the job has been started')),
+                ('max_attempts', models.PositiveIntegerField(default=3, help_text='Attempts before the job is marked as failed')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the job is next due; while running, when its lease expires')),
+                ('result', django.contrib.postgres.fields.jsonb.JSONField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(blank=True, help_text='User that submitted the job', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'run_at'], name='jobs_job_status_f5c023_idx'),
+        ),
+    ]
@@ -0,0 +1,154 @@
+import threading
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import JSONField
+from django.db import connection, models, transaction
+from django.utils import timezone
+from . import registry
+
+
+class Job(models.Model):
+    """
+    Describes a unit of heavy work that runs outside of the request/response
+    cycle, in a `manage.py run_worker` process.
+
+    The table is the queue: workers claim due jobs with
+    `SELECT ... FOR UPDATE SKIP LOCKED`, so several workers can poll it
+    without blocking each other and no broker is needed.
+    """
+    PENDING = 'PE'
+    RUNNING = 'RU'
+    SUCCEEDED = 'SU'
+    FAILED = 'FA'
+    STATUS_CHOICES = ((PENDING, 'Pending'), (RUNNING, 'Running'),
+                      (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed'))
+    ABANDONED_ERROR = "The worker running the job stopped before it finished."
+
+    name = models.CharField(max_length=100,
+                            help_text="Name of the registered task to run")
+    payload = JSONField(default=dict,
+                        blank=True,
+                        help_text="Arguments handed to the task")
+    owner = models.ForeignKey(get_user_model(),
+                              null=True,
+                              blank=True,
+                              on_delete=models.CASCADE,
+                              related_name='jobs',
+                              help_text="User that submitted the job")
+    status = models.CharField(max_length=2,
+                              choices=STATUS_CHOICES,
+                              default=PENDING)
+    attempts = models.PositiveIntegerField(
+        default=0, help_text="Number of times the job has been started")
+    max_attempts = models.PositiveIntegerField(
+        default=3, help_text="Attempts before the job is marked as failed")
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the job is next due; while running, when its lease "
+        "expires")
+    result = JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+
+    @classmethod
+    def enqueue(cls, name, payload=None, owner=None, **kwargs):
+        return cls.objects.create(name=name,
+                                  payload=payload or {},
+                                  owner=owner,
+                                  **kwargs)
+
+    @classmethod
+    def claim(cls):
+        """
+        Locks the next due job, marks it running and returns it, or returns
+        None if nothing is due.
+
+        Running jobs hold a lease of JOBS_LEASE_SECONDS, renewed while they
+        run; a job whose worker died is picked up again once its lease runs
+        out, or marked as failed if it has no attempts left.
+        """
+        while True:
+            now = timezone.now()
+            with transaction.atomic():
+                job = (cls.objects.select_for_update(skip_locked=True).filter(
+                    status__in=(cls.PENDING, cls.RUNNING),
+                    run_at__lte=now).order_by('run_at').first())
+                if job is None:
+                    return None
+                abandoned = job.status == cls.RUNNING
+                if abandoned and job.attempts >= job.max_attempts:
+                    job.fail(cls.ABANDONED_ERROR, retry=False)
+                    continue
+                job.status = cls.RUNNING
+                job.attempts += 1
+                job.run_at = cls.lease_expiry()
+                job.save(
+                    update_fields=['status', 'attempts', 'run_at', 'updated'])
+            return job
+
+    @staticmethod
+    def lease_expiry():
+        return timezone.now() + timedelta(seconds=settings.JOBS_LEASE_SECONDS)
+
+    def renew_lease(self, stop):
+        """
+        Pushes the lease back every third of JOBS_LEASE_SECONDS until `stop`
+        is set, from a thread of its own while the task runs.
+        """
+        try:
+            while not stop.wait(settings.JOBS_LEASE_SECONDS / 3):
+                running = Job.objects.filter(pk=self.pk, status=self.RUNNING)
+                running.update(run_at=self.lease_expiry())
+        finally:
+            connection.close()
+
+    def run(self):
+        task = registry.get_task(self.name)
+        if task is None:
+            self.fail(f"No task named {self.name!r} is registered.",
+                      retry=False)
+            return
+        stop = threading.Event()
+        renewer = threading.Thread(target=self.renew_lease,
+                                   args=(stop, ),
+                                   daemon=True)
+        renewer.start()
+        try:
+            result = task.func(self)
+        except Exception:
+            error = traceback.format_exc()
+        else:
+            error = None
+        finally:
+            stop.set()
+            renewer.join()
+        if error is not None:
+            self.fail(error)
+            return
+        self.status = self.SUCCEEDED
+        self.result = result
+        self.last_error = ''
+        self.save(update_fields=['status', 'result', 'last_error', 'updated'])
+
+    def fail(self, error, retry=True):
+        """
+        Schedules another attempt with exponential backoff, or marks the job
+        as failed once it is out of attempts.
+        """
+        self.last_error = error
+        if not retry or self.attempts >= self.max_attempts:
+            self.status = self.FAILED
+        else:
+            self.status = self.PENDING
+            delay = settings.JOBS_RETRY_BACKOFF * 2**(self.attempts - 1)
+            self.run_at = timezone.now() + timedelta(seconds=delay)
+        self.save(update_fields=['status', 'last_error', 'run_at', 'updated'])
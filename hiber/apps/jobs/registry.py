@@ -0,0 +1,54 @@
+"""
+Registry of the functions a Job can run.
+
+Apps declare tasks in a `tasks.py` module:
+
+    from hiber.apps.jobs.registry import task
+
+    @task(public=True)
+    def export_observations(job):
+        ...
+        return {'file': ...}
+
+A task receives the Job, reads its `payload` and returns a JSON-serializable
+result. Raising marks the attempt as failed and schedules a retry. Only
+`public` tasks may be submitted through the API.
+"""
+from collections import namedtuple
+from django.utils.module_loading import autodiscover_modules
+
+Task = namedtuple('Task', ('name', 'func', 'public'))
+
+_tasks = {}
+_discovered = False
+
+
+def task(name=None, public=False):
+    def decorator(func):
+        task_name = name or func.__name__
+        _tasks[task_name] = Task(task_name, func, public)
+        return func
+
+    return decorator
+
+
+def discover():
+    global _discovered
+    if not _discovered:
+        autodiscover_modules('tasks')
+        _discovered = True
+
+
+def get_task(name):
+    discover()
+    return _tasks.get(name)
+
+
+def task_names():
+    discover()
+    return sorted(_tasks)
+
+
+def public_tasks():
+    discover()
+    return sorted(name for name, t in _tasks.items() if t.public)
@@ -0,0 +1,64 @@
+from datetime import timedelta
+import pytest
+from django.utils import timezone
+from .models import Job
+
+
+@pytest.fixture
+def lease(settings):
+    settings.JOBS_LEASE_SECONDS = 60
+    settings.JOBS_RETRY_BACKOFF = 30
+
+
+@pytest.mark.django_db
+def test_claim_takes_the_due_job(lease):
+    Job.enqueue('later', run_at=timezone.now() + timedelta(hours=1))
+    due = Job.enqueue('now')
+    job = Job.claim()
+    assert job.pk == due.pk
+    assert (job.status, job.attempts) == (Job.RUNNING, 1)
+    assert job.run_at > timezone.now()
+    assert Job.claim() is None
+
+
+@pytest.mark.django_db
+def test_claim_retries_an_abandoned_job(lease):
+    expired = timezone.now() - timedelta(seconds=1)
+    abandoned = Job.enqueue('job',
+                            status=Job.RUNNING,
+                            attempts=1,
+                            run_at=expired)
+    job = Job.claim()
+    assert job.pk == abandoned.pk
+    assert job.attempts == 2
+
+
+@pytest.mark.django_db
+def test_claim_fails_an_abandoned_job_out_of_attempts(lease):
+    expired = timezone.now() - timedelta(seconds=1)
+    abandoned = Job.enqueue('job',
+                            status=Job.RUNNING,
+                            attempts=3,
+                            run_at=expired)
+    assert Job.claim() is None
+    abandoned.refresh_from_db()
+    assert abandoned.status == Job.FAILED
+    assert abandoned.last_error == Job.ABANDONED_ERROR
+
+
+@pytest.mark.django_db
+def test_fail_backs_off_until_out_of_attempts(lease):
+    Job.enqueue('job')
+    delays = []
+    for attempt in range(2):
+        job = Job.claim()
+        before = timezone.now()
+        job.fail("Boom")
+        assert job.status == Job.PENDING
+        delays.append(round((job.run_at - before).total_seconds()))
+        Job.objects.filter(pk=job.pk).update(run_at=before)
+    assert delays == [30, 60]
+    job = Job.claim()
+    job.fail("Boom")
+    assert (job.status, job.attempts) == (Job.FAILED, 3)
+    assert Job.claim() is None
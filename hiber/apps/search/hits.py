@@ -0,0 +1,85 @@
+"""
+Buffered recording of search hits.
+
+Query.add_hit() costs two writes per search, and popular queries all update
+the same QueryDailyHits row. Instead, hits are counted in memory per worker
+process and written out every SEARCH_HITS_FLUSH_INTERVAL seconds, one
+increment per distinct query and day. The resulting Query and
+QueryDailyHits rows are the same as with add_hit(); only hits from the last
+interval of a worker that is killed without a clean exit are lost.
+"""
+import atexit
+import threading
+from collections import Counter
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.utils import timezone
+from wagtail.search.models import Query, QueryDailyHits
+from wagtail.search.utils import normalise_query_string
+
+
+class HitRecorder:
+    def __init__(self, flush_interval, max_pending):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.timer = None
+
+    def record(self, query_string):
+        key = (normalise_query_string(query_string), timezone.now().date())
+        with self.lock:
+            self.pending[key] += 1
+            full = len(self.pending) >= self.max_pending
+            if not full and self.timer is None:
+                self.timer = threading.Timer(self.flush_interval,
+                                             self.flush_in_background)
+                self.timer.daemon = True
+                self.timer.start()
+        if full:
+            self.flush()
+
+    def flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            # This thread's connection would otherwise be left open.
+            connections.close_all()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        # One transaction per flush; sorted, so concurrent flushes from
+        # several workers lock rows in the same order.
+        with transaction.atomic():
+            for (query_string, date), hits in sorted(pending.items()):
+                query = Query.objects.get_or_create(
+                    query_string=query_string)[0]
+                daily_hits = QueryDailyHits.objects.get_or_create(query=query,
+                                                                  date=date)[0]
+                QueryDailyHits.objects.filter(pk=daily_hits.pk).update(
+                    hits=models.F('hits') + hits)
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = HitRecorder(settings.SEARCH_HITS_FLUSH_INTERVAL,
+                                    settings.SEARCH_HITS_MAX_PENDING)
+            atexit.register(_recorder.flush)
+        return _recorder
+
+
+def record_hit(query_string):
+    if settings.SEARCH_HITS_FLUSH_INTERVAL:
+        get_recorder().record(query_string)
+    else:
+        Query.get(query_string).add_hit()
@@ -1,8 +1,12 @@
 from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.dispatch import receiver
 from django.shortcuts import render
 
 from wagtail.core.models import Page
-from wagtail.search.models import Query
+
+from hiber.apps.home.page_cache import served_from_cache
+
+from .hits import record_hit
 
 
 def search(request):
@@ -12,10 +16,9 @@ def search(request):
     # Search
     if search_query:
         search_results = Page.objects.live().search(search_query)
-        query = Query.get(search_query)
 
-        # Record hit
-        query.add_hit()
+        # Record hit; written out in batches, off the request path
+        record_hit(search_query)
     else:
         search_results = Page.objects.none()
 
@@ -32,3 +35,13 @@ def search(request):
         'search_query': search_query,
         'search_results': search_results,
     })
+
+
+@receiver(served_from_cache)
+def record_cached_hit(sender, request, url_name, **kwargs):
+    """
+    Cached search pages skip the view, so count their hits here.
+    """
+    search_query = request.GET.get('query', None)
+    if url_name == 'search' and search_query:
+        record_hit(search_query)
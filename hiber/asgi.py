@@ -0,0 +1,20 @@
+"""
+ASGI config for hiber project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Long-polling, streaming and bulk sync endpoints are served by async consumers
+(see ``hiber.routing``), everything else by the regular Django handler.
+
+For more information on this file, see
+https://channels.readthedocs.io/en/2.1.7/deploying.html
+"""
+
+import os
+
+import django
+from channels.routing import get_default_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "hiber.settings.dev")
+django.setup()
+
+application = get_default_application()
@@ -0,0 +1,27 @@
+"""
+Features that keep state in the cache, such as read-your-writes stickiness
+and API throttling, only work when every process shares that cache.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared(alias='default'):
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_BACKENDS
+
+
+def require_shared(feature, alias='default'):
+    """
+    Raises ImproperlyConfigured when SHARED_CACHE_REQUIRED is set and the
+    `alias` cache is private to each process.
+    """
+    required = getattr(settings, 'SHARED_CACHE_REQUIRED', False)
+    if required and not is_shared(alias):
+        raise ImproperlyConfigured(
+            f"{feature} needs the {alias!r} cache to be shared by every "
+            "process; set MEMCACHED_LOCATION.")
@@ -0,0 +1,141 @@
+import os
+import threading
+from django.contrib.gis.db.backends.postgis import base as postgis
+import psycopg2
+from psycopg2 import extensions, pool
+
+# One pool per database alias per process; connections must never cross a
+# fork, so the pid is part of the key.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class BlockingConnectionPool(pool.ThreadedConnectionPool):
+    """
+    A ThreadedConnectionPool whose getconn() waits up to `timeout` seconds
+    for a connection to be returned when all are in use, where psycopg2's
+    raises PoolError at once. Executors may run more threads than the pool
+    has connections, and a burst of requests should queue, not fail.
+    """
+
+    def __init__(self, minconn, maxconn, timeout, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self.timeout = timeout
+        self.available = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, key=None):
+        if not self.available.acquire(timeout=self.timeout):
+            raise psycopg2.OperationalError(
+                f"No database connection was free within {self.timeout} "
+                "seconds; consider a larger DATABASE_POOL_MAX_SIZE.")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self.available.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self.available.release()
+
+    def _putconn(self, conn, key=None, close=False):
+        # psycopg2 only keeps a returned connection while fewer than minconn
+        # are idle, and closes the rest: with a small MIN_SIZE, almost every
+        # request would open a new one. Keep up to maxconn instead; minconn is
+        # only how many are opened up front.
+        if close or self.closed or conn.closed:
+            return super()._putconn(conn, key, close)
+        status = conn.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            # The server went away.
+            return super()._putconn(conn, key, close=True)
+        if key is None:
+            key = self._rused.get(id(conn))
+            if key is None:
+                raise pool.PoolError("trying to put unkeyed connection")
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        self._pool.append(conn)
+        del self._used[key]
+        del self._rused[id(conn)]
+
+
+class DatabaseWrapper(postgis.DatabaseWrapper):
+    """
+    PostGIS backend with two additions configured from the DATABASES entry:
+
+    HEALTH_CHECKS
+        Before a request first uses a persistent connection (CONN_MAX_AGE),
+        ping it and reconnect if the server went away, instead of failing
+        the request.
+
+    POOL
+        A dict with MIN_SIZE, MAX_SIZE and TIMEOUT. Connections are borrowed
+        from a process-wide pool instead of being opened, and returned to it
+        instead of being closed; when all are in use, a thread waits up to
+        TIMEOUT seconds for one. MIN_SIZE connections are opened up front,
+        and up to MAX_SIZE are kept open once opened. Meant for ASGI/threaded
+        servers, where a connection per thread per request would otherwise be
+        opened and torn down.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        key = (self.alias, os.getpid())
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = BlockingConnectionPool(
+                    options.get('MIN_SIZE', 1), options.get('MAX_SIZE', 10),
+                    options.get('TIMEOUT', 10), **self.get_connection_params())
+            return _pools[key]
+
+    def get_new_connection(self, conn_params):
+        connection_pool = self.pool
+        if connection_pool is None:
+            return super().get_new_connection(conn_params)
+        connection = connection_pool.getconn()
+        # Same isolation level handling as the stock backend.
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def connect(self):
+        super().connect()
+        # A brand new connection doesn't need checking.
+        self.health_check_done = True
+
+    def _close(self):
+        connection_pool = self.pool
+        if connection_pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            connection_pool.putconn(self.connection)
+
+    def ensure_connection(self):
+        if (self.connection is not None and not self.health_check_done
+                and self.settings_dict.get('HEALTH_CHECKS')):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        # Called at the start and end of every request; the next request
+        # checks its connection again on first use.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
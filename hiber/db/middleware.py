@@ -0,0 +1,66 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from hiber.cache import require_shared
+from .routers import replicas, use_primary
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Keeps a client reading from the primary for
+    DATABASE_PRIMARY_STICKY_SECONDS after it writes, so it never sees a
+    replica that hasn't caught up with its own changes yet.
+
+    Clients are told apart by their API token or session, before
+    authentication runs, so the marker lives in the shared cache rather than
+    on the user. A per-process cache would lose it whenever the next request
+    lands on another worker.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if replicas():
+            require_shared("Reading your own writes from the primary")
+
+    def __call__(self, request):
+        key = self.sticky_key(request)
+        writing = request.method not in SAFE_METHODS
+        if writing or (key and cache.get(key)):
+            with use_primary():
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        # Views may find a POST doesn't write after all (see BatchView).
+        writing = getattr(request, 'db_writes', writing)
+        if writing and key and response.status_code < 400:
+            self.stick(key)
+        return response
+
+    @classmethod
+    def is_sticky(cls, request):
+        key = cls.sticky_key(request)
+        return bool(key and cache.get(key))
+
+    @staticmethod
+    def stick(key):
+        if key and replicas():
+            cache.set(key, True, settings.DATABASE_PRIMARY_STICKY_SECONDS)
+
+    @classmethod
+    def sticky_key(cls, request):
+        return cls.credentials_key(
+            request.META.get('HTTP_AUTHORIZATION')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+
+    @staticmethod
+    def credentials_key(credentials):
+        """
+        The marker's key for an Authorization header or session cookie; the
+        ASGI consumers, which don't go through middleware, use it directly.
+        """
+        if not credentials:
+            return None
+        digest = hashlib.sha1(credentials.encode('utf-8')).hexdigest()
+        return f"db-primary-sticky:{digest}"
@@ -0,0 +1,93 @@
+import random
+import threading
+from contextlib import ContextDecorator
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY = 'primary'
+REPLICA = 'replica'
+
+_state = threading.local()
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _targets():
+    if not hasattr(_state, 'targets'):
+        _state.targets = []
+    return _state.targets
+
+
+def current_target():
+    targets = _targets()
+    return targets[-1] if targets else None
+
+
+class use_database(ContextDecorator):
+    """
+    Pins reads in the current thread to the primary or to a replica.
+    Usable as a context manager or a decorator; nests as expected.
+    """
+
+    def __init__(self, target):
+        self.target = target
+
+    def __enter__(self):
+        # The stack is per thread, so one decorator instance can be entered
+        # from several threads at once.
+        _targets().append(self.target)
+        return self
+
+    def __exit__(self, *exc):
+        _targets().pop()
+
+
+def use_primary():
+    """
+    Reads your own writes: everything in the block reads from the primary.
+    """
+    return use_database(PRIMARY)
+
+
+def release_primary():
+    """
+    Undoes an enclosing use_primary(): reads in the block go to replicas
+    again, as they would with nothing pinned.
+    """
+    return use_database(None)
+
+
+def use_replica():
+    """
+    For heavy reporting reads: the block always reads from a replica, even
+    right after the user wrote something, so analytics never load the
+    primary that ingest depends on.
+    """
+    return use_database(REPLICA)
+
+
+class ReplicaRouter:
+    """
+    Sends writes to the primary and reads to a random replica from
+    DATABASE_REPLICAS, unless reads are pinned with use_primary(). With no
+    replicas configured, everything goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or current_target() == PRIMARY:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication.
+        return db not in replicas()
@@ -0,0 +1,108 @@
+import threading
+import psycopg2
+import pytest
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory
+from psycopg2 import extensions
+from .backends.postgis.base import BlockingConnectionPool
+from .middleware import PrimaryStickinessMiddleware
+from .routers import (PRIMARY, ReplicaRouter, current_target, release_primary,
+                      use_primary, use_replica)
+
+
+class FakeConnection:
+    closed = False
+
+    def get_transaction_status(self):
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_keeps_connections_up_to_its_max_size(monkeypatch):
+    opened = []
+
+    def connect(*args, **kwargs):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(psycopg2, 'connect', connect)
+    connection_pool = BlockingConnectionPool(1, 4, 1)
+    barrier = threading.Barrier(4)
+
+    def request():
+        connection = connection_pool.getconn()
+        # All four connections are in use at once.
+        barrier.wait()
+        connection_pool.putconn(connection)
+
+    for _ in range(3):
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert len(opened) == 4
+    assert not any(connection.closed for connection in opened)
+
+
+@pytest.fixture
+def replica(settings):
+    settings.DATABASE_REPLICAS = ['replica_1']
+    settings.DATABASE_PRIMARY_STICKY_SECONDS = 10
+    cache.clear()
+
+
+def test_reads_go_to_the_primary_without_replicas(settings):
+    settings.DATABASE_REPLICAS = []
+    assert ReplicaRouter().db_for_read(None) == 'default'
+
+
+def test_reads_follow_the_innermost_pin(replica):
+    router = ReplicaRouter()
+    assert router.db_for_read(None) == 'replica_1'
+    with use_primary():
+        assert router.db_for_read(None) == 'default'
+        with release_primary():
+            assert router.db_for_read(None) == 'replica_1'
+        with use_replica():
+            assert router.db_for_read(None) == 'replica_1'
+        assert router.db_for_read(None) == 'default'
+    assert router.db_for_write(None) == 'default'
+
+
+def through_middleware(method, token, status=200, db_writes=None):
+    """
+    Sends a request through PrimaryStickinessMiddleware and returns where
+    the view's reads were pinned.
+    """
+    seen = []
+
+    def view(request):
+        seen.append(current_target())
+        if db_writes is not None:
+            request.db_writes = db_writes
+        return HttpResponse(status=status)
+
+    request = RequestFactory().generic(method,
+                                       '/api/v1/houses',
+                                       HTTP_AUTHORIZATION=f'Token {token}')
+    PrimaryStickinessMiddleware(view)(request)
+    return seen[0]
+
+
+def test_writers_read_from_the_primary_for_a_while(replica):
+    assert through_middleware('GET', 'alice') is None
+    assert through_middleware('POST', 'alice', status=201) == PRIMARY
+    assert through_middleware('GET', 'alice') == PRIMARY
+    # Other clients keep reading from replicas.
+    assert through_middleware('GET', 'bob') is None
+
+
+def test_failed_or_read_only_posts_do_not_stick(replica):
+    through_middleware('POST', 'alice', status=400)
+    through_middleware('POST', 'bob', db_writes=False)
+    assert through_middleware('GET', 'alice') is None
+    assert through_middleware('GET', 'bob') is None
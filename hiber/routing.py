@@ -0,0 +1,21 @@
+from channels.http import AsgiHandler
+from channels.routing import ProtocolTypeRouter, URLRouter
+from django.urls import path, re_path
+
+from hiber.apps.api import consumers
+
+application = ProtocolTypeRouter({
+    'http':
+    URLRouter([
+        # Served around Django's middleware; see hiber.apps.api.consumers.
+        path('api/v1/sync/changes', consumers.ChangesConsumer),
+        path('api/v1/sync/feed', consumers.ChangeFeedConsumer),
+        path('api/v1/sync/observations', consumers.BulkObservationConsumer),
+        path('api/v1/export/observations.csv',
+             consumers.ObservationExportConsumer),
+        path('api/v1/observations/<int:pk>/photos',
+             consumers.ObservationPhotoConsumer),
+        # Everything else goes through the regular Django request cycle.
+        re_path(r'', AsgiHandler),
+    ]),
+})
@@ -0,0 +1,47 @@
+"""
+Production profile for workers that only serve the API (/api/ and /auth/).
+
+Leaves out the Django and Wagtail admin UIs, the API docs, the page tree and
+the template-only apps, along with their middleware, so workers start
+faster. wagtail.core, wagtail.images and wagtail.admin stay installed: the
+bathouse models import them. Point DJANGO_SETTINGS_MODULE here and route
+only API paths to these workers.
+"""
+from .production import *
+
+WEB_ONLY_APPS = (
+    'hiber.apps.home',
+    'hiber.apps.search',
+    'wagtail.contrib.forms',
+    'wagtail.contrib.redirects',
+    'wagtail.contrib.modeladmin',
+    'wagtail.embeds',
+    'wagtail.sites',
+    'wagtail.users',
+    'wagtail.snippets',
+    'wagtail.documents',
+    'django.contrib.admin',
+    'django.contrib.messages',
+    'django.contrib.sessions',
+    'django.contrib.staticfiles',
+    'drf_yasg',
+)
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in WEB_ONLY_APPS]
+
+# Token authentication needs neither sessions nor CSRF protection.
+WEB_ONLY_MIDDLEWARE = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'wagtail.core.middleware.SiteMiddleware',
+    'hiber.apps.home.page_cache.PageCacheMiddleware',
+    'wagtail.contrib.redirects.middleware.RedirectMiddleware',
+)
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware not in WEB_ONLY_MIDDLEWARE
+]
+
+ROOT_URLCONF = 'hiber.api_urls'
@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'hiber.apps.search',
     'hiber.apps.api',
     'hiber.apps.bathouse',
+    'hiber.apps.jobs',
     'wagtail.contrib.forms',
     'wagtail.contrib.redirects',
     'wagtail.embeds',
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'wagtail.contrib.modeladmin',
     'rest_framework',
     'drf_yasg',
@@ -52,9 +54,11 @@ INSTALLED_APPS = [
     'djoser',
     'rest_framework.authtoken',
     'corsheaders',
+    'channels',
 ]
 
 MIDDLEWARE = [
+    'hiber.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -64,6 +68,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'wagtail.core.middleware.SiteMiddleware',
+    'hiber.apps.home.page_cache.PageCacheMiddleware',
     'wagtail.contrib.redirects.middleware.RedirectMiddleware',
 ]
 
@@ -89,6 +94,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'hiber.wsgi.application'
 
+# Used when serving through hiber.asgi (SERVER_MODE=asgi in the Dockerfile)
+ASGI_APPLICATION = 'hiber.routing.application'
+
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
@@ -161,17 +169,123 @@ MEDIA_URL = '/media/'
 
 WAGTAIL_SITE_NAME = "hiber"
 
+# Search hits are counted per worker and written every
+# SEARCH_HITS_FLUSH_INTERVAL seconds (0 writes each hit immediately), or as
+# soon as SEARCH_HITS_MAX_PENDING distinct queries are waiting.
+SEARCH_HITS_FLUSH_INTERVAL = 30
+SEARCH_HITS_MAX_PENDING = 500
+
 # Base URL to use when referring to full URLs within the Wagtail admin backend -
 # e.g. in notification emails. Don't include '/admin' or a trailing slash
 BASE_URL = 'http://example.com'
 
+# The OpenAPI schema is pre-generated into API_SCHEMA_DIR by
+# `manage.py generate_schema` and cached per CODE_VERSION (a digest of the
+# sources when unset). API_SCHEMA_LIVE regenerates it on every request.
+API_SCHEMA_DIR = os.path.join(PROJECT_DIR, 'static', 'api')
+API_SCHEMA_LIVE = False
+CODE_VERSION = os.environ.get('CODE_VERSION', '')
+
 # API information
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES':
     ('rest_framework.authentication.TokenAuthentication', ),
-    'DEFAULT_RENDERER_CLASSES': ('rest_framework.renderers.JSONRenderer', ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'hiber.apps.api.renderers.MessagePackRenderer',
+        'hiber.apps.api.renderers.CBORRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'hiber.apps.api.renderers.MessagePackParser',
+        'hiber.apps.api.renderers.CBORParser',
+    ),
     'DEFAULT_PAGINATION_CLASS':
     'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE':
     10,
-}
\ No newline at end of file
+}
+
+# Token buckets for API clients, per user and scope: up to `capacity`
+# requests at once, refilled at `rate` requests per second.
+API_THROTTLE_BUCKETS = {
+    'read': {
+        'capacity': 120,
+        'rate': 2.0
+    },
+    'write': {
+        'capacity': 60,
+        'rate': 0.5
+    },
+    'bulk': {
+        'capacity': 10,
+        'rate': 1 / 30
+    },
+    # /api/v1/batch, one call per screen the apps load.
+    'batch': {
+        'capacity': 60,
+        'rate': 1.0
+    },
+}
+
+# Most sub-requests one call to /api/v1/batch may carry.
+API_BATCH_MAX_REQUESTS = 20
+
+# Responses smaller than this many bytes are sent uncompressed. Brotli is
+# used when the optional `brotli` package is installed, gzip otherwise.
+COMPRESSION_MIN_SIZE = 860
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Background jobs (see hiber.apps.jobs)
+# A running job is considered abandoned after JOBS_LEASE_SECONDS; failed
+# attempts are retried after JOBS_RETRY_BACKOFF * 2 ** (attempt - 1) seconds.
+JOBS_LEASE_SECONDS = 30 * 60
+JOBS_RETRY_BACKOFF = 30
+
+# Observations are partitioned by season (calendar year). The
+# archive_observations command keeps OBSERVATION_KEEP_SEASONS seasons in the
+# database and moves older ones to OBSERVATION_ARCHIVE_DIR.
+OBSERVATION_KEEP_SEASONS = 3
+OBSERVATION_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archive', 'observations')
+
+# Occupancy density tiles, written by the compute_density job and served
+# by the API; every process involved must see the same directory.
+# DENSITY_BANDWIDTH is the kernel's standard deviation in meters.
+DENSITY_TILE_DIR = os.path.join(BASE_DIR, 'tiles', 'density')
+DENSITY_ZOOMS = (4, 12)
+DENSITY_BANDWIDTH = 2000
+DENSITY_TILE_MAX_AGE = 60 * 60
+
+# Observation exports written by the export_observations job. Not served
+# as media: only the job's owner downloads them, from
+# /api/v1/jobs/<id>/download.
+EXPORT_DIR = os.path.join(BASE_DIR, 'exports')
+
+# Houses closer than this many meters are taken to be the same house when
+# one is registered (see hiber.apps.bathouse.duplicates).
+DUPLICATE_HOUSE_METERS = 15
+
+# Caches
+# Per-process by default; production points these at memcached so every
+# worker shares them, and with SHARED_CACHE_REQUIRED refuses to start
+# without (see hiber.cache).
+SHARED_CACHE_REQUIRED = False
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template_fragments',
+    },
+}
+
+# Anonymous responses of these views are cached whole for
+# PAGE_CACHE_TIMEOUT seconds; publishing any page invalidates them all.
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = 10 * 60
+PAGE_CACHE_URL_NAMES = ('wagtail_serve', 'search')
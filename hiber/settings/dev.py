@@ -13,6 +13,8 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 INSTALLED_APPS.append('django_extensions')
 
+API_SCHEMA_LIVE = True
+
 CORS_ORIGIN_REGEX_WHITELIST = [
     r'^(http)(s)?(://192.168.1.)([0-9])([0-9])?([0-9])?',
     r'^(http)(s)?(://localhost:808)([0-9])',
@@ -1,8 +1,43 @@
+from django.core.exceptions import ImproperlyConfigured
+from hiber.cache import PROCESS_LOCAL_BACKENDS
 from .base import *
+from .database import database_from_env, replicas_from_env
 
 DEBUG = False
 
+DATABASES = {
+    'default': database_from_env(),
+    **replicas_from_env(),
+}
+
+# Read replicas take GET traffic; clients that just wrote stick to the
+# primary for a while so they read their own data.
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['hiber.db.routers.ReplicaRouter']
+DATABASE_PRIMARY_STICKY_SECONDS = int(
+    os.environ.get('DATABASE_PRIMARY_STICKY_SECONDS', '10'))
+MIDDLEWARE = ['hiber.db.middleware.PrimaryStickinessMiddleware'] + MIDDLEWARE
+
+# MEMCACHED_LOCATION is a comma-separated list of host:port
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'].split(','),
+            'KEY_PREFIX': alias,
+        }
+        for alias in ('default', 'template_fragments')
+    }
+SHARED_CACHE_REQUIRED = True
+
 try:
     from .local import *
 except ImportError:
     pass
+
+# Refuse to start, rather than fail requests, without a shared cache.
+if (SHARED_CACHE_REQUIRED
+        and CACHES['default']['BACKEND'] in PROCESS_LOCAL_BACKENDS):
+    raise ImproperlyConfigured(
+        "Primary stickiness and API throttling need a cache shared by every "
+        "process; set MEMCACHED_LOCATION.")
@@ -0,0 +1,163 @@
+// Map for the admin's area filter (BBoxFilter): pan and zoom, then filter
+// the listing to the area shown. A small tile map of our own, on
+// OpenStreetMap tiles, so the admin loads no third-party script.
+(function () {
+    'use strict';
+
+    var TILE_SIZE = 256;
+    var TILE_URL = 'https://tile.openstreetmap.org/{z}/{x}/{y}.png';
+    var MIN_ZOOM = 1;
+    var MAX_ZOOM = 18;
+    var MAX_LAT = 85.05112878;
+
+    // Web Mercator: lon/lat to pixels of the whole world at a zoom level.
+    function project(lon, lat, zoom) {
+        var size = TILE_SIZE * Math.pow(2, zoom);
+        var sin = Math.sin(Math.max(-MAX_LAT, Math.min(MAX_LAT, lat)) * Math.PI / 180);
+        return {
+            x: (lon + 180) / 360 * size,
+            y: (0.5 - Math.log((1 + sin) / (1 - sin)) / (4 * Math.PI)) * size
+        };
+    }
+
+    function unproject(x, y, zoom) {
+        var size = TILE_SIZE * Math.pow(2, zoom);
+        var n = Math.PI - 2 * Math.PI * y / size;
+        return {
+            lon: x / size * 360 - 180,
+            lat: 180 / Math.PI * Math.atan(0.5 * (Math.exp(n) - Math.exp(-n)))
+        };
+    }
+
+    function TileMap(element, extent) {
+        this.element = element;
+        this.tiles = document.createElement('div');
+        this.tiles.className = 'bbox-filter-tiles';
+        element.appendChild(this.tiles);
+        this.fit(extent);
+        this.controls();
+        this.render();
+    }
+
+    TileMap.prototype.fit = function (extent) {
+        var width = this.element.clientWidth;
+        var height = this.element.clientHeight;
+        var zoom = MAX_ZOOM;
+        while (zoom > MIN_ZOOM) {
+            var min = project(extent[0], extent[1], zoom);
+            var max = project(extent[2], extent[3], zoom);
+            if (max.x - min.x <= width && min.y - max.y <= height) {
+                break;
+            }
+            zoom -= 1;
+        }
+        var low = project(extent[0], extent[1], zoom);
+        var high = project(extent[2], extent[3], zoom);
+        this.zoom = zoom;
+        this.center = {x: (low.x + high.x) / 2, y: (low.y + high.y) / 2};
+    };
+
+    TileMap.prototype.zoomBy = function (delta) {
+        var zoom = Math.max(MIN_ZOOM, Math.min(MAX_ZOOM, this.zoom + delta));
+        var factor = Math.pow(2, zoom - this.zoom);
+        this.center = {x: this.center.x * factor, y: this.center.y * factor};
+        this.zoom = zoom;
+        this.render();
+    };
+
+    TileMap.prototype.controls = function () {
+        var map = this;
+        [['+', 1], ['−', -1]].forEach(function (control) {
+            var button = document.createElement('button');
+            button.type = 'button';
+            button.className = 'bbox-filter-zoom';
+            button.textContent = control[0];
+            button.addEventListener('click', function () {
+                map.zoomBy(control[1]);
+            });
+            map.element.appendChild(button);
+        });
+
+        var drag = null;
+        this.element.addEventListener('mousedown', function (event) {
+            if (event.target.tagName !== 'BUTTON') {
+                drag = {x: event.clientX, y: event.clientY};
+                event.preventDefault();
+            }
+        });
+        document.addEventListener('mousemove', function (event) {
+            if (drag) {
+                map.center.x -= event.clientX - drag.x;
+                map.center.y -= event.clientY - drag.y;
+                drag = {x: event.clientX, y: event.clientY};
+                map.render();
+            }
+        });
+        document.addEventListener('mouseup', function () {
+            drag = null;
+        });
+        this.element.addEventListener('wheel', function (event) {
+            event.preventDefault();
+            map.zoomBy(event.deltaY < 0 ? 1 : -1);
+        });
+    };
+
+    TileMap.prototype.topLeft = function () {
+        return {
+            x: this.center.x - this.element.clientWidth / 2,
+            y: this.center.y - this.element.clientHeight / 2
+        };
+    };
+
+    TileMap.prototype.render = function () {
+        var corner = this.topLeft();
+        var count = Math.pow(2, this.zoom);
+        var first = {x: Math.floor(corner.x / TILE_SIZE), y: Math.floor(corner.y / TILE_SIZE)};
+        var last = {
+            x: Math.floor((corner.x + this.element.clientWidth) / TILE_SIZE),
+            y: Math.floor((corner.y + this.element.clientHeight) / TILE_SIZE)
+        };
+        var fragment = document.createDocumentFragment();
+        for (var x = first.x; x <= last.x; x++) {
+            for (var y = Math.max(0, first.y); y <= Math.min(count - 1, last.y); y++) {
+                var tile = document.createElement('img');
+                tile.alt = '';
+                tile.src = TILE_URL.replace('{z}', this.zoom)
+                    .replace('{x}', ((x % count) + count) % count).replace('{y}', y);
+                tile.style.left = (x * TILE_SIZE - corner.x) + 'px';
+                tile.style.top = (y * TILE_SIZE - corner.y) + 'px';
+                fragment.appendChild(tile);
+            }
+        }
+        this.tiles.innerHTML = '';
+        this.tiles.appendChild(fragment);
+    };
+
+    // min_lon,min_lat,max_lon,max_lat of the area shown.
+    TileMap.prototype.extent = function () {
+        var corner = this.topLeft();
+        var low = unproject(corner.x, corner.y + this.element.clientHeight, this.zoom);
+        var high = unproject(corner.x + this.element.clientWidth, corner.y, this.zoom);
+        return [low.lon, low.lat, high.lon, high.lat];
+    };
+
+    function setUp(element) {
+        var extent = element.dataset.extent.split(',').map(Number);
+        var map = new TileMap(element.querySelector('.bbox-filter-map'), extent);
+
+        element.querySelector('.bbox-filter-apply').addEventListener('click', function (event) {
+            event.preventDefault();
+            var params = new URLSearchParams(window.location.search);
+            params.set(element.dataset.parameter, map.extent().map(function (value) {
+                return value.toFixed(5);
+            }).join(','));
+            // Back to the first page of the new listing.
+            params.delete('p');
+            window.location.search = params.toString();
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        Array.prototype.forEach.call(document.querySelectorAll('.bbox-filter'), setUp);
+    });
+})();